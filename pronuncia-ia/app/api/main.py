@@ -1,6 +1,6 @@
 try:
-    from fastapi import FastAPI, UploadFile, Form, Request, File
-    from fastapi.responses import JSONResponse
+    from fastapi import FastAPI, UploadFile, Form, Request, File, WebSocket, WebSocketDisconnect
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 except Exception as e:
     raise RuntimeError(
         "Dependência ausente: instale FastAPI e Uvicorn (por exemplo: `pip install fastapi uvicorn`) antes de executar este módulo."
@@ -11,13 +11,18 @@ from pydantic import BaseModel
 from typing import Optional
 import os 
 import sys 
+import asyncio
 import pathlib
-import tempfile
+import time
 import uuid
+import json
 import base64
 from pathlib import Path
+from urllib.parse import unquote
 
 # Carregar variáveis de ambiente o mais cedo possível
+_env_loaded = None
+_env_error = None
 try:
     from dotenv import load_dotenv
     # Tenta múltiplos caminhos para .env para suportar execuções diferentes
@@ -26,7 +31,6 @@ try:
         Path(__file__).resolve().parents[3] / ".env",         # repo root .env (c317---IA/.env)
         Path.cwd() / ".env",                                  # cwd/.env
     ]
-    _env_loaded = None
     for p in possible_envs:
         try:
             if p.exists():
@@ -35,18 +39,55 @@ try:
                 break
         except Exception:
             continue
-    if _env_loaded:
-        print(f"[DEBUG] main.py: .env carregado de {_env_loaded}")
-    else:
-        print(f"[DEBUG] main.py: nenhum .env encontrado em {[str(p) for p in possible_envs]}")
 except Exception as _e:
-    print(f"[DEBUG] main.py: falha ao carregar .env antecipadamente: {_e}")
+    _env_error = _e
 
 # Add the parent directory (or its parent) to sys.path to resolve 'scoring' import
 core_path = pathlib.Path(__file__).parent.parent / "core"
 sys.path.insert(0, str(core_path))
 
-from app.core.scoring import pronunciation_score, pronunciation_score_with_ai
+from app.core.scoring import (
+    SCORING_MODE,
+    pronunciation_score,
+    pronunciation_score_tiered_async,
+    pronunciation_score_tiered_stream,
+    pronunciation_score_with_ai_async,
+    pronunciation_score_with_ai_stream,
+    scoring_batcher,
+    scoring_cache,
+)
+from app.core.cache import build_cache, make_key
+from app.core.audio_input import (
+    MAX_BODY_BYTES,
+    AudioDecodeError,
+    AudioPayload,
+    BodyTooLarge,
+    read_json_bounded,
+    read_json_with_audio,
+)
+from app.core.audio_preprocess import config_signature, preprocess_config, preprocess_payload
+from app.core.realtime import StreamingAudioSession, provisional_score
+from app.core.streaming import SSE_HEADERS, sse_event, wants_stream
+from app.core.submissions import (
+    PermanentSubmissionError,
+    SubmissionQueue,
+    SubmissionWorker,
+    WebhookURLError,
+    pin_webhook_url,
+    validate_webhook_url,
+)
+from app.core.hedging import Hedger
+from app.core.routing import provider_router
+from app.core.ratelimit import provider_limiters
+from app.core import metrics
+from app.core.tracing import get_logger, span
+from app.core.server_timing import RequestTimings, wants_timings
+
+log = get_logger("api")
+if _env_error is not None:
+    log.warning("Falha ao carregar .env antecipadamente: %s", _env_error)
+else:
+    log.debug(".env carregado de %s", _env_loaded or "nenhum (usando só o ambiente)")
 
 # Importação dos modelos de transcrição e IA
 models_path = pathlib.Path(__file__).parent.parent.parent / "models"
@@ -77,6 +118,27 @@ except Exception:
         GeminiChat,
     )
 
+# Clientes de provedores compartilhados pelo processo (criados uma vez, reaproveitados)
+from provider_registry import client_model_name, get_async_chat, get_async_transcriber, registry as provider_registry
+from modelos import close_shared_async_http_client, shared_async_http_client
+import local_stt
+
+# Cache de transcrições endereçado pelo conteúdo (SHA-256 do áudio + provedor + modelo).
+# Reenvios do mesmo arquivo (retentativas, toque duplo, reconexão) não pagam uma nova transcrição.
+transcription_cache = build_cache(
+    "TRANSCRIPTION_CACHE",
+    default_path=str(Path(__file__).parent.parent.parent / "data" / "cache" / "transcricoes.sqlite3"),
+    default_ttl=7 * 24 * 3600,
+)
+
+# Fila durável das avaliações assíncronas (/avaliar com mode=async), consumida por
+# SUBMISSION_WORKERS tarefas desta API e/ou por processos scripts/submission_worker.py
+submission_queue = SubmissionQueue(os.getenv(
+    "SUBMISSION_QUEUE_PATH",
+    str(Path(__file__).parent.parent.parent / "data" / "queue" / "submissions.sqlite3"),
+))
+SUBMISSION_WORKERS = int(os.getenv("SUBMISSION_WORKERS", "2"))
+
 app = FastAPI(
     title="API de Avaliação de Pronúncia com IA",
     description="Sistema inteligente que usa GPT/Gemini para avaliar pronúncia de forma qualitativa",
@@ -84,6 +146,25 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+async def _aquecer_modelos_locais():
+    # Carrega o pool do faster-whisper antes de aceitar requisições (FASTER_WHISPER_PRELOAD)
+    # e sobe o pool de processos de STT local (LOCAL_STT_PROCESSES)
+    try:
+        await asyncio.to_thread(local_stt.preload)
+    except (MemoryError, RuntimeError) as e:
+        log.warning("%s", e)
+    submission_worker.start()
+
+
+@app.on_event("shutdown")
+async def _fechar_clientes():
+    # Fecha o pool HTTP keep-alive compartilhado pelos clientes assíncronos
+    await submission_worker.stop()
+    await close_shared_async_http_client()
+    local_stt.shutdown()
+
+
 @app.get("/debug_env")
 async def debug_env():
     """Endpoint temporário para verificar se as chaves de API estão visíveis no processo.
@@ -104,6 +185,68 @@ async def debug_env():
         "GOOGLE_masked": mask(goo),
         "python_executable": sys.executable,
     })
+
+
+@app.get("/status")
+async def status():
+    """Estado interno do serviço: clientes de provedores em uso e contadores de reaproveitamento."""
+    return JSONResponse({
+        "providers": provider_registry.stats(),
+        "caches": {
+            "transcription": transcription_cache.stats(),
+            "scoring": scoring_cache.stats(),
+        },
+        "scoring_microbatch": scoring_batcher.stats(),
+        "transcription_latency": _latencia_por_provedor(),
+        "transcription_hedging": transcription_hedger.stats(),
+        "circuit_breakers": provider_router.stats(),
+        "rate_limits": provider_limiters.stats(),
+        "submissions": {**await asyncio.to_thread(submission_queue.stats), **submission_worker.stats()},
+        "local_stt": {
+            **local_stt.local_models.stats(),
+            "wav2vec2_batching": local_stt.wav2vec2_batcher.stats() if local_stt.wav2vec2_batcher else None,
+            "process_pool": local_stt.process_pool.stats(),
+        },
+        "metrics": metrics.snapshot(),
+        "latency_histograms": metrics.histogram_snapshot(),
+    })
+
+
+@app.get("/metrics")
+async def metricas_prometheus():
+    """Contadores e histogramas de latência por etapa no formato de exposição do Prometheus."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.middleware("http")
+async def _medir_requisicao(request: Request, call_next):
+    # rótulo pela rota (ex.: /submissions/{submission_id}), não pelo caminho, para não explodir a cardinalidade;
+    # em respostas SSE o tempo medido é até o início do stream
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        # span raiz: o sorteio de TRACE_SAMPLE vale para os logs de toda a requisição
+        with span("http", log, method=request.method, path=request.url.path) as s:
+            response = await call_next(request)
+            status = response.status_code
+            s.set(status=status)
+        return response
+    finally:
+        rota = getattr(request.scope.get("route"), "path", "desconhecida")
+        elapsed_ms = (time.perf_counter() - inicio) * 1000
+        metrics.observe("http_request_duration_ms", elapsed_ms, route=rota, method=request.method)
+        metrics.inc("http_requests", route=rota, method=request.method, status=status)
+
+
+def _latencia_por_provedor() -> dict:
+    """Latência média de transcrição (cache miss) por provedor, local e nuvem lado a lado."""
+    totais = {c["provider"]: c["value"] for c in metrics.snapshot().get("transcription_ms_total", [])}
+    out = {}
+    for c in metrics.snapshot().get("transcription_requests", []):
+        n = c["value"]
+        out[c["provider"]] = {"requests": int(n), "avg_ms": round(totais.get(c["provider"], 0) / n, 1) if n else None}
+    return out
+
 # Modelo principal de transcrição (local, grátis, razoavelmente preciso)
 # DESABILITADO: Whisper local consome muita RAM
 # whisper_model = Whisper(device='cpu')  # Use 'cuda' se tiver GPU
@@ -145,51 +288,327 @@ def _get_audio_path(audio_dict):
     # Por enquanto, só retorna o nome
     return audio_dict.get("name", "")
 
+# Provedores de transcrição que rodam no próprio processo (LOCAL_STT_PROVIDERS, ver models/local_stt.py)
+LOCAL_PROVIDERS = local_stt.LOCAL_STT_PROVIDERS
+
+
 def _normalizar_provedor(provedor: str) -> str:
     return (provedor or "gemini").lower()  # MUDADO: gemini como padrão
 
-def _transcrever_arquivo(caminho_tmp: str, provedor: str) -> str:
+async def _transcrever_arquivo(audio, provedor: str, info: Optional[dict] = None) -> str:
+    """
+    Transcreve o áudio (AudioPayload ou caminho de arquivo) com o provedor pedido.
+    Se `info` for passado, é preenchido com detalhes da execução (provider, model, cache,
+    preprocess). Nos provedores configurados, o áudio é reduzido para 16 kHz mono sem
+    silêncio nas pontas antes do upload (ver app/core/audio_preprocess.py).
+    """
+    info = info if info is not None else {}
+    if isinstance(audio, str):
+        audio = await asyncio.to_thread(AudioPayload.from_path, audio)
     prov = _normalizar_provedor(provedor)
     # Mock provider for local testing without API keys
     if prov == "mock":
+        info.update(provider=prov, cache="bypass")
         # Return a stable expected transcription for tests
         return "o rato roeu a roupa do rei de roma"
-    if prov == "openai":
-        return OpenAITranscriber().transcribe(caminho_tmp)
-    if prov == "gemini":
-        return GeminiTranscriber().transcribe(caminho_tmp)
-    # Whisper local desabilitado (falta de RAM)
-    # return whisper_model.transcribe(caminho_tmp)
-    # Se pedir whisper, usar gemini
-    return GeminiTranscriber().transcribe(caminho_tmp)
+    if prov not in ("openai", "gemini") + LOCAL_PROVIDERS:
+        # Whisper local (transformers) fica desabilitado por padrão (falta de RAM): use
+        # provider="faster_whisper" ou inclua "whisper" em LOCAL_STT_PROVIDERS com um orçamento de RAM
+        # return whisper_model.transcribe(audio.path())
+        # Se pedir whisper, usar gemini
+        prov = "gemini"
+    # disjuntor aberto ou provedor muito mais lento que a alternativa: TRANSCRIPTION_FALLBACK_PROVIDERS
+    escolhido = provider_router.choose("transcriber", prov)
+    if escolhido != prov:
+        info["routed_from"] = prov
+        prov = escolhido
+    transcriber = await get_async_transcriber(prov)
+    model = client_model_name(transcriber)
+    info.update(provider=prov, model=model, cache="bypass")
 
+    cache_key = None
+    if transcription_cache.enabled:
+        cache_key = make_key("transcricao", audio.sha256, prov, model, config_signature(preprocess_config(prov)))
+        cached, tier = await transcription_cache.alookup(cache_key)
+        metrics.inc("transcription_cache", result="hit" if tier else "miss", provider=prov)
+        if tier:
+            info.update(cache="hit", cache_tier=tier)
+            return cached
+        info["cache"] = "miss"
 
-# Função para processar upload de arquivo e transcrever
-async def _transcrever_upload(audio: UploadFile, provedor: str) -> str:
-    data = await audio.read()
-    suffix = os.path.splitext(audio.filename or "")[1] or ".wav"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(data)
-        tmp_path = tmp.name
+    hedge_prov = TRANSCRIPTION_HEDGE_PROVIDER
+    if prov in TRANSCRIPTION_HEDGE_FOR and hedge_prov and hedge_prov != prov:
+        (transcription, chamada), vencedor, disparou = await transcription_hedger.run(
+            prov,
+            lambda: _tentativa_hedge(prov, audio, transcriber),
+            lambda: _tentativa_hedge(hedge_prov, audio),
+        )
+        metrics.inc("transcription_hedge", provider=prov, result=vencedor if disparou else "not_fired")
+        info["hedge"] = {"secondary": hedge_prov, "fired": disparou, "winner": vencedor}
+        if vencedor == "secondary":
+            # a resposta é de outro provedor/modelo: não entra no cache do principal
+            info.update(provider=hedge_prov, model=chamada["model"])
+            cache_key = None
+    else:
+        transcription, chamada = await _chamar_transcritor(prov, audio, transcriber)
+    info.update({k: v for k, v in chamada.items() if k != "model"})
+    if cache_key and transcription:
+        await transcription_cache.aset(cache_key, transcription)
+    return transcription
+
+
+# Hedge de transcrição: se o provedor principal (TRANSCRIPTION_HEDGE_FOR) demorar mais que o
+# percentil TRANSCRIPTION_HEDGE_PERCENTILE da própria latência recente, o mesmo áudio vai também
+# para TRANSCRIPTION_HEDGE_PROVIDER e vale a primeira resposta. Vazio = desligado.
+TRANSCRIPTION_HEDGE_PROVIDER = os.getenv("TRANSCRIPTION_HEDGE_PROVIDER", "").strip().lower()
+TRANSCRIPTION_HEDGE_FOR = tuple(
+    p.strip().lower() for p in os.getenv("TRANSCRIPTION_HEDGE_FOR", "gemini").split(",") if p.strip()
+)
+transcription_hedger = Hedger(
+    percentile=float(os.getenv("TRANSCRIPTION_HEDGE_PERCENTILE", "95")),
+    default_delay_ms=float(os.getenv("TRANSCRIPTION_HEDGE_DELAY_MS", "3000")),
+    min_delay_ms=float(os.getenv("TRANSCRIPTION_HEDGE_MIN_DELAY_MS", "200")),
+)
+
+
+async def _chamar_transcritor(prov: str, audio: AudioPayload, transcriber=None) -> tuple:
+    """Uma chamada ao provedor, sem cache: (transcrição, detalhes da chamada)."""
+    transcriber = transcriber or await get_async_transcriber(prov)
+    chamada = {"model": client_model_name(transcriber)}
+    preprocess = preprocess_config(prov)
+    upload = audio
+    if preprocess:
+        # só em cache miss: decodificar/reamostrar custa CPU
+        upload = await asyncio.to_thread(preprocess_payload, audio, preprocess, chamada)
+        metrics.inc("audio_preprocess_bytes_saved", chamada["preprocess"]["bytes_saved"], provider=prov)
+    inicio = time.perf_counter()
     try:
-        return _transcrever_arquivo(tmp_path, provedor)
+        with span("transcription", log, provider=prov, model=chamada["model"], bytes=upload.size):
+            if hasattr(transcriber, "transcribe_bytes"):
+                # provedores de nuvem recebem os bytes direto da memória
+                data = await asyncio.to_thread(upload.data) if not upload.in_memory else upload.data()
+                transcription = await transcriber.transcribe_bytes(data, upload.mime, upload.name)
+            else:
+                transcription = await transcriber.transcribe(await asyncio.to_thread(upload.path))
     finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+        if upload is not audio:
+            upload.close()
+    elapsed_ms = (time.perf_counter() - inicio) * 1000
+    chamada["elapsed_ms"] = round(elapsed_ms, 1)
+    metrics.inc("transcription_requests", provider=prov)
+    metrics.inc("transcription_ms_total", elapsed_ms, provider=prov)
+    metrics.observe("transcription_duration_ms", elapsed_ms, provider=prov, model=chamada["model"])
+    return transcription, chamada
+
+
+async def _tentativa_hedge(prov: str, audio: AudioPayload, transcriber=None) -> tuple:
+    """
+    Uma tentativa do hedge, com cópia própria do áudio. A perdedora é cancelada, mas o STT local
+    continua no pool de processos lendo o arquivo: a cópia só é apagada quando esse trabalho termina
+    (provedores de nuvem já receberam os bytes e são cancelados na hora).
+    """
+    transcriber = transcriber or await get_async_transcriber(prov)
+    copia = await asyncio.to_thread(audio.clone)
+    tarefa = asyncio.ensure_future(_chamar_transcritor(prov, copia, transcriber))
+
+    def liberar(t):
+        copia.close()
+        if not t.cancelled():
+            t.exception()  # perdedora que falhou depois do cancelamento: sem aviso de exceção não lida
+
+    tarefa.add_done_callback(liberar)
+    try:
+        return await asyncio.shield(tarefa)
+    except asyncio.CancelledError:
+        if hasattr(transcriber, "transcribe_bytes"):
+            tarefa.cancel()
+        raise
+
+
+# Função para processar upload de arquivo e transcrever
+async def _transcrever_upload(audio: UploadFile, provedor: str, tempos: Optional[RequestTimings] = None) -> str:
+    tempos = tempos if tempos is not None else RequestTimings()
+    with tempos.stage("ingest"), metrics.timer("ingest_duration_ms", format="multipart"):
+        payload = await AudioPayload.from_upload(audio)
+    info = {}
+    with payload, tempos.stage("transcription"):
+        transcription = await _transcrever_arquivo(payload, provedor, info)
+    _descrever_transcricao(tempos, info)
+    return transcription
+
+
+def _descrever_transcricao(tempos: RequestTimings, info: dict):
+    tempos.describe("transcription", provider=info.get("provider"), model=info.get("model"), cache=info.get("cache"))
 
 
 # _transcrever_upload não é mais usado pelo endpoint /avaliar (JSON)
 
 
-def _resposta_chat_texto(texto: str, provedor: str, sistema: str) -> str:
+async def _resposta_chat_texto(texto: str, provedor: str, sistema: str, tempos: Optional[RequestTimings] = None) -> str:
     prov = _normalizar_provedor(provedor)
-    if prov == "gemini":
-        return GeminiChat().reply_from_text(texto, system=sistema)
-    if prov == "openai":
-        return OpenAIChat().reply_from_text(texto, system=sistema)
+    if prov in ("gemini", "openai"):
+        prov = provider_router.choose("chat", prov)
+        chat = await get_async_chat(prov)
+        if tempos is None:
+            return await chat.reply_from_text(texto, system=sistema)
+        with tempos.stage("chat", provider=prov, model=client_model_name(chat)):
+            return await chat.reply_from_text(texto, system=sistema)
     raise RuntimeError("Provider sem chat: use 'openai' ou 'gemini'.")
+
+
+async def _resposta_chat_texto_stream(texto: str, provedor: str, sistema: str):
+    prov = _normalizar_provedor(provedor)
+    if prov not in ("gemini", "openai"):
+        raise RuntimeError("Provider sem chat: use 'openai' ou 'gemini'.")
+    chat = await get_async_chat(provider_router.choose("chat", prov))
+    async for token in chat.stream_reply_from_text(texto, system=sistema):
+        yield token
+
+
+def _sse(eventos, tempos: Optional[RequestTimings] = None) -> StreamingResponse:
+    headers = dict(SSE_HEADERS)
+    if tempos is not None:
+        # só as etapas anteriores ao início do stream
+        headers["Server-Timing"] = tempos.header()
+    return StreamingResponse(eventos, media_type="text/event-stream", headers=headers)
+
+
+def _responder(corpo, tempos: RequestTimings, status_code: int = 200) -> Response:
+    """Resposta JSON com o cabeçalho Server-Timing (e o campo `timings`, se pedido)."""
+    content = tempos.render_json(corpo)
+    return Response(content, status_code=status_code, media_type="application/json",
+                    headers={"Server-Timing": tempos.header()})
+
+
+async def _sse_chat(texto: str, provedor: str, sistema: str, **extra):
+    """Eventos SSE de uma resposta de chat: "token" a cada pedaço e "done" com a resposta completa."""
+    partes = []
+    try:
+        async for token in _resposta_chat_texto_stream(texto, provedor, sistema):
+            partes.append(token)
+            yield sse_event("token", {"text": token})
+    except Exception as e:
+        yield sse_event("error", {"error": f"Falha ao conversar com {provedor}: {e}"})
+        return
+    yield sse_event("done", {"reply": "".join(partes), **extra})
+
+
+async def _pontuar(
+    target_word: Optional[str],
+    transcription: str,
+    ai_scoring: bool,
+    scoring_mode: str,
+    scoring_provider: str,
+    language: str,
+) -> dict:
+    """Avalia a transcrição conforme o modo pedido (tiered | ai | levenshtein)."""
+    inicio = time.perf_counter()
+    if ai_scoring and (scoring_mode or "").lower() == "tiered":
+        score_result = await pronunciation_score_tiered_async(
+            target_word,
+            transcription,
+            provider=scoring_provider,
+            language=language,
+        )
+    elif ai_scoring:
+        score_result = await pronunciation_score_with_ai_async(
+            target_word,
+            transcription,
+            provider=scoring_provider,
+            language=language,
+        )
+        score_result["scoring_tier"] = "ai"
+    else:
+        score_result = pronunciation_score(target_word, transcription)
+        score_result["scoring_tier"] = "levenshtein"
+    _medir_avaliacao(score_result, inicio)
+    return score_result
+
+
+def _medir_avaliacao(score_result: dict, inicio: float):
+    # método efetivo (levenshtein, ai-gemini, ai-openai...), já considerando tier local e fallbacks
+    elapsed_ms = (time.perf_counter() - inicio) * 1000
+    method = score_result.get("method", "desconhecido")
+    tier = score_result.get("scoring_tier", "desconhecido")
+    metrics.observe("scoring_duration_ms", elapsed_ms, method=method, tier=tier)
+    log.debug("scoring %.1fms method=%s tier=%s fallback=%s", elapsed_ms, method, tier, score_result.get("fallback"))
+
+
+async def _pontuar_stream(
+    target_word: Optional[str],
+    transcription: str,
+    ai_scoring: bool,
+    scoring_mode: str,
+    scoring_provider: str,
+    language: str,
+):
+    """Como `_pontuar`, mas gera ("field", ...) conforme a IA escreve e ("result", avaliação) no fim."""
+    inicio = time.perf_counter()
+    if ai_scoring and (scoring_mode or "").lower() == "tiered":
+        async for evento, dados in pronunciation_score_tiered_stream(
+            target_word, transcription, provider=scoring_provider, language=language,
+        ):
+            if evento == "result":
+                _medir_avaliacao(dados, inicio)
+            yield evento, dados
+        return
+    if ai_scoring:
+        async for evento, dados in pronunciation_score_with_ai_stream(
+            target_word, transcription, provider=scoring_provider, language=language,
+        ):
+            if evento == "result":
+                dados["scoring_tier"] = "ai"
+                _medir_avaliacao(dados, inicio)
+            yield evento, dados
+        return
+    score_result = pronunciation_score(target_word, transcription)
+    score_result["scoring_tier"] = "levenshtein"
+    _medir_avaliacao(score_result, inicio)
+    yield "result", score_result
+
+
+def _aplicar_threshold(score_result: dict, threshold) -> dict:
+    # compute pass if threshold provided and numeric score is present
+    try:
+        if threshold is not None and isinstance(score_result.get("score"), (int, float)):
+            score_result["pass"] = float(score_result.get("score")) >= float(threshold)
+    except Exception:
+        pass
+
+    # Garantir que o campo `match` exista (compatibilidade com método tradicional)
+    if "match" not in score_result:
+        score_result["match"] = bool(score_result.get("hit", False))
+    return score_result
+
+
+# Campos aceitos na query string / cabeçalhos quando o corpo é o áudio binário cru
+_CAMPOS_AVALIAR = (
+    "user_id", "action", "target_word", "ai_scoring", "provider", "scoring_provider",
+    "threshold", "language", "system", "scoring_mode", "audio_name", "stream", "mode", "webhook_url", "timings",
+)
+
+
+def _metadados_binario(request: Request) -> dict:
+    """
+    Metadados de um upload binário: `?target_word=...` na query string ou
+    cabeçalhos X-<Campo> (ex.: X-Target-Word, com valor URL-encoded para acentos).
+    """
+    campos = {}
+    for campo in _CAMPOS_AVALIAR:
+        valor = request.query_params.get(campo)
+        if valor is None:
+            header = request.headers.get("x-" + campo.replace("_", "-"))
+            valor = unquote(header) if header is not None else None
+        if valor is not None:
+            campos[campo] = valor
+    return campos
+
+
+def _corpo_acima_do_limite(request: Request) -> bool:
+    tamanho = request.headers.get("content-length", "")
+    return tamanho.isdigit() and int(tamanho) > MAX_BODY_BYTES
+
+
 @app.post("/avaliar")
 async def avaliar(
     request: Request,
@@ -203,6 +622,11 @@ async def avaliar(
     threshold: Optional[float] = Form(None),
     language: str = Form("português"),
     system: str = Form("Você é um assistente útil que responde de forma curta."),
+    scoring_mode: str = Form(SCORING_MODE),  # ai | tiered
+    stream: bool = Form(False),
+    mode: str = Form("sync"),  # sync | async
+    webhook_url: Optional[str] = Form(None),
+    timings: bool = Form(False),
 ):
     provider = (provider or "gemini").lower()
     scoring_provider = (scoring_provider or "gemini").lower()
@@ -217,11 +641,24 @@ async def avaliar(
     **Parâmetros:**
     - user_id: ID do usuário
     - target_word: Palavra/frase que deveria ser falada
-    - audio: Arquivo de áudio (.wav, .mp3, .opus, etc)
-    - provider: Modelo para transcrição (whisper=local, openai, gemini)
+    - audio: Arquivo de áudio (.wav, .mp3, .opus, etc) via multipart; também aceita o
+      áudio cru no corpo (application/octet-stream ou audio/*, com os demais campos na
+      query string ou em cabeçalhos X-*) ou JSON com `audio_base64`
+    - provider: Modelo para transcrição (faster_whisper=local em CPU int8, openai, gemini)
     - ai_scoring: Se True, usa IA para avaliar (recomendado!)
     - scoring_provider: Qual IA usar na avaliação (openai ou gemini)
+    - scoring_mode: "ai" (padrão, configurável em SCORING_MODE) sempre chama a IA;
+      "tiered" avalia localmente acertos e erros claros e só chama a IA na faixa incerta
     - language: Idioma para contextualizar feedback
+    - stream: Se True (ou com `Accept: text/event-stream`), responde em Server-Sent Events:
+      "transcription", um "field" por campo da avaliação assim que a IA o conclui
+      ("score" primeiro) e "final" com o mesmo corpo da resposta normal
+    - mode: "async" (ou cabeçalho `Prefer: respond-async`) enfileira a submissão e responde
+      202 na hora com o `submission_id`; o resultado sai em GET /submissions/{id} e, se
+      `webhook_url` for informado (https, host público), é enviado por POST para essa URL;
+      URL recusada responde 422
+    - timings: Se True, inclui o campo `timings` com o tempo de cada etapa (o cabeçalho
+      `Server-Timing` vem sempre)
     
     **Retorno:**
     - score: Nota de 0 a 100
@@ -230,208 +667,687 @@ async def avaliar(
     - errors: Lista de erros específicos
     - highlights: O que acertou/errou
     """
-    # Prepare audio file: accept multipart upload OR JSON with base64
-    tmp_created = False
-    audio_path = None
-    # If multipart/form-data provided file
-    if audio is not None:
-        data = await audio.read()
-        suffix = os.path.splitext(audio.filename or "")[1] or ".wav"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(data)
-            audio_path = tmp.name
-        tmp_created = True
-    else:
-        # try to parse JSON body for base64 audio
-        content_type = request.headers.get("content-type", "")
-        if "application/json" in content_type:
-            try:
-                j = await request.json()
-            except Exception:
-                return JSONResponse({"error": "Corpo JSON inválido."}, status_code=400)
-
-            # map fields if present in JSON
-            user_id = user_id or j.get("user_id")
-            action = j.get("action", action)
-            target_word = target_word or j.get("target_word")
-            ai_scoring = ai_scoring if ("ai_scoring" not in j) else (str(j.get("ai_scoring")).lower() in ["true", "1"])
-            provider = j.get("provider", provider)
-            scoring_provider = j.get("scoring_provider", scoring_provider)
-            threshold = j.get("threshold", threshold)
-            language = j.get("language", language)
-            system = j.get("system", system)
-
-            audio_b64 = None
+    # Prepara o áudio: multipart, corpo binário cru (application/octet-stream ou audio/*)
+    # ou JSON com base64. O binário e o base64 são lidos em blocos, sem montar o corpo inteiro.
+    tempos = RequestTimings(include=wants_timings(timings))
+    payload = None
+    campos = None
+    audio_name = audio.filename if audio is not None else None
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if _corpo_acima_do_limite(request):
+        return _responder({"error": f"Corpo da requisição maior que o limite de {MAX_BODY_BYTES} bytes."}, tempos, status_code=413)
+    inicio_ingestao = time.perf_counter()
+    formato = "multipart"
+    try:
+        if audio is not None:
+            payload = await AudioPayload.from_upload(audio)
+        elif content_type == "application/octet-stream" or content_type.startswith("audio/"):
+            formato = "binary"
+            campos = _metadados_binario(request)
+            payload = await AudioPayload.from_stream(request.stream(), campos.get("audio_name"), content_type)
+            audio_name = payload.name
+        elif content_type == "application/json":
+            # leitura do corpo + decodificação incremental do base64
+            formato = "json_base64"
+            campos, payload = await read_json_with_audio(request.stream())
             audio_name = "audio.wav"
-            if isinstance(j.get("audio"), dict) and j["audio"].get("base64"):
-                audio_b64 = j["audio"].get("base64")
-                audio_name = j["audio"].get("name", audio_name)
-            elif j.get("audio_base64"):
-                audio_b64 = j.get("audio_base64")
-                audio_name = j.get("audio_name", audio_name)
-
-            if audio_b64:
-                try:
-                    decoded = base64.b64decode(audio_b64)
-                except Exception:
-                    return JSONResponse({"error": "Campo audio_base64 inválido (não é base64)."}, status_code=400)
+            if isinstance(campos.get("audio"), dict):
+                audio_name = campos["audio"].get("name") or audio_name
+            audio_name = campos.get("audio_name") or audio_name
+            if payload is not None:
+                payload.rename(audio_name)
+    except BodyTooLarge as e:
+        metrics.inc("request_errors", stage="ingest", reason="too_large")
+        return _responder({"error": str(e)}, tempos, status_code=413)
+    except AudioDecodeError:
+        metrics.inc("request_errors", stage="ingest", reason="base64")
+        return _responder({"error": "Campo audio_base64 inválido (não é base64)."}, tempos, status_code=400)
+    except ValueError:
+        metrics.inc("request_errors", stage="ingest", reason="json")
+        return _responder({"error": "Corpo JSON inválido."}, tempos, status_code=400)
+    ingest_ms = (time.perf_counter() - inicio_ingestao) * 1000
+    tempos.add("ingest", ingest_ms, format=formato)
+    metrics.observe("ingest_duration_ms", ingest_ms, format=formato)
+
+    if campos:
+        # campos do JSON (ou da query string / cabeçalhos X-*, no corpo binário)
+        user_id = user_id or campos.get("user_id")
+        action = str(campos.get("action", action)).lower()
+        target_word = target_word or campos.get("target_word")
+        ai_scoring = ai_scoring if ("ai_scoring" not in campos) else (str(campos.get("ai_scoring")).lower() in ["true", "1"])
+        provider = str(campos.get("provider", provider)).lower()
+        scoring_provider = str(campos.get("scoring_provider", scoring_provider)).lower()
+        threshold = campos.get("threshold", threshold)
+        language = campos.get("language", language)
+        system = campos.get("system", system)
+        scoring_mode = campos.get("scoring_mode", scoring_mode)
+        stream = campos.get("stream", stream)
+        mode = campos.get("mode", mode)
+        webhook_url = campos.get("webhook_url", webhook_url)
+        tempos.include = wants_timings(campos.get("timings", timings))
 
-                suffix = os.path.splitext(audio_name)[1] or ".wav"
-                fd, path = tempfile.mkstemp(suffix=suffix)
-                with os.fdopen(fd, "wb") as f:
-                    f.write(decoded)
-                audio_path = path
-                tmp_created = True
+    if payload is None:
+        return _responder({"detail": [{"type": "missing", "loc": ["body", "user_id"], "msg": "Field required", "input": None}, {"type": "missing", "loc": ["body", "audio"], "msg": "Field required", "input": None}]}, tempos, status_code=400)
 
-    if not audio_path:
-        return JSONResponse({"detail": [{"type": "missing", "loc": ["body", "user_id"], "msg": "Field required", "input": None}, {"type": "missing", "loc": ["body", "audio"], "msg": "Field required", "input": None}]}, status_code=400)
+    if str(mode).lower() == "async" or "respond-async" in request.headers.get("prefer", "").lower():
+        submission_id = "sub_" + uuid.uuid4().hex
+        params = {
+            "user_id": user_id, "action": action, "target_word": target_word, "ai_scoring": ai_scoring,
+            "provider": provider, "scoring_provider": scoring_provider, "threshold": threshold,
+            "language": language, "system": system, "scoring_mode": scoring_mode, "audio_name": audio_name,
+        }
+        if webhook_url:
+            try:
+                await asyncio.to_thread(validate_webhook_url, webhook_url)
+            except WebhookURLError as e:
+                payload.close()
+                return _responder({"error": str(e)}, tempos, status_code=422)
+        try:
+            with payload:
+                data = await asyncio.to_thread(payload.data)
+                await asyncio.to_thread(
+                    submission_queue.enqueue, submission_id, params, data, audio_name or payload.name, webhook_url,
+                )
+        except Exception as e:
+            return _responder({"error": f"Falha ao enfileirar a submissão: {e}"}, tempos, status_code=503)
+        submission_worker.wake()
+        return _responder({
+            "submission_id": submission_id,
+            "status": "queued",
+            "status_url": f"/submissions/{submission_id}",
+        }, tempos, status_code=202)
 
+    transcription_info = {}
     try:
-        # Usa o arquivo salvo para transcrição (Gemini espera caminho de arquivo real)
-        transcription = _transcrever_arquivo(audio_path, provider)
+        # Provedores de nuvem recebem os bytes em memória; só backends locais gravam em disco
+        with tempos.stage("transcription"):
+            transcription = await _transcrever_arquivo(payload, provider, transcription_info)
     except Exception as e:
-        try:
-            if tmp_created and audio_path and os.path.exists(audio_path):
-                os.remove(audio_path)
-        except Exception:
-            pass
-        return JSONResponse({"error": f"Falha na transcrição ({provider}): {e}"}, status_code=400)
+        metrics.inc("request_errors", stage="transcription", reason=type(e).__name__)
+        return _responder({"error": f"Falha na transcrição ({provider}): {e}"}, tempos, status_code=400)
+    finally:
+        # o áudio não é mais necessário depois da transcrição
+        payload.close()
+        _descrever_transcricao(tempos, transcription_info)
 
     submission_id = "sub_" + uuid.uuid4().hex
+    stream = wants_stream(stream, request.headers.get("accept"))
 
     # ACTION: transcribe -> only transcription
     if action == "transcribe":
-        try:
-            return JSONResponse({
-                "submission_id": submission_id,
-                "transcription": transcription,
-                "status": "done",
-                "provider": provider,
-            })
-        finally:
-            try:
-                os.remove(audio_path)
-            except Exception:
-                pass
+        return _responder({
+            "submission_id": submission_id,
+            "transcription": transcription,
+            "status": "done",
+            "provider": provider,
+            "transcription_cache": transcription_info.get("cache"),
+            "audio_preprocess": transcription_info.get("preprocess"),
+        }, tempos)
 
     # ACTION: chat -> transcribe + chat reply
+    if action == "chat" and stream:
+        return _sse(_sse_chat(
+            transcription, provider, system,
+            submission_id=submission_id, transcription=transcription, provider=provider,
+        ), tempos)
     if action == "chat":
         try:
+            reply = await _resposta_chat_texto(transcription, provider, system, tempos)
+        except Exception as e:
+            metrics.inc("request_errors", stage="chat", reason=type(e).__name__)
+            return _responder({"error": f"Falha ao conversar com {provider}: {e}"}, tempos, status_code=400)
+
+        return _responder({
+            "submission_id": submission_id,
+            "transcription": transcription,
+            "reply": reply,
+            "provider": provider,
+        }, tempos)
+
+    # ACTION: evaluate (default) -> transcribe + scoring
+    # common fields added to the scoring result
+    extra = {
+        "user_id": user_id,
+        "transcription_provider": provider,
+        "audio_name": audio_name,
+        "submission_id": submission_id,
+        "transcription": transcription,
+        "transcription_cache": transcription_info.get("cache"),
+        "audio_preprocess": transcription_info.get("preprocess"),
+    }
+    if stream:
+        return _sse(_avaliar_stream(
+            target_word, transcription, ai_scoring, scoring_mode, scoring_provider, language, extra, threshold,
+        ), tempos)
+
+    with tempos.stage("scoring"):
+        score_result = await _pontuar(target_word, transcription, ai_scoring, scoring_mode, scoring_provider, language)
+    tempos.describe("scoring", method=score_result.get("method"), tier=score_result.get("scoring_tier"))
+    score_result.update(extra)
+    return _responder(_aplicar_threshold(score_result, threshold), tempos)
+
+
+async def _avaliar_stream(target_word, transcription, ai_scoring, scoring_mode, scoring_provider, language, extra, threshold):
+    yield sse_event("transcription", {"submission_id": extra["submission_id"], "transcription": transcription})
+    async for evento, dados in _pontuar_stream(target_word, transcription, ai_scoring, scoring_mode, scoring_provider, language):
+        if evento == "result":
+            dados.update(extra)
+            yield sse_event("final", _aplicar_threshold(dados, threshold))
+        else:
+            yield sse_event(evento, dados)
+
+
+# -----------------------
+# Avaliação assíncrona (fila de submissões)
+# -----------------------
+async def processar_submissao(submissao: dict) -> dict:
+    """Processa uma submissão da fila: mesmo resultado que o /avaliar síncrono devolveria."""
+    p = submissao["params"]
+    info = {}
+    try:
+        payload = await asyncio.to_thread(AudioPayload.from_path, submissao["audio_path"], p.get("audio_name"))
+    except (FileNotFoundError, TypeError) as e:
+        raise PermanentSubmissionError(f"Áudio da submissão indisponível: {e}") from e
+    with payload:
+        transcription = await _transcrever_arquivo(payload, p["provider"], info)
+
+    if p["action"] == "transcribe":
+        return {
+            "submission_id": submissao["id"],
+            "transcription": transcription,
+            "status": "done",
+            "provider": p["provider"],
+            "transcription_cache": info.get("cache"),
+            "audio_preprocess": info.get("preprocess"),
+        }
+    if p["action"] == "chat":
+        reply = await _resposta_chat_texto(transcription, p["provider"], p["system"])
+        return {
+            "submission_id": submissao["id"],
+            "transcription": transcription,
+            "reply": reply,
+            "provider": p["provider"],
+        }
+    score_result = await _pontuar(
+        p["target_word"], transcription, p["ai_scoring"], p["scoring_mode"], p["scoring_provider"], p["language"],
+    )
+    score_result.update({
+        "user_id": p["user_id"],
+        "transcription_provider": p["provider"],
+        "audio_name": p["audio_name"],
+        "submission_id": submissao["id"],
+        "transcription": transcription,
+        "transcription_cache": info.get("cache"),
+        "audio_preprocess": info.get("preprocess"),
+    })
+    return _aplicar_threshold(score_result, p["threshold"])
+
+
+async def entregar_webhook(url: str, corpo: dict):
+    client = shared_async_http_client()
+    if client is None:
+        raise RuntimeError("Pacote 'httpx' não instalado: webhook não enviado.")
+    # checa de novo na entrega (o DNS pode ter mudado desde a submissão), conecta no IP
+    # validado (sem segunda resolução) e não segue redirecionamentos
+    alvo, headers, extensions = await asyncio.to_thread(pin_webhook_url, url)
+    resp = await client.post(alvo, json=corpo, headers=headers, extensions=extensions,
+                             timeout=10.0, follow_redirects=False)
+    resp.raise_for_status()
+
+
+submission_worker = SubmissionWorker(
+    submission_queue, processar_submissao, concurrency=SUBMISSION_WORKERS, notify=entregar_webhook,
+)
+
+
+@app.get("/submissions/{submission_id}")
+async def obter_submissao(submission_id: str):
+    """Estado de uma submissão assíncrona: queued | processing | done | error (com `result` quando done)."""
+    submissao = await asyncio.to_thread(submission_queue.get, submission_id)
+    if submissao is None:
+        return JSONResponse({"error": "Submissão não encontrada."}, status_code=404)
+    corpo = {
+        "submission_id": submission_id,
+        "status": submissao["status"],
+        "attempts": submissao["attempts"],
+        "created_at": submissao["created"],
+        "updated_at": submissao["updated"],
+    }
+    if submissao["status"] == "done":
+        corpo["result"] = submissao["result"]
+    if submissao["status"] == "error":
+        corpo["error"] = submissao["error"]
+    if submissao["webhook_url"]:
+        corpo["webhook_status"] = submissao["webhook_status"]
+    return JSONResponse(corpo)
+
+
+# -----------------------
+# Avaliação em tempo real (WebSocket)
+# -----------------------
+# Modelo local usado nas transcrições parciais (precisa estar em LOCAL_STT_PROVIDERS)
+WS_PARTIAL_PROVIDER = os.getenv("WS_PARTIAL_PROVIDER", "faster_whisper").lower()
+
+
+def _parciais_disponiveis() -> bool:
+    if WS_PARTIAL_PROVIDER not in LOCAL_PROVIDERS:
+        return False
+    return WS_PARTIAL_PROVIDER != "faster_whisper" or local_stt.WhisperModel is not None
+
+
+async def _transcrever_parcial(sessao: StreamingAudioSession) -> Optional[str]:
+    janela = sessao.window()
+    if janela is None:
+        return None
+    if isinstance(janela, bytes) and WS_PARTIAL_PROVIDER == "faster_whisper":
+        return await local_stt.run_local(local_stt.transcribe_local_bytes, WS_PARTIAL_PROVIDER, janela)
+    return await local_stt.run_local(local_stt.transcribe_local, WS_PARTIAL_PROVIDER, janela)
+
+
+@app.websocket("/ws/avaliar")
+async def avaliar_ws(websocket: WebSocket):
+    """
+    Avaliação de pronúncia em tempo real.
+
+    **Protocolo:**
+    1. Conectar em /ws/avaliar (campos do /avaliar na query string, ex.: `?target_word=...`)
+       ou enviar como primeira mensagem `{"type": "start", "target_word": ..., "format": "pcm16",
+       "sample_rate": 16000, "provider": ..., "scoring_provider": ...}`
+    2. Enviar o áudio em mensagens binárias enquanto grava ("pcm16" mono recomendado;
+       outros formatos, como webm/opus do MediaRecorder, também são aceitos)
+    3. Receber `{"type": "partial", "transcript": ..., "provisional": {...}}` durante a gravação
+    4. Enviar `{"type": "end"}` ao terminar e receber `{"type": "final", ...}` (mesmo formato do /avaliar)
+    """
+    await websocket.accept()
+    config = {campo: websocket.query_params[campo] for campo in _CAMPOS_AVALIAR if campo in websocket.query_params}
+    config.update({k: websocket.query_params[k] for k in ("format", "sample_rate") if k in websocket.query_params})
+    sessao: Optional[StreamingAudioSession] = None
+    parcial: Optional[asyncio.Task] = None
+    parciais = _parciais_disponiveis()
+
+    async def emitir_parcial():
+        try:
+            transcript = await _transcrever_parcial(sessao)
+        except Exception as e:
+            await websocket.send_json({"type": "error", "stage": "partial", "error": str(e)})
+            return
+        if transcript is not None:
+            await websocket.send_json({
+                "type": "partial",
+                "transcript": transcript,
+                "audio_seconds": sessao.duration_s,
+                "provisional": provisional_score(config.get("target_word") or "", transcript, sessao.windowed),
+            })
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    await websocket.send_json({"type": "error", "error": "Mensagem de controle não é JSON."})
+                    continue
+                if data.get("type") == "end":
+                    break
+                if data.get("type") == "start" and sessao is None:
+                    config.update({k: v for k, v in data.items() if k != "type"})
+                continue
+
+            chunk = message.get("bytes") or b""
+            if sessao is None:
+                try:
+                    sample_rate = int(config.get("sample_rate", 16000))
+                    if sample_rate <= 0:
+                        raise ValueError(sample_rate)
+                except (TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "error": "sample_rate inválido."})
+                    await websocket.close(code=1007)
+                    return
+                sessao = StreamingAudioSession(config.get("format", "pcm16"), sample_rate, config.get("audio_name"))
+                await websocket.send_json({"type": "ready", "partials": parciais, "format": sessao.audio_format})
             try:
-                reply = _resposta_chat_texto(transcription, provider, system)
+                sessao.add(chunk)
+            except BodyTooLarge as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+                await websocket.close(code=1009)
+                return
+            # uma parcial por vez: se a anterior ainda roda, o áudio novo entra na próxima
+            if parciais and (parcial is None or parcial.done()) and sessao.should_emit_partial():
+                sessao.mark_partial()
+                parcial = asyncio.create_task(emitir_parcial())
+
+        if parcial is not None and not parcial.done():
+            parcial.cancel()
+        if sessao is None or sessao.size == 0:
+            await websocket.send_json({"type": "error", "error": "Nenhum áudio recebido."})
+            await websocket.close()
+            return
+
+        # Resultado final: áudio completo pelo fluxo normal (transcrição + avaliação em camadas)
+        provider = str(config.get("provider") or (WS_PARTIAL_PROVIDER if parciais else "gemini")).lower()
+        target_word = config.get("target_word")
+        info = {}
+        with sessao.to_payload() as payload:
+            try:
+                transcription = await _transcrever_arquivo(payload, provider, info)
             except Exception as e:
-                return JSONResponse({"error": f"Falha ao conversar com {provider}: {e}"}, status_code=400)
+                await websocket.send_json({"type": "error", "stage": "final", "error": f"Falha na transcrição ({provider}): {e}"})
+                await websocket.close()
+                return
+        ai_scoring = str(config.get("ai_scoring", "true")).lower() in ["true", "1"]
+        try:
+            score_result = await _pontuar(
+                target_word, transcription, ai_scoring,
+                config.get("scoring_mode", SCORING_MODE),
+                str(config.get("scoring_provider") or "gemini").lower(), config.get("language", "português"),
+            )
+        except Exception as e:
+            await websocket.send_json({"type": "error", "stage": "final", "error": f"Falha na avaliação: {e}"})
+            await websocket.close(code=1011)
+            return
+        score_result.update({
+            "type": "final",
+            "user_id": config.get("user_id"),
+            "submission_id": "sub_" + uuid.uuid4().hex,
+            "transcription": transcription,
+            "transcription_provider": provider,
+            "transcription_cache": info.get("cache"),
+            "audio_seconds": sessao.duration_s,
+            "partials": sessao.partials,
+        })
+        await websocket.send_json(_aplicar_threshold(score_result, config.get("threshold")))
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
+    finally:
+        # qualquer saída (fim, desconexão, erro, limite de tamanho) encerra a parcial em andamento
+        if parcial is not None and not parcial.done():
+            parcial.cancel()
 
-            return JSONResponse({
-                "submission_id": submission_id,
-                "transcription": transcription,
-                "reply": reply,
-                "provider": provider,
-            })
+
+# -----------------------
+# Avaliação em lote (turma inteira em uma requisição)
+# -----------------------
+LOTE_MAX_CONCORRENCIA = int(os.getenv("LOTE_MAX_CONCORRENCIA", "4"))
+LOTE_MAX_ITENS = int(os.getenv("LOTE_MAX_ITENS", "50"))
+# Limite do corpo JSON do lote (o multipart é limitado por arquivo, em MAX_AUDIO_BYTES)
+LOTE_MAX_BODY_BYTES = int(os.getenv("LOTE_MAX_BODY_BYTES", str(MAX_BODY_BYTES)))
+
+
+async def _avaliar_item_lote(index: int, payload: Optional[AudioPayload], audio_name: str, target_word: Optional[str],
+                             opcoes: dict, semaforo: asyncio.Semaphore, erro: Optional[str] = None) -> dict:
+    """Transcreve e avalia um item do lote; erros ficam no próprio item, sem derrubar o lote."""
+    base = {"index": index, "audio_name": audio_name, "target_word": target_word}
+    if erro:
+        return {**base, "status": "error", "stage": "ingest", "error": erro, "elapsed_ms": 0.0}
+
+    async with semaforo:
+        inicio = time.perf_counter()
+        info = {}
+        try:
+            transcription = await _transcrever_arquivo(payload, opcoes["provider"], info)
+        except Exception as e:
+            return {**base, "status": "error", "stage": "transcription",
+                    "error": f"Falha na transcrição ({opcoes['provider']}): {e}",
+                    "elapsed_ms": round((time.perf_counter() - inicio) * 1000, 1)}
         finally:
+            payload.close()
+        try:
+            score_result = await _pontuar(
+                target_word, transcription, opcoes["ai_scoring"], opcoes["scoring_mode"],
+                opcoes["scoring_provider"], opcoes["language"],
+            )
+        except Exception as e:
+            return {**base, "status": "error", "stage": "scoring", "transcription": transcription,
+                    "error": f"Falha na avaliação ({opcoes['scoring_provider']}): {e}",
+                    "elapsed_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+    score_result.update(base)
+    score_result.update({
+        "status": "done",
+        "transcription": transcription,
+        "transcription_provider": opcoes["provider"],
+        "transcription_cache": info.get("cache"),
+        "audio_preprocess": info.get("preprocess"),
+        "elapsed_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    })
+    return _aplicar_threshold(score_result, opcoes["threshold"])
+
+
+def _lista_de_alvos(target_words: Optional[list]) -> list:
+    """Aceita campos repetidos ou um único campo com array JSON."""
+    if not target_words:
+        return []
+    if len(target_words) == 1 and target_words[0].strip().startswith("["):
+        try:
+            return [str(t) for t in json.loads(target_words[0])]
+        except ValueError:
+            pass
+    return list(target_words)
+
+
+async def _ler_entradas_lote(request: Request, audios: Optional[list], target_words: Optional[list],
+                             entradas: list):
+    """
+    Preenche `entradas` com (AudioPayload | None, nome, alvo, erro) a partir do multipart
+    ou do JSON. Retorna o JSON do corpo (opções do lote), None no multipart, ou a
+    JSONResponse de erro. Os payloads já lidos ficam em `entradas` para o chamador fechar.
+    """
+    grande_demais = JSONResponse({"error": f"Lote grande demais: máximo de {LOTE_MAX_ITENS} itens."}, status_code=413)
+
+    if audios:
+        # conta os itens antes de ler qualquer upload
+        if len(audios) > LOTE_MAX_ITENS:
+            return grande_demais
+        alvos = _lista_de_alvos(target_words)
+        if len(alvos) not in (1, len(audios)):
+            return JSONResponse({"error": "Informe um target_word por áudio (ou um único para todos)."}, status_code=400)
+        for i, up in enumerate(audios):
+            nome = up.filename or f"audio_{i}.wav"
             try:
-                os.remove(audio_path)
-            except Exception:
-                pass
+                # em blocos, com o mesmo limite por arquivo do /avaliar
+                payload = await AudioPayload.from_upload(up, nome)
+            except BodyTooLarge as e:
+                metrics.inc("request_errors", stage="ingest", reason="too_large")
+                return JSONResponse({"error": f"{nome}: {e}"}, status_code=413)
+            entradas.append((payload, nome, alvos[i if len(alvos) > 1 else 0], None))
+        return None
 
-    # ACTION: evaluate (default) -> transcribe + scoring
+    if "application/json" not in request.headers.get("content-type", ""):
+        return None
     try:
-        if ai_scoring:
-            score_result = pronunciation_score_with_ai(
-                target_word,
-                transcription,
-                provider=scoring_provider,
-                language=language,
-            )
-        else:
-            score_result = pronunciation_score(target_word, transcription)
-    finally:
+        j = await read_json_bounded(request.stream(), LOTE_MAX_BODY_BYTES)
+    except BodyTooLarge as e:
+        metrics.inc("request_errors", stage="ingest", reason="too_large")
+        return JSONResponse({"error": str(e)}, status_code=413)
+    except ValueError:
+        return JSONResponse({"error": "Corpo JSON inválido (esperado um objeto)."}, status_code=400)
+    items = j.get("items") or []
+    if not isinstance(items, list):
+        return JSONResponse({"error": "`items` deve ser uma lista."}, status_code=400)
+    if len(items) > LOTE_MAX_ITENS:
+        return grande_demais
+    for i, item in enumerate(items):
+        audio = item.get("audio") if isinstance(item, dict) else None
+        if not isinstance(item, dict) or not isinstance(audio or {}, dict):
+            return JSONResponse({"error": f"Item {i} inválido: esperado um objeto, com `audio` objeto."}, status_code=400)
+        audio = audio or {}
+        audio_b64 = item.get("audio_base64") or audio.get("base64")
+        nome = str(item.get("audio_name") or audio.get("name") or f"audio_{i}.wav")
+        payload, erro = None, None
         try:
-            os.remove(audio_path)
+            data = base64.b64decode(audio_b64 or "", validate=False)
+            if data:
+                payload = AudioPayload.from_bytes(data, nome)
+            else:
+                erro = "Item sem audio_base64."
         except Exception:
-            pass
+            erro = "Campo audio_base64 inválido (não é base64)."
+        entradas.append((payload, nome, item.get("target_word"), erro))
+    return j
 
-    # enrich result with common fields
-    score_result["user_id"] = user_id
-    score_result["transcription_provider"] = provider
-    score_result["audio_name"] = audio.filename
-    score_result["submission_id"] = submission_id
-    score_result["transcription"] = transcription
 
-    # compute pass if threshold provided and numeric score is present
+@app.post("/avaliar/lote")
+async def avaliar_lote(
+    request: Request,
+    audios: Optional[list[UploadFile]] = File(None),
+    target_words: Optional[list[str]] = Form(None),
+    user_id: Optional[str] = Form(None),
+    ai_scoring: bool = Form(True),
+    provider: str = Form("gemini"),
+    scoring_provider: str = Form("gemini"),
+    scoring_mode: str = Form(SCORING_MODE),
+    threshold: Optional[float] = Form(None),
+    language: str = Form("português"),
+):
+    """
+    📚 Avalia várias gravações (ex.: a turma inteira) em uma única requisição.
+
+    **Entrada (uma das duas):**
+    - multipart: vários arquivos em `audios` + `target_words` (campo repetido, um por
+      áudio, ou um array JSON; um único alvo vale para todos)
+    - JSON: {"items": [{"audio_base64", "audio_name", "target_word"}, ...], "provider", ...}
+
+    Os itens são transcritos e avaliados em paralelo, no máximo LOTE_MAX_CONCORRENCIA
+    ao mesmo tempo. Retorna o resultado de cada item (na ordem de envio) e o tempo total.
+    Itens com falha trazem `stage` (ingest, transcription ou scoring) e `error`.
+    Cada arquivo do multipart é limitado a MAX_AUDIO_BYTES e o corpo JSON a
+    LOTE_MAX_BODY_BYTES (413 acima disso).
+    """
+    inicio = time.perf_counter()
+    entradas = []  # (AudioPayload | None, nome, alvo, erro)
     try:
-        if threshold is not None and isinstance(score_result.get("score"), (int, float)):
-            score_result["pass"] = float(score_result.get("score")) >= float(threshold)
-    except Exception:
-        pass
+        resposta = await _ler_entradas_lote(request, audios, target_words, entradas)
+        if isinstance(resposta, JSONResponse):
+            return resposta
+        j = resposta or {}
+        user_id = j.get("user_id", user_id)
+        ai_scoring = ai_scoring if ("ai_scoring" not in j) else (str(j.get("ai_scoring")).lower() in ["true", "1"])
+        provider = j.get("provider", provider)
+        scoring_provider = j.get("scoring_provider", scoring_provider)
+        scoring_mode = j.get("scoring_mode", scoring_mode)
+        threshold = j.get("threshold", threshold)
+        language = j.get("language", language)
 
-    # Garantir que o campo `match` exista (compatibilidade com método tradicional)
-    if "match" not in score_result:
-        score_result["match"] = bool(score_result.get("hit", False))
+        if not entradas:
+            return JSONResponse({"error": "Nenhum áudio enviado (use `audios` no multipart ou `items` no JSON)."}, status_code=400)
+
+        opcoes = {
+            "provider": (provider or "gemini").lower(),
+            "ai_scoring": ai_scoring,
+            "scoring_provider": (scoring_provider or "gemini").lower(),
+            "scoring_mode": scoring_mode,
+            "language": language,
+            "threshold": threshold,
+        }
+        semaforo = asyncio.Semaphore(max(1, LOTE_MAX_CONCORRENCIA))
+        results = await asyncio.gather(*[
+            _avaliar_item_lote(i, payload, nome, alvo, opcoes, semaforo, erro)
+            for i, (payload, nome, alvo, erro) in enumerate(entradas)
+        ])
+    finally:
+        # recusa no meio da leitura ou cancelamento: nenhum áudio fica em memória/disco
+        for payload, *_ in entradas:
+            if payload is not None:
+                payload.close()
 
-    return JSONResponse(score_result)
+    ok = [r for r in results if r.get("status") == "done"]
+    scores = [float(r["score"]) for r in ok if isinstance(r.get("score"), (int, float))]
+    tempos = [r["elapsed_ms"] for r in results]
+    return JSONResponse({
+        "batch_id": "lote_" + uuid.uuid4().hex,
+        "user_id": user_id,
+        "count": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "average_score": round(sum(scores) / len(scores), 1) if scores else None,
+        "results": results,
+        "timing": {
+            "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "sum_item_ms": round(sum(tempos), 1),
+            "max_item_ms": max(tempos) if tempos else 0.0,
+            "max_concurrency": LOTE_MAX_CONCORRENCIA,
+        },
+    })
 
 @app.post("/falar")
 async def falar(
     audio: UploadFile = Form(...),
     provider: str = Form("openai"),  # openai | gemini
     system: str = Form("Você é um assistente útil que responde de forma curta."),
+    timings: bool = Form(False),
 ):
     """
     Fala com o modelo via áudio: transcreve e envia ao LLM selecionado.
-    Retorna { transcript, reply }.
+    Retorna { transcript, reply } (e `timings`, com timings=true).
     """
+    tempos = RequestTimings(include=timings)
     try:
-        transcript = await _transcrever_upload(audio, provider)
+        transcript = await _transcrever_upload(audio, provider, tempos)
     except Exception as e:
-        return JSONResponse({"error": f"Falha na transcrição ({provider}): {e}"}, status_code=400)
+        return _responder({"error": f"Falha na transcrição ({provider}): {e}"}, tempos, status_code=400)
 
     try:
-        reply = _resposta_chat_texto(transcript, provider, system)
+        reply = await _resposta_chat_texto(transcript, provider, system, tempos)
     except Exception as e:
-        return JSONResponse({"error": f"Falha ao conversar com {provider}: {e}"}, status_code=400)
+        return _responder({"error": f"Falha ao conversar com {provider}: {e}"}, tempos, status_code=400)
 
-    return JSONResponse({"transcript": transcript, "reply": reply})
+    return _responder({"transcript": transcript, "reply": reply}, tempos)
 
 @app.post("/transcrever")
 async def transcrever(
     audio: UploadFile = Form(...),
     provider: str = Form("whisper"),  # whisper | openai | gemini
+    timings: bool = Form(False),
 ):
     """
     Teste simples: retorna apenas a transcrição do áudio.
     """
+    tempos = RequestTimings(include=timings)
     try:
-        transcript = await _transcrever_upload(audio, provider)
-        return JSONResponse({"transcript": transcript})
+        transcript = await _transcrever_upload(audio, provider, tempos)
+        return _responder({"transcript": transcript}, tempos)
     except Exception as e:
-        return JSONResponse({"error": f"Falha na transcrição ({provider}): {e}"}, status_code=400)
+        return _responder({"error": f"Falha na transcrição ({provider}): {e}"}, tempos, status_code=400)
 
 @app.post("/chat_texto")
 async def chat_texto(
+    request: Request,
     message: str = Form(...),
     provider: str = Form("openai"),  # openai | gemini
     system: str = Form("Você é um assistente útil que responde de forma curta."),
+    stream: bool = Form(False),
+    timings: bool = Form(False),
 ):
     """
     Teste simples: conversa via texto com o LLM (sem áudio).
+    Com stream=true, responde em SSE: eventos "token" e "done" com { reply }.
     """
+    tempos = RequestTimings(include=timings)
+    if wants_stream(stream, request.headers.get("accept")):
+        return _sse(_sse_chat(message, provider, system), tempos)
     try:
-        reply = _resposta_chat_texto(message, provider, system)
-        return JSONResponse({"reply": reply})
+        reply = await _resposta_chat_texto(message, provider, system, tempos)
+        return _responder({"reply": reply}, tempos)
     except Exception as e:
-        return JSONResponse({"error": f"Falha ao conversar com {provider}: {e}"}, status_code=400)
+        return _responder({"error": f"Falha ao conversar com {provider}: {e}"}, tempos, status_code=400)
 
 @app.post("/tutor_pronuncia")
 async def tutor_pronuncia(
+    request: Request,
     message: str = Form(...),
     provider: str = Form("openai"),  # openai | gemini
+    stream: bool = Form(False),
 ):
     """
     🎓 NOVO: Tutor de pronúncia interativo via texto.
     
     Conversa natural sobre pronúncia, dúvidas, dicas, exercícios.
     Exemplo: "Como pronunciar 'through'?" ou "Tenho dificuldade com R em inglês"
+    Com stream=true, a resposta chega em SSE (eventos "token" e "done").
     """
     system_prompt = """Você é um professor de pronúncia especializado e paciente.
 
@@ -452,8 +1368,10 @@ FORMATO:
 - Use bullets quando listar dicas
 - Destaque sons problemáticos com **negrito**"""
 
+    if wants_stream(stream, request.headers.get("accept")):
+        return _sse(_sse_chat(message, provider, system_prompt, provider=provider, mode="tutor"))
     try:
-        reply = _resposta_chat_texto(message, provider, system_prompt)
+        reply = await _resposta_chat_texto(message, provider, system_prompt)
         return JSONResponse({
             "reply": reply,
             "provider": provider,
@@ -694,14 +1612,18 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "/avaliar": "Avaliar pronúncia com feedback de IA (POST)",
+            "/avaliar/lote": "Avaliar várias gravações em uma requisição (POST)",
+            "/submissions/{id}": "Resultado de uma avaliação assíncrona (GET)",
+            "/ws/avaliar": "Avaliação em tempo real com transcrição parcial (WebSocket)",
             "/falar": "Conversar via áudio com IA (POST)",
             "/transcrever": "Apenas transcrever áudio (POST)",
             "/chat_texto": "Chat via texto (POST)",
             "/tutor_pronuncia": "Tutor interativo de pronúncia (POST)",
+            "/status": "Estado interno (clientes de provedores, contadores)",
             "/docs": "Documentação interativa Swagger"
         },
         "providers": {
-            "transcription": ["whisper", "openai", "gemini"],
+            "transcription": ["whisper", "openai", "gemini", "faster_whisper"],
             "scoring": ["openai", "gemini"],
             "chat": ["openai", "gemini"]
         },
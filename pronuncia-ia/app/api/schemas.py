@@ -22,6 +22,9 @@ class EvaluateResponse(BaseModel):
     user_id: Optional[str] = None
     transcription_provider: Optional[str] = None
     audio_name: Optional[str] = None
+    transcription_cache: Optional[str] = None  # hit | miss | bypass
+    audio_preprocess: Optional[dict] = None  # bytes economizados no upload (bytes_saved, codec, ...)
+    scoring_tier: Optional[str] = None  # local-exact | local-high | local-low | ai | levenshtein
 
 
 class TranscribeResponse(BaseModel):
@@ -0,0 +1,412 @@
+"""
+Ingestão de áudio sem arquivo temporário.
+
+O upload fica em memória enquanto for pequeno e só vai para o disco acima de
+AUDIO_SPOOL_MAX_BYTES. Transcritores que aceitam bytes (`transcribe_bytes`)
+recebem o conteúdo direto da memória; só os que exigem caminho de arquivo
+(modelos locais) fazem o áudio ser gravado em disco, sob demanda.
+O SHA-256 é calculado durante a escrita, sem uma segunda leitura do áudio.
+
+Também decodifica corpos JSON com áudio em base64 de forma incremental
+(`read_json_with_audio`): o base64 nunca fica inteiro em memória, só o áudio
+decodificado.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from typing import AsyncIterator, Optional
+
+try:
+    from app.core import metrics
+except ImportError:
+    import metrics
+
+AUDIO_SPOOL_MAX_BYTES = int(os.getenv("AUDIO_SPOOL_MAX_BYTES", str(4 * 1024 * 1024)))
+# Limite de tamanho do áudio decodificado e do corpo da requisição (base64 ocupa ~33% a mais)
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(MAX_AUDIO_BYTES * 4 // 3 + 64 * 1024)))
+_READ_CHUNK = 256 * 1024
+
+# Caminhos (a partir da raiz do JSON) cujo valor é o áudio em base64:
+# {"audio_base64": ...} ou {"audio": {"base64": ...}}; chaves iguais em outros níveis são metadados
+AUDIO_BASE64_PATHS = ((b"audio_base64",), (b"audio", b"base64"))
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+# escapes de string JSON de um caractere (\uXXXX é tratado à parte)
+_JSON_ESCAPES = {ord("/"): b"/", ord("\\"): b"\\", ord('"'): b'"', ord("b"): b"\b", ord("f"): b"\f",
+                 ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t"}
+
+
+class BodyTooLarge(ValueError):
+    """Corpo da requisição ou áudio acima do limite configurado."""
+
+
+class AudioDecodeError(ValueError):
+    """Áudio em base64 inválido."""
+
+
+class AudioPayload:
+    def __init__(self, name: Optional[str] = None, mime: Optional[str] = None,
+                 spool_max: int = AUDIO_SPOOL_MAX_BYTES, max_bytes: Optional[int] = MAX_AUDIO_BYTES):
+        self.rename(name, mime)
+        self.size = 0
+        self.max_bytes = max_bytes
+        self._spool_max = spool_max
+        self._buffer = bytearray()
+        self._data: Optional[bytes] = None     # conteúdo imutável (evita copiar mais de uma vez)
+        self._hash = hashlib.sha256()
+        self._file = None                      # arquivo de spool (acima do limite)
+        self._path: Optional[str] = None       # caminho em disco, se houver
+        self._owns_path = True
+
+    # ---------------------------------------------------------------- criação
+    def rename(self, name: Optional[str] = None, mime: Optional[str] = None):
+        """Define nome e MIME (no JSON o nome pode chegar depois do áudio)."""
+        self.name = name or "audio.wav"
+        self.mime = mime if mime and mime.startswith("audio/") else (mimetypes.guess_type(self.name)[0] or "audio/wav")
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: Optional[str] = None, mime: Optional[str] = None) -> "AudioPayload":
+        payload = cls(name, mime, spool_max=max(len(data), AUDIO_SPOOL_MAX_BYTES), max_bytes=None)
+        payload._data = bytes(data)
+        payload._hash.update(payload._data)
+        payload.size = len(payload._data)
+        return payload
+
+    @classmethod
+    def from_path(cls, path: str, name: Optional[str] = None, mime: Optional[str] = None) -> "AudioPayload":
+        """Envolve um arquivo já existente (não é removido no close)."""
+        payload = cls(name or os.path.basename(path), mime)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+                payload._hash.update(chunk)
+                payload.size += len(chunk)
+        payload._path = path
+        payload._owns_path = False
+        return payload
+
+    @classmethod
+    async def from_upload(cls, upload, name: Optional[str] = None) -> "AudioPayload":
+        """Lê um UploadFile em blocos, sem carregar tudo de uma vez."""
+        payload = cls(name or upload.filename, getattr(upload, "content_type", None))
+        try:
+            while True:
+                chunk = await upload.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                payload.write(chunk)
+        except BodyTooLarge:
+            payload.close()
+            raise
+        return payload
+
+    @classmethod
+    async def from_stream(cls, stream: AsyncIterator[bytes], name: Optional[str] = None,
+                          mime: Optional[str] = None) -> "AudioPayload":
+        """Corpo binário cru (application/octet-stream ou audio/*), lido à medida que chega."""
+        payload = cls(name, mime)
+        try:
+            async for chunk in stream:
+                if chunk:
+                    payload.write(chunk)
+        except BodyTooLarge:
+            payload.close()
+            raise
+        return payload
+
+    def clone(self) -> "AudioPayload":
+        """Cópia independente (buffer ou spool próprio): fechar uma não apaga o arquivo da outra."""
+        if self._path is None or self._data is not None:
+            return AudioPayload.from_bytes(self.data(), self.name, self.mime)
+        if self._file is not None:
+            self._file.flush()
+        copia = AudioPayload(self.name, self.mime, spool_max=self._spool_max, max_bytes=None)
+        with open(self._path, "rb") as f:
+            for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+                copia.write(chunk)
+        return copia
+
+    # ---------------------------------------------------------------- escrita
+    def write(self, chunk: bytes):
+        if self._data is not None:
+            raise RuntimeError("AudioPayload já finalizado.")
+        if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+            raise BodyTooLarge(f"Áudio maior que o limite de {self.max_bytes} bytes.")
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self._spool_max:
+            self._spill()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+
+    def _spill(self):
+        """Passa do buffer em memória para um arquivo temporário."""
+        suffix = os.path.splitext(self.name)[1] or ".wav"
+        with metrics.timer("tempfile_write_duration_ms", reason="spool"):
+            self._file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+            self._path = self._file.name
+            self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+    # ---------------------------------------------------------------- leitura
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._file is None and (self._data is not None or self._path is None)
+
+    def data(self) -> bytes:
+        """Conteúdo completo em bytes (sem cópia extra quando já está em memória)."""
+        if self._data is not None:
+            return self._data
+        if self._path is not None:
+            if self._file is not None:
+                self._file.flush()
+            with open(self._path, "rb") as f:
+                return f.read()
+        self._data = bytes(self._buffer)
+        self._buffer = bytearray()
+        return self._data
+
+    def path(self) -> str:
+        """Caminho em disco, gravando o áudio apenas se ainda estiver só em memória."""
+        if self._path is None:
+            suffix = os.path.splitext(self.name)[1] or ".wav"
+            with metrics.timer("tempfile_write_duration_ms", reason="path"):
+                fd, self._path = tempfile.mkstemp(suffix=suffix)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self.data())
+        elif self._file is not None:
+            self._file.flush()
+        return self._path
+
+    # ---------------------------------------------------------------- limpeza
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+        if self._path and self._owns_path:
+            try:
+                os.remove(self._path)
+            except Exception:
+                pass
+        self._path = None
+        self._buffer = bytearray()
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Base64StreamDecoder:
+    """
+    Decodifica base64 recebido em pedaços, repassando os bytes para `sink`.
+    Como `b64decode(validate=False)` (o caminho antigo, com json.loads), bytes fora do
+    alfabeto, como espaços e quebras de linha, são descartados em vez de recusados.
+    """
+
+    _IGNORED = bytes(c for c in range(256) if c not in _BASE64_ALPHABET)
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._rest = b""
+        self._padded = False
+
+    def feed(self, data: bytes):
+        data = self._rest + data.translate(None, self._IGNORED)
+        usable = len(data) - len(data) % 4
+        self._rest = data[usable:]
+        if usable:
+            self._decode(data[:usable])
+
+    def _decode(self, data: bytes):
+        if self._padded:
+            raise AudioDecodeError("Dados após o padding do base64.")
+        try:
+            decoded = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise AudioDecodeError(str(e)) from e
+        self._padded = data.endswith(b"=")
+        self._sink(decoded)
+
+    def finish(self):
+        if self._rest:
+            # tolera base64 sem padding no final
+            self._decode(self._rest + b"=" * (-len(self._rest) % 4))
+            self._rest = b""
+
+
+class JSONAudioExtractor:
+    """
+    Lê um corpo JSON em pedaços e desvia o valor de `audio_base64` / `audio.base64`
+    (só nesses caminhos, a partir da raiz) para um Base64StreamDecoder, sem nunca
+    montar a string base64 inteira. Escapes de string (\\/, \\uXXXX...) são desfeitos
+    antes da decodificação. O restante do JSON (metadados, pequeno) é acumulado e
+    parseado no final, com o campo de áudio substituído por "".
+    """
+
+    def __init__(self, payload: "AudioPayload"):
+        self.payload = payload
+        self._decoder = Base64StreamDecoder(payload.write)
+        self._meta = bytearray()
+        self._in_string = False
+        self._in_audio = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = b""
+        self._after_colon = False
+        self._audio_seen = False
+        self._path: list = []          # chave atual de cada objeto/array aberto ("[" para arrays)
+        self._unicode: Optional[bytearray] = None  # dígitos de um \uXXXX dentro do áudio
+
+    def feed(self, chunk: bytes):
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._in_audio:
+                i = self._feed_audio(chunk, i)
+                continue
+            c = chunk[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == 0x5C:  # \
+                    self._escape = True
+                elif c == 0x22:  # "
+                    self._in_string = False
+                    self._last_string = bytes(self._meta[self._string_start:])
+                self._meta.append(c)
+                i += 1
+                continue
+            if c == 0x22:
+                if self._after_colon and tuple(self._path) in AUDIO_BASE64_PATHS:
+                    if self._audio_seen:
+                        raise AudioDecodeError("Mais de um campo de áudio no JSON.")
+                    self._audio_seen = True
+                    self._in_audio = True
+                    self._meta += b'"'
+                else:
+                    self._in_string = True
+                    self._meta.append(c)
+                    self._string_start = len(self._meta)
+                self._after_colon = False
+                i += 1
+                continue
+            if c == 0x3A:  # :
+                self._after_colon = True
+                if self._path:
+                    self._path[-1] = self._last_string
+            elif c not in (0x20, 0x09, 0x0A, 0x0D):
+                self._after_colon = False
+                if c == 0x7B:  # {
+                    self._path.append(None)
+                elif c == 0x5B:  # [
+                    self._path.append(b"[")
+                elif c in (0x7D, 0x5D) and self._path:  # } ]
+                    self._path.pop()
+            self._meta.append(c)
+            i += 1
+
+    def _feed_audio(self, chunk: bytes, i: int) -> int:
+        """Consome o conteúdo da string de áudio a partir de `i`; retorna a nova posição."""
+        if self._unicode is not None:
+            # \uXXXX: os 4 dígitos podem chegar em pedaços diferentes
+            take = chunk[i:i + 4 - len(self._unicode)]
+            self._unicode += take
+            if len(self._unicode) == 4:
+                try:
+                    char = chr(int(self._unicode, 16))
+                except ValueError:
+                    raise AudioDecodeError("Escape \\u inválido no áudio.")
+                self._unicode = None
+                self._decoder.feed(char.encode("utf-8"))
+            return i + len(take)
+        if self._escape:
+            self._escape = False
+            if chunk[i] == 0x75:  # u
+                self._unicode = bytearray()
+            else:
+                # alguns encoders escapam "/" como "\/"; \n, \r, \t são quebras de linha do base64
+                self._decoder.feed(_JSON_ESCAPES.get(chunk[i], chunk[i:i + 1]))
+            return i + 1
+        end = chunk.find(b'"', i)
+        stop = end if end != -1 else len(chunk)
+        backslash = chunk.find(b"\\", i, stop)
+        if backslash != -1:
+            self._decoder.feed(chunk[i:backslash])
+            self._escape = True
+            return backslash + 1
+        self._decoder.feed(chunk[i:stop])
+        if end == -1:
+            return len(chunk)
+        self._decoder.finish()
+        self._in_audio = False
+        self._meta += b'"'
+        self._last_string = b""
+        return end + 1
+
+    def finish(self) -> dict:
+        if self._in_audio or self._in_string:
+            raise ValueError("JSON incompleto.")
+        data = json.loads(bytes(self._meta))
+        if not isinstance(data, dict):
+            raise ValueError("O corpo JSON deve ser um objeto.")
+        return data
+
+    @property
+    def has_audio(self) -> bool:
+        return self._audio_seen
+
+
+async def read_json_with_audio(stream: AsyncIterator[bytes], max_body: int = MAX_BODY_BYTES) -> tuple:
+    """
+    Lê o corpo JSON do stream decodificando o áudio em base64 de forma incremental.
+    Retorna (dados_json, AudioPayload | None). O payload deve ser fechado pelo chamador.
+    Levanta BodyTooLarge, AudioDecodeError ou ValueError (JSON inválido).
+    """
+    payload = AudioPayload()
+    extractor = JSONAudioExtractor(payload)
+    total = 0
+    try:
+        async for chunk in stream:
+            total += len(chunk)
+            if total > max_body:
+                raise BodyTooLarge(f"Corpo da requisição maior que o limite de {max_body} bytes.")
+            extractor.feed(chunk)
+        data = extractor.finish()
+    except Exception:
+        payload.close()
+        raise
+    if not extractor.has_audio or payload.size == 0:
+        payload.close()
+        return data, None
+    return data, payload
+
+
+async def read_json_bounded(stream: AsyncIterator[bytes], max_body: int = MAX_BODY_BYTES) -> dict:
+    """
+    Lê um corpo JSON (objeto) inteiro, recusando-o assim que passar de `max_body`.
+    Para corpos com vários áudios (ex.: /avaliar/lote), em que o extrator incremental
+    de um único campo não se aplica. Levanta BodyTooLarge ou ValueError.
+    """
+    body = bytearray()
+    async for chunk in stream:
+        if len(body) + len(chunk) > max_body:
+            raise BodyTooLarge(f"Corpo da requisição maior que o limite de {max_body} bytes.")
+        body += chunk
+    data = json.loads(bytes(body))
+    if not isinstance(data, dict):
+        raise ValueError("O corpo JSON deve ser um objeto.")
+    return data
@@ -0,0 +1,234 @@
+"""
+Pré-processamento do áudio antes do envio aos provedores de transcrição.
+
+Os clientes gravam em 44.1/48 kHz estéreo, mas os modelos de fala trabalham
+em 16 kHz mono. Aqui o áudio é decodificado, convertido para mono,
+reamostrado, tem o silêncio do início e do fim removido e é recodificado
+(WAV PCM16, FLAC ou Opus), o que reduz bastante o upload. Se algo falhar
+(formato não suportado, dependência ausente) o áudio original segue como está.
+
+Configuração (variáveis de ambiente):
+- AUDIO_PREPROCESS_PROVIDERS: provedores que recebem o áudio pré-processado
+  (opt-in: padrão vazio, todos recebem o áudio original, como antes)
+- AUDIO_PREPROCESS_SAMPLE_RATE: taxa de saída (padrão 16000)
+- AUDIO_PREPROCESS_TRIM_DB: limiar do corte de silêncio abaixo do pico (padrão 40; 0 desliga)
+- AUDIO_PREPROCESS_CODEC: "flac" (padrão), "wav" ou "opus"; pode ser sobrescrito
+  por provedor em AUDIO_PREPROCESS_CODEC_<PROVEDOR> (ex.: AUDIO_PREPROCESS_CODEC_OPENAI=wav)
+"""
+import io
+import os
+import time
+import wave
+from typing import Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    import soundfile as sf
+except Exception:
+    sf = None
+
+try:
+    import librosa
+except Exception:
+    librosa = None
+
+try:
+    from app.core.audio_input import AudioPayload
+except Exception:
+    from audio_input import AudioPayload
+
+# codec -> (formato/subtipo do soundfile, extensão, MIME)
+CODECS = {
+    "wav": (None, ".wav", "audio/wav"),
+    "flac": (("FLAC", "PCM_16"), ".flac", "audio/flac"),
+    "opus": (("OGG", "OPUS"), ".ogg", "audio/ogg"),
+}
+_TRIM_FRAME_MS = 20
+_TRIM_PAD_MS = 150  # folga mantida antes/depois da fala para não cortar consoantes fracas
+
+
+def preprocess_config(provider: str) -> Optional[dict]:
+    """Configuração do pré-processamento para o provedor, ou None se desligado para ele."""
+    providers = os.getenv("AUDIO_PREPROCESS_PROVIDERS", "")
+    enabled = {p.strip().lower() for p in providers.split(",") if p.strip()}
+    provider = (provider or "").lower()
+    if provider not in enabled:
+        return None
+    codec = os.getenv(f"AUDIO_PREPROCESS_CODEC_{provider.upper()}", os.getenv("AUDIO_PREPROCESS_CODEC", "flac"))
+    codec = codec.strip().lower()
+    return {
+        "sample_rate": int(os.getenv("AUDIO_PREPROCESS_SAMPLE_RATE", "16000")),
+        "trim_db": float(os.getenv("AUDIO_PREPROCESS_TRIM_DB", "40")),
+        "codec": codec if codec in CODECS else "wav",
+    }
+
+
+def config_signature(config: Optional[dict]) -> str:
+    """Identifica a configuração (entra na chave do cache de transcrição)."""
+    if not config:
+        return "original"
+    return f"{config['codec']}:{config['sample_rate']}:{config['trim_db']:g}"
+
+
+# ---------------------------------------------------------------- etapas
+def decode_audio(data: bytes, name: str = "audio.wav"):
+    """Decodifica para float32 com formato (amostras, canais). Retorna (sinal, taxa) ou None."""
+    if np is None:
+        return None
+    if sf is not None:
+        try:
+            samples, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            return samples, sr
+        except Exception:
+            pass
+    decoded = _decode_wav(data)
+    if decoded is not None:
+        return decoded
+    if librosa is not None:
+        # mp3/m4a e outros formatos que o libsndfile não lê (via audioread/ffmpeg)
+        try:
+            samples, sr = librosa.load(io.BytesIO(data), sr=None, mono=False)
+            samples = np.atleast_2d(samples).T.astype(np.float32)
+            return samples, sr
+        except Exception:
+            pass
+    return None
+
+
+def _decode_wav(data: bytes):
+    """WAV PCM de 8/16/32 bits só com a biblioteca padrão + numpy."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            width, channels, sr = w.getsampwidth(), w.getnchannels(), w.getframerate()
+            frames = w.readframes(w.getnframes())
+    except Exception:
+        return None
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        return None
+    return samples.reshape(-1, channels), sr
+
+
+def downmix(samples):
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples, sr_from: int, sr_to: int):
+    if sr_from == sr_to or len(samples) == 0:
+        return samples
+    if librosa is not None:
+        return librosa.resample(samples, orig_sr=sr_from, target_sr=sr_to).astype(np.float32)
+    # sem librosa: interpolação linear (suficiente para fala em 16 kHz)
+    n_out = int(round(len(samples) * sr_to / sr_from))
+    positions = np.arange(n_out) * (sr_from / sr_to)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_silence(samples, sr: int, top_db: float):
+    """Remove o silêncio do início e do fim (quadros com RMS `top_db` abaixo do pico)."""
+    frame = max(1, int(sr * _TRIM_FRAME_MS / 1000))
+    n_frames = len(samples) // frame
+    if top_db <= 0 or n_frames == 0:
+        return samples
+    rms = np.sqrt(np.mean(samples[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    peak = float(rms.max())
+    if peak <= 0:
+        return samples
+    voiced = np.flatnonzero(rms >= peak * 10 ** (-top_db / 20))
+    pad = int(sr * _TRIM_PAD_MS / 1000)
+    start = max(0, int(voiced[0]) * frame - pad)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + pad)
+    return samples[start:end]
+
+
+def encode_audio(samples, sr: int, codec: str) -> tuple:
+    """Codifica o sinal mono. Retorna (bytes, codec efetivo); sem soundfile cai para WAV."""
+    spec = CODECS.get(codec, CODECS["wav"])[0]
+    if spec is not None and sf is not None:
+        try:
+            buffer = io.BytesIO()
+            sf.write(buffer, samples, sr, format=spec[0], subtype=spec[1])
+            return buffer.getvalue(), codec
+        except Exception:
+            pass  # libsndfile sem suporte ao codec (ex.: Opus em versões antigas)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return buffer.getvalue(), "wav"
+
+
+# ---------------------------------------------------------------- pipeline
+def preprocess_bytes(data: bytes, name: str, config: dict) -> tuple:
+    """
+    Decodifica, converte para mono, reamostra, corta o silêncio e recodifica.
+    Retorna (bytes, nome, mime, info). Quando não dá para processar, ou o
+    resultado não fica menor, devolve os bytes originais com info["applied"] = False.
+    """
+    inicio = time.perf_counter()
+    info = {"applied": False, "original_bytes": len(data), "bytes": len(data), "bytes_saved": 0}
+
+    def _fim(reason: Optional[str] = None):
+        info["elapsed_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        if reason:
+            info["reason"] = reason
+        return data, name, None, info
+
+    if np is None:
+        return _fim("numpy indisponível")
+    decoded = decode_audio(data, name)
+    if decoded is None:
+        return _fim("formato não suportado")
+    samples, sr = decoded
+    info.update(original_sample_rate=sr, original_channels=int(samples.shape[1]))
+
+    mono = downmix(samples)
+    mono = resample(mono, sr, config["sample_rate"])
+    duration = len(mono) / config["sample_rate"]
+    mono = trim_silence(mono, config["sample_rate"], config["trim_db"])
+    if len(mono) == 0:
+        return _fim("áudio vazio")
+    encoded, codec = encode_audio(mono, config["sample_rate"], config["codec"])
+    if len(encoded) >= len(data):
+        return _fim("sem ganho de tamanho")
+
+    _, ext, mime = CODECS[codec]
+    info.update(
+        applied=True,
+        codec=codec,
+        sample_rate=config["sample_rate"],
+        bytes=len(encoded),
+        bytes_saved=len(data) - len(encoded),
+        duration_s=round(len(mono) / config["sample_rate"], 3),
+        trimmed_s=round(duration - len(mono) / config["sample_rate"], 3),
+    )
+    info["elapsed_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    return encoded, os.path.splitext(name)[0] + ext, mime, info
+
+
+def preprocess_payload(payload: AudioPayload, config: Optional[dict], info: Optional[dict] = None) -> AudioPayload:
+    """
+    Aplica o pré-processamento a um AudioPayload. Retorna um novo payload (que o
+    chamador deve fechar) ou o próprio `payload` quando nada mudou.
+    Roda em CPU: chamar via asyncio.to_thread em código assíncrono.
+    """
+    if not config:
+        return payload
+    data, name, mime, details = preprocess_bytes(payload.data(), payload.name, config)
+    if info is not None:
+        info["preprocess"] = details
+    if not details["applied"]:
+        return payload
+    return AudioPayload.from_bytes(data, name, mime)
@@ -0,0 +1,347 @@
+"""
+Cache em dois níveis: LRU em memória (por processo) + SQLite em disco
+(compartilhado entre os workers do uvicorn).
+
+Os valores precisam ser serializáveis em JSON. Ambos os níveis têm TTL e
+despejo por tamanho (número de entradas / bytes ocupados).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+_MISSING = object()
+
+
+def make_key(*parts) -> str:
+    """Chave estável a partir de várias partes (ex.: hash do áudio, provedor, modelo)."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """LRU em memória, seguro para threads, limitado por entradas e por bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()  # chave -> (valor, tamanho, expira_em)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, size, expires = entry
+            if expires and expires <= time.time():
+                del self._data[key]
+                self._bytes -= size
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, size: Optional[int] = None):
+        size = size if size is not None else len(json.dumps(value, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+        expires = time.time() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size, expires)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class SQLiteCache:
+    """
+    Cache persistente em SQLite (modo WAL), seguro para vários processos.
+    Despeja as entradas acessadas há mais tempo quando passa de `max_bytes`.
+
+    O total de bytes fica numa linha de `cache_meta`, mantida por triggers na
+    mesma transação de cada escrita: o `set` não soma a tabela inteira. Entradas
+    vencidas (TTL) são varridas a cada `sweep_s` segundos ou quando o orçamento estoura.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None,
+                 sweep_s: float = 60.0):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_s = sweep_s
+        self._last_sweep = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # bancos criados antes do contador: soma uma única vez
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (name, value)"
+                " SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM cache"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache BEGIN"
+                " UPDATE cache_meta SET value = value + NEW.size WHERE name = 'total_bytes'; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache BEGIN"
+                " UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes'; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache BEGIN"
+                " UPDATE cache_meta SET value = value - OLD.size WHERE name = 'total_bytes'; END"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default=None):
+        conn = self._conn()
+        row = conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        now = time.time()
+        if self.ttl and row[1] + self.ttl <= now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return default
+        conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        # upsert (e não REPLACE): a troca de valor dispara o trigger de UPDATE e o total fica certo
+        conn.execute(
+            "INSERT INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+            " created = excluded.created, accessed = excluded.accessed",
+            (key, payload, size, now, now),
+        )
+        if self.total_bytes() > self.max_bytes:
+            self._evict(conn, now)
+        elif self.ttl and now - self._last_sweep >= self.sweep_s:
+            self._sweep(conn, now)
+
+    def total_bytes(self) -> int:
+        row = self._conn().execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _sweep(self, conn: sqlite3.Connection, now: float):
+        self._last_sweep = now
+        conn.execute("DELETE FROM cache WHERE created <= ?", (now - self.ttl,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.ttl:
+            self._sweep(conn, now)
+        # remove as menos acessadas até caber (com folga de 10% para não despejar a cada escrita)
+        target = int(self.max_bytes * 0.9)
+        total = self.total_bytes()
+        while total > target:
+            rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                total -= size
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache:
+    """
+    Consulta a memória primeiro e depois o disco (promovendo para a memória).
+    Os métodos `aget`/`aset` deixam o acesso ao SQLite fora do event loop.
+    """
+
+    def __init__(self, name: str, memory: Optional[LRUCache] = None, disk: Optional[SQLiteCache] = None):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory is not None or self.disk is not None
+
+    def _get_memory(self, key: str):
+        if self.memory is None:
+            return _MISSING
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits_memory += 1
+        return value
+
+    def _get_disk(self, key: str, default):
+        value = _MISSING
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key, _MISSING)
+            except sqlite3.Error:
+                value = _MISSING
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits_disk += 1
+        if self.memory is not None:
+            self.memory.set(key, value)
+        return value
+
+    def _set_disk(self, key: str, value):
+        try:
+            self.disk.set(key, value)
+        except sqlite3.Error:
+            pass  # cache é best-effort: falha no disco não derruba a requisição
+
+    def get(self, key: str, default=None):
+        value = self._get_memory(key)
+        if value is not _MISSING:
+            return value
+        return self._get_disk(key, default)
+
+    def set(self, key: str, value):
+        if self.memory is not None:
+            self.memory.set(key, value)
+        if self.disk is not None:
+            self._set_disk(key, value)
+
+    async def alookup(self, key: str) -> tuple:
+        """Retorna (valor, nível), onde nível é "memory", "disk" ou None (miss)."""
+        value = self._get_memory(key)
+        if value is not _MISSING:
+            return value, "memory"
+        if self.disk is None:
+            self._get_disk(key, _MISSING)  # contabiliza o miss
+            return None, None
+        value = await asyncio.to_thread(self._get_disk, key, _MISSING)
+        if value is _MISSING:
+            return None, None
+        return value, "disk"
+
+    async def aget(self, key: str, default=None):
+        value, tier = await self.alookup(key)
+        return default if tier is None else value
+
+    async def aset(self, key: str, value):
+        if self.memory is not None:
+            self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self._set_disk, key, value)
+
+    def clear(self):
+        if self.memory is not None:
+            self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_entries": len(self.memory) if self.memory is not None else 0,
+            "memory_bytes": self.memory.size_bytes if self.memory is not None else 0,
+            "disk_path": self.disk.path if self.disk is not None else None,
+        }
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "sim", "on")
+
+
+def build_cache(prefix: str, default_path: str, default_ttl: float) -> TieredCache:
+    """
+    Monta um TieredCache a partir de variáveis de ambiente com o prefixo dado:
+    <PREFIX>_ENABLED, <PREFIX>_MAX_ENTRIES, <PREFIX>_MEMORY_MB,
+    <PREFIX>_DISK (caminho do SQLite; vazio desliga o disco), <PREFIX>_DISK_MB, <PREFIX>_TTL.
+    """
+    name = prefix.lower()
+    if not _env_bool(f"{prefix}_ENABLED", True):
+        return TieredCache(name)
+    ttl = float(os.getenv(f"{prefix}_TTL", str(default_ttl))) or None
+    memory = LRUCache(
+        max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "1024")),
+        max_bytes=int(float(os.getenv(f"{prefix}_MEMORY_MB", "16")) * 1024 * 1024),
+        ttl=ttl,
+    )
+    disk = None
+    disk_path = os.getenv(f"{prefix}_DISK", default_path)
+    if disk_path:
+        try:
+            disk = SQLiteCache(
+                disk_path,
+                max_bytes=int(float(os.getenv(f"{prefix}_DISK_MB", "256")) * 1024 * 1024),
+                ttl=ttl,
+            )
+        except (sqlite3.Error, OSError):
+            disk = None  # sem disco gravável: segue só com a memória
+    return TieredCache(name, memory, disk)
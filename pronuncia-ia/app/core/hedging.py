@@ -0,0 +1,122 @@
+"""
+Requisições "hedged" (de reserva) contra a cauda de latência.
+
+A chamada vai para o provedor principal; se a resposta não chegar dentro do
+percentil HEDGE_PERCENTILE da latência recente dele, a mesma chamada é
+disparada no provedor secundário e vale a primeira resposta (a outra é
+cancelada). Como só a fração lenta das requisições dispara a segunda chamada,
+o custo em regime normal sobe pouco (~(100 - percentil)%).
+
+Obs.: cancelar interrompe chamadas de rede; trabalho já entregue a uma thread
+ou processo (STT local) termina em segundo plano e é descartado.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+
+class LatencyTracker:
+    """Janela deslizante das últimas `window` latências (ms) por chave (ex.: provedor)."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, ms: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(ms)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+
+class Hedger:
+    """
+    Executa `primary()` e, se ela passar do atraso de hedge, também `secondary()`.
+    O atraso é o percentil `percentile` das latências da chave (ou `default_delay_ms`
+    enquanto houver menos de `min_samples` amostras).
+    """
+
+    def __init__(self, percentile: float = 95, default_delay_ms: float = 3000, min_delay_ms: float = 200,
+                 min_samples: int = 20, tracker: Optional[LatencyTracker] = None):
+        self.percentile = percentile
+        self.default_delay_ms = default_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self.latency = tracker or LatencyTracker()
+        self._counts: dict = {}
+        self._lock = threading.Lock()
+
+    def delay_ms(self, key: str) -> float:
+        if self.latency.count(key) < self.min_samples:
+            return self.default_delay_ms
+        return max(self.min_delay_ms, self.latency.percentile(key, self.percentile))
+
+    def _inc(self, key: str, field: str):
+        with self._lock:
+            counts = self._counts.setdefault(key, {"requests": 0, "hedged": 0, "secondary_wins": 0})
+            counts[field] += 1
+
+    async def run(self, key: str, primary: Callable[[], Awaitable], secondary: Callable[[], Awaitable]) -> tuple:
+        """
+        Retorna (resultado, vencedor, disparou_hedge), com vencedor "primary" ou "secondary".
+        Se a principal falhar antes do atraso, a secundária é disparada na hora.
+        Só levanta exceção se as duas falharem (a exceção da principal).
+        """
+        self._inc(key, "requests")
+        delay = self.delay_ms(key) / 1000
+        inicio = time.perf_counter()
+        first = asyncio.ensure_future(primary())
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            failures = {first: first.exception()} if done and first.exception() is not None else {}
+            if done and not failures:
+                self.latency.record(key, (time.perf_counter() - inicio) * 1000)
+                return first.result(), "primary", False
+
+            self._inc(key, "hedged")
+            second = asyncio.ensure_future(secondary())
+            pending = {first, second} - done
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    if task.exception() is not None:
+                        failures[task] = task.exception()
+                        continue
+                    for other in pending:
+                        other.cancel()
+                    if task is first:
+                        self.latency.record(key, (time.perf_counter() - inicio) * 1000)
+                        return task.result(), "primary", True
+                    self._inc(key, "secondary_wins")
+                    if first not in failures:
+                        # a principal não respondeu até aqui: registra o tempo como amostra (limite inferior)
+                        self.latency.record(key, (time.perf_counter() - inicio) * 1000)
+                    return task.result(), "secondary", True
+            raise failures.get(first) or failures[second]
+        except asyncio.CancelledError:
+            for task in (first, second):
+                if task is not None:
+                    task.cancel()
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {k: dict(v) for k, v in self._counts.items()}
+        for key, c in counts.items():
+            c["hedge_rate"] = round(c["hedged"] / c["requests"], 3) if c["requests"] else 0.0
+            c["win_rate"] = round(c["secondary_wins"] / c["hedged"], 3) if c["hedged"] else None
+            c["delay_ms"] = round(self.delay_ms(key), 1)
+        return counts
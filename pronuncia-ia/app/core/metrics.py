@@ -0,0 +1,123 @@
+"""
+Métricas do processo, expostas em /status (JSON) e /metrics (formato Prometheus).
+
+- contadores (cache, fallbacks, erros...): `inc`
+- histogramas de latência por etapa: `observe` / `timer`
+
+Tudo fica em dicionários em memória atrás de um lock: registrar uma amostra
+custa uma busca binária e algumas somas, sem I/O no caminho da requisição.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters: dict[tuple, float] = {}
+_histograms: dict[tuple, list] = {}  # (nome, labels) -> [contagem por bucket..., soma, total]
+
+# Limites superiores (ms) dos buckets; o último bucket (+Inf) fica implícito
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Incrementa o contador `name` para a combinação de labels informada."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def observe(name: str, value_ms: float, **labels):
+    """Registra uma duração (ms) no histograma `name`."""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    i = bisect.bisect_left(BUCKETS_MS, value_ms)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS_MS) + 3)
+        hist[i] += 1
+        hist[-2] += value_ms
+        hist[-1] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Mede o bloco e registra no histograma `name` (mesmo se ele levantar exceção)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - inicio) * 1000, **labels)
+
+
+def snapshot() -> dict:
+    """{nome: [{...labels, "value": n}, ...]}"""
+    out: dict[str, list] = {}
+    with _lock:
+        items = list(_counters.items())
+    for (name, labels), value in sorted(items):
+        out.setdefault(name, []).append({**dict(labels), "value": value})
+    return out
+
+
+def histogram_snapshot() -> dict:
+    """{nome: [{...labels, "count": n, "sum_ms": s, "avg_ms": m}, ...]}"""
+    out: dict[str, list] = {}
+    with _lock:
+        items = [(k, list(v)) for k, v in _histograms.items()]
+    for (name, labels), hist in sorted(items):
+        out.setdefault(name, []).append({
+            **dict(labels), "count": hist[-1], "sum_ms": round(hist[-2], 1),
+            "avg_ms": round(hist[-2] / hist[-1], 1) if hist[-1] else None,
+        })
+    return out
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, le: str = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus(prefix: str = "pronuncia_") -> str:
+    """Contadores e histogramas no formato texto de exposição do Prometheus."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    lines = []
+    declared = set()
+    for (name, labels), value in counters:
+        metric = prefix + name + ("" if name.endswith("_total") else "_total")
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    for (name, labels), hist in histograms:
+        metric = prefix + name
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS, hist):
+            cumulative += count
+            lines.append(f'{metric}_bucket{_labels(labels, str(bound))} {cumulative}')
+        lines.append(f'{metric}_bucket{_labels(labels, "+Inf")} {hist[-1]}')
+        lines.append(f"{metric}_sum{_labels(labels)} {round(hist[-2], 3)}")
+        lines.append(f"{metric}_count{_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,98 @@
+"""
+Micro-batching de chamadas assíncronas.
+
+Chamadas concorrentes com a mesma chave de grupo (ex.: provedor + idioma) são
+acumuladas por alguns milissegundos, até um tamanho máximo, e processadas com
+uma única chamada em lote. Itens que o lote não resolver (falha total ou
+resposta parcial) são processados individualmente.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+# process_batch(chave, itens) -> lista de resultados (None = item não resolvido)
+BatchFn = Callable[[Hashable, list], Awaitable[list]]
+# process_single(chave, item) -> resultado
+SingleFn = Callable[[Hashable, Any], Awaitable[Any]]
+
+
+class MicroBatcher:
+    def __init__(self, process_batch: BatchFn, process_single: SingleFn,
+                 max_wait_ms: float = 10.0, max_batch: int = 8):
+        self.process_batch = process_batch
+        self.process_single = process_single
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: dict[Hashable, list] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set = set()  # lotes em andamento (o loop só guarda referência fraca às tarefas)
+        self.batches = 0          # chamadas em lote feitas
+        self.batched_items = 0    # itens resolvidos por lotes
+        self.single_items = 0     # itens processados sozinhos (lote de 1 ou fallback)
+        self.fallbacks = 0        # itens que voltaram do lote sem resultado
+
+    async def submit(self, key: Hashable, item: Any):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        entries = self._pending.pop(key, [])
+        if entries:
+            task = asyncio.ensure_future(self._run(key, entries))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, entries: list):
+        if len(entries) == 1:
+            await self._run_single(key, *entries[0])
+            return
+
+        items = [item for item, _ in entries]
+        results: list = [None] * len(entries)
+        try:
+            self.batches += 1
+            returned = await self.process_batch(key, items)
+            results = list(returned or [])[:len(entries)]
+            results += [None] * (len(entries) - len(results))
+        except Exception:
+            pass  # lote inteiro falhou: todos os itens seguem individualmente
+
+        retry = []
+        for (item, future), result in zip(entries, results):
+            if result is None:
+                retry.append((item, future))
+            elif not future.done():
+                self.batched_items += 1
+                future.set_result(result)
+        self.fallbacks += len(retry)
+        await asyncio.gather(*[self._run_single(key, item, future) for item, future in retry])
+
+    async def _run_single(self, key: Hashable, item: Any, future: asyncio.Future):
+        self.single_items += 1
+        try:
+            result = await self.process_single(key, item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "single_items": self.single_items,
+            "fallbacks": self.fallbacks,
+        }
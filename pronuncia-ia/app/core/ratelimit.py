@@ -0,0 +1,252 @@
+"""
+Limites por provedor/modelo: chamadas simultâneas, requisições e tokens por minuto.
+
+Rajadas no /avaliar disparavam chamadas paralelas sem limite ao Gemini/OpenAI,
+que respondiam 429 em cascata e a avaliação caía no Levenshtein. Cada
+(provedor, modelo) de nuvem tem um `ProviderLimiter`, compartilhado por
+transcrição, avaliação e chat (o mesmo modelo divide a mesma cota):
+
+- no máximo PROVIDER_MAX_CONCURRENCY chamadas em andamento;
+- baldes de fichas para PROVIDER_RPM e PROVIDER_TPM (0 = sem limite);
+- fila justa: quem chegou primeiro é atendido primeiro;
+- erro de rate limit (429 / quota): nova tentativa com espera exponencial com
+  jitter (ou o Retry-After do provedor), e o limitador inteiro pausa nesse
+  intervalo para não alimentar a cascata.
+
+Configuração por variável de ambiente, da mais específica para a mais geral:
+PROVIDER_RPM_GEMINI_GEMINI_2_5_FLASH, PROVIDER_RPM_GEMINI, PROVIDER_RPM.
+O nome do modelo entra sem o prefixo "models/" da API do Gemini
+("models/gemini-2.5-flash" -> GEMINI_2_5_FLASH).
+Os limites valem para as chamadas assíncronas (as usadas pela API).
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+try:
+    from app.core import metrics
+except ImportError:
+    import metrics
+
+RATE_LIMITED_PROVIDERS = ("gemini", "openai")
+# Tokens de saída estimados por resposta de chat (entram no balde de TPM)
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("PROVIDER_COMPLETION_TOKENS_ESTIMATE", "400"))
+
+
+def _env_name(*parts) -> str:
+    return "_".join(re.sub(r"[^A-Za-z0-9]+", "_", p).strip("_").upper() for p in parts if p)
+
+
+def limit_from_env(name: str, provider: str, model: Optional[str], default: float) -> float:
+    if model and model.startswith("models/"):
+        model = model[len("models/"):]
+    for key in (_env_name(name, provider, model), _env_name(name, provider), name):
+        value = os.getenv(key)
+        if value not in (None, ""):
+            return float(value)
+    return default
+
+
+def estimate_tokens(args: tuple, kwargs: dict) -> int:
+    """Estimativa grosseira (~4 caracteres por token) do prompt + COMPLETION_TOKENS_ESTIMATE."""
+    chars = 0
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, str):
+            chars += len(value)
+        elif isinstance(value, list):
+            chars += sum(len(m.get("content") or "") for m in value if isinstance(m, dict))
+    return chars // 4 + COMPLETION_TOKENS_ESTIMATE
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    if getattr(exc, "status_code", None) == 429 or getattr(exc, "code", None) == 429:
+        return True
+    if type(exc).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests"):
+        return True
+    text = str(exc).lower()
+    return "429" in text or "rate limit" in text or "quota" in text
+
+
+def retry_after_s(exc: Exception) -> Optional[float]:
+    """Retry-After do provedor, quando a exceção traz a resposta HTTP."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class TokenBucket:
+    """
+    Balde de fichas com reserva: `reserve(n)` desconta já (o saldo pode ficar
+    negativo) e devolve quanto tempo esperar até as fichas existirem. Como as
+    reservas são feitas em ordem de chegada, a espera respeita essa ordem.
+    """
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.clock = clock
+        self._tokens = per_minute
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)  # pedido maior que o balde não trava para sempre
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, max_concurrency: int = 16, rpm: float = 0, tpm: float = 0,
+                 max_retries: int = 4, backoff_base_s: float = 1.0, backoff_max_s: float = 30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rpm = TokenBucket(rpm) if rpm > 0 else None
+        self.tpm = TokenBucket(tpm) if tpm > 0 else None
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._paused_until = 0.0
+        self.calls = self.rate_limited = self.retries = 0
+        self.wait_ms_total = self.wait_ms_max = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def _acquire_slot(self):
+        if self.max_concurrency <= 0 or (self.in_flight < self.max_concurrency and not self.queued):
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter  # quem libera a vaga já conta esta chamada em in_flight
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()  # a vaga chegou junto com o cancelamento: repassa
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # a vaga passa direto para o próximo da fila
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Espera a vez (fila, concorrência, pausa de 429 e baldes) e ocupa uma vaga."""
+        inicio = time.perf_counter()
+        await self._acquire_slot()
+        try:
+            delay = max(0.0, self._paused_until - time.monotonic())
+            if self.rpm is not None:
+                delay = max(delay, self.rpm.reserve(1))
+            if self.tpm is not None and tokens:
+                delay = max(delay, self.tpm.reserve(tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._release_slot()
+            raise
+        wait_ms = (time.perf_counter() - inicio) * 1000
+        self.calls += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        metrics.inc("provider_wait_ms_total", wait_ms, limiter=self.name)
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def backoff_s(self, attempt: int, exc: Optional[Exception] = None) -> float:
+        hinted = retry_after_s(exc) if exc is not None else None
+        if hinted is not None:
+            return min(hinted, self.backoff_max_s)
+        return min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def run(self, call, tokens: int = 0):
+        """Executa `call()` (fábrica de corrotina) dentro dos limites, repetindo em caso de 429."""
+        attempt = 0
+        while True:
+            async with self.slot(tokens):
+                try:
+                    return await call()
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        raise
+                    self.rate_limited += 1
+                    metrics.inc("provider_rate_limited", limiter=self.name)
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self.backoff_s(attempt, e)
+                    # pausa todo o limitador: as próximas chamadas também esperam
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            attempt += 1
+            self.retries += 1
+            metrics.inc("provider_retries", limiter=self.name)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "rpm": self.rpm.capacity if self.rpm else None,
+            "tpm": self.tpm.capacity if self.tpm else None,
+            "calls": self.calls,
+            "avg_wait_ms": round(self.wait_ms_total / self.calls, 1) if self.calls else 0.0,
+            "max_wait_ms": round(self.wait_ms_max, 1),
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+        }
+
+
+class LimiterRegistry:
+    """Um limitador por (provedor, modelo) de nuvem, criado na primeira chamada."""
+
+    def __init__(self, providers: tuple = RATE_LIMITED_PROVIDERS):
+        self.providers = providers
+        self._limiters: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: Optional[str]) -> Optional[ProviderLimiter]:
+        provider = (provider or "").lower()
+        if provider not in self.providers:
+            return None  # modelos locais têm o próprio pool (local_stt)
+        key = (provider, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = ProviderLimiter(
+                    f"{provider}:{model}" if model else provider,
+                    max_concurrency=int(limit_from_env("PROVIDER_MAX_CONCURRENCY", provider, model, 16)),
+                    rpm=limit_from_env("PROVIDER_RPM", provider, model, 0),
+                    tpm=limit_from_env("PROVIDER_TPM", provider, model, 0),
+                    max_retries=int(limit_from_env("PROVIDER_MAX_RETRIES", provider, model, 4)),
+                    backoff_base_s=limit_from_env("PROVIDER_BACKOFF_BASE_S", provider, model, 1.0),
+                    backoff_max_s=limit_from_env("PROVIDER_BACKOFF_MAX_S", provider, model, 30.0),
+                )
+            return limiter
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {l.name: l.stats() for l in limiters}
+
+
+provider_limiters = LimiterRegistry()
@@ -0,0 +1,156 @@
+"""
+Avaliação em tempo real (WebSocket /ws/avaliar).
+
+O cliente envia o áudio em pedaços enquanto grava. A sessão acumula os
+pedaços e, a cada WS_PARTIAL_INTERVAL_S segundos de áudio novo, entrega uma
+janela (os últimos WS_WINDOW_S segundos) para transcrição incremental com o
+modelo local; a transcrição parcial recebe uma nota provisória calculada
+localmente, comparando-a com o trecho equivalente do texto esperado (o início
+do texto ou, quando a janela já não cobre o começo da gravação, o trecho que
+melhor se alinha a ela). Ao fim da gravação o áudio completo segue o fluxo
+normal (/avaliar).
+
+Formatos aceitos:
+- "pcm16": PCM 16 bits mono little-endian na taxa `sample_rate` (recomendado:
+  permite a janela deslizante sem decodificar o áudio inteiro a cada parcial)
+- qualquer contêiner (webm/ogg do MediaRecorder, wav...): o prefixo recebido
+  até o momento é decodificado inteiro a cada parcial
+"""
+import os
+import struct
+import time
+from typing import Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    from app.core.audio_input import MAX_AUDIO_BYTES, AudioPayload, BodyTooLarge
+    from app.core.audio_preprocess import resample
+    from app.core.scoring import pronunciation_score, word_highlights
+except ImportError:
+    from audio_input import MAX_AUDIO_BYTES, AudioPayload, BodyTooLarge
+    from audio_preprocess import resample
+    from scoring import pronunciation_score, word_highlights
+
+WS_PARTIAL_INTERVAL_S = float(os.getenv("WS_PARTIAL_INTERVAL_S", "0.8"))
+WS_WINDOW_S = float(os.getenv("WS_WINDOW_S", "30"))  # o Whisper processa no máximo 30 s por vez
+WS_MIN_AUDIO_S = 0.3
+_MODEL_SAMPLE_RATE = 16000
+
+
+class StreamingAudioSession:
+    def __init__(self, audio_format: str = "pcm16", sample_rate: int = _MODEL_SAMPLE_RATE,
+                 name: Optional[str] = None, max_bytes: int = MAX_AUDIO_BYTES):
+        self.audio_format = (audio_format or "pcm16").lower()
+        self.sample_rate = int(sample_rate)
+        self.name = name or ("audio.wav" if self.pcm else "audio.webm")
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._partial_at = 0        # posição (bytes ou segundos) da última parcial
+        self._partial_clock = 0.0
+        self.partials = 0
+
+    @property
+    def pcm(self) -> bool:
+        return self.audio_format == "pcm16"
+
+    @property
+    def size(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def duration_s(self) -> Optional[float]:
+        if not self.pcm:
+            return None
+        return len(self._buffer) // 2 / self.sample_rate
+
+    @property
+    def windowed(self) -> bool:
+        """A janela da parcial cobre só o fim da gravação (pcm16 com mais de WS_WINDOW_S segundos)?"""
+        return self.pcm and self.duration_s > WS_WINDOW_S
+
+    def add(self, chunk: bytes):
+        if len(self._buffer) + len(chunk) > self.max_bytes:
+            raise BodyTooLarge(f"Áudio maior que o limite de {self.max_bytes} bytes.")
+        self._buffer += chunk
+
+    def should_emit_partial(self) -> bool:
+        """Há áudio novo suficiente desde a última parcial?"""
+        if self.pcm:
+            duration = self.duration_s
+            return duration >= WS_MIN_AUDIO_S and duration - self._partial_at >= WS_PARTIAL_INTERVAL_S
+        # contêiner: sem duração sem decodificar; usa o relógio e a chegada de bytes novos
+        return self.size > self._partial_at and time.monotonic() - self._partial_clock >= WS_PARTIAL_INTERVAL_S
+
+    def mark_partial(self):
+        self._partial_at = self.duration_s if self.pcm else self.size
+        self._partial_clock = time.monotonic()
+        self.partials += 1
+
+    def window(self):
+        """
+        Áudio para a transcrição parcial: float32 16 kHz dos últimos WS_WINDOW_S
+        segundos (pcm16) ou os bytes recebidos até agora (contêiner).
+        """
+        if not self.pcm:
+            return bytes(self._buffer)
+        if np is None:
+            return None
+        keep = int(WS_WINDOW_S * self.sample_rate) * 2
+        raw = self._buffer[-keep:] if len(self._buffer) > keep else self._buffer
+        raw = raw[:len(raw) // 2 * 2]
+        samples = np.frombuffer(bytes(raw), dtype="<i2").astype(np.float32) / 32768.0
+        return resample(samples, self.sample_rate, _MODEL_SAMPLE_RATE)
+
+    def to_payload(self) -> AudioPayload:
+        """Áudio completo para a avaliação final (pcm16 vira WAV)."""
+        if not self.pcm:
+            return AudioPayload.from_bytes(bytes(self._buffer), self.name)
+        pcm = bytes(self._buffer[:len(self._buffer) // 2 * 2])
+        return AudioPayload.from_bytes(_wav_header(len(pcm), self.sample_rate) + pcm,
+                                       os.path.splitext(self.name)[0] + ".wav")
+
+
+def _wav_header(data_size: int, sample_rate: int) -> bytes:
+    """Cabeçalho RIFF/WAVE de 44 bytes para PCM 16 bits mono."""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+        sample_rate, sample_rate * 2, 2, 16, b"data", data_size,
+    )
+
+
+def _align_window(expected_words: list, partial: str) -> int:
+    """Início (em palavras) do trecho do texto esperado que mais compartilha palavras com a janela."""
+    n = len(partial.split())
+    best, best_start = -1, 0
+    for start in range(max(1, len(expected_words) - n + 1)):
+        common = len(word_highlights(" ".join(expected_words[start:start + n]), partial)["correct"])
+        if common >= best:  # empate: o trecho mais adiante (a janela termina onde o aluno está)
+            best, best_start = common, start
+    return best_start
+
+
+def provisional_score(expected: str, partial: str, windowed: bool = False) -> dict:
+    """
+    Nota provisória de uma transcrição parcial: compara com o trecho do texto
+    esperado com o mesmo número de palavras (o aluno ainda não terminou de ler).
+    Com `windowed`, a parcial cobre só os últimos WS_WINDOW_S segundos: o trecho
+    comparado é o que melhor se alinha a ela, e não o início do texto.
+    """
+    expected_words = (expected or "").split()
+    partial = partial or ""
+    n = len(partial.split())
+    start = _align_window(expected_words, partial) if windowed and expected_words else 0
+    segment = " ".join(expected_words[start:start + n])
+    result = pronunciation_score(segment, partial)
+    return {
+        "score": result["score"],
+        "similarity": result["similarity"],
+        "progress": round(min(1.0, (start + n) / len(expected_words)), 2) if expected_words else None,
+        "highlights": word_highlights(segment, partial),
+        "method": "local-provisional",
+    }
@@ -0,0 +1,334 @@
+"""
+Roteamento de provedores com disjuntores (circuit breakers).
+
+Cada (tipo, provedor) tem um disjuntor que acompanha as últimas chamadas
+(latência e erros) de qualquer modelo do provedor, a mesma chave que
+`ProviderRouter.choose` consulta; chamadas e falhas também são contadas por
+modelo (rótulo de cada GuardedClient), para /status:
+- closed: chamadas passam normalmente
+- open: depois de ROUTER_FAILURE_THRESHOLD falhas seguidas, ou taxa de erro
+  acima de ROUTER_ERROR_RATE na janela, as chamadas falham na hora
+  (CircuitOpenError) em vez de esperar o timeout do provedor
+- half_open: passados ROUTER_OPEN_S segundos, uma chamada de teste é liberada;
+  sucesso fecha o disjuntor, falha o abre de novo
+
+`ProviderRouter.choose` escolhe o provedor de cada chamada: o pedido, a menos
+que o disjuntor dele esteja aberto ou que ele esteja ROUTER_SLOW_FACTOR vezes
+mais lento (mediana recente) que uma alternativa de *_FALLBACK_PROVIDERS.
+Os clientes do registro de provedores passam por `GuardedClient`, então
+transcrição, avaliação e chat alimentam os mesmos disjuntores e respeitam os
+mesmos limites de taxa (app/core/ratelimit.py).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+try:
+    from app.core.ratelimit import estimate_tokens, provider_limiters
+except ImportError:
+    from ratelimit import estimate_tokens, provider_limiters
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada porque o disjuntor do provedor está aberto."""
+
+
+def _providers_env(name: str) -> tuple:
+    return tuple(p.strip().lower() for p in os.getenv(name, "").split(",") if p.strip())
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate: float = 0.5, window: int = 20,
+                 open_s: float = 30.0, latency_ttl_s: float = 120.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.open_s = open_s
+        self.latency_ttl_s = latency_ttl_s
+        self.clock = clock
+        self.state = self.CLOSED
+        self._by_model: dict = {}               # modelo -> {"calls": n, "failures": n}
+        self._outcomes = deque(maxlen=window)   # True = sucesso
+        self._latency = deque(maxlen=window)    # (instante, ms) das chamadas bem-sucedidas
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.calls = self.failures = self.rejected = self.opens = 0
+
+    def _refresh(self, now: float):
+        if self.state == self.OPEN and now - self._opened_at >= self.open_s:
+            self.state = self.HALF_OPEN
+            self._probing = False
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._probing = False
+        self.opens += 1
+
+    def available(self) -> bool:
+        """O provedor pode ser escolhido (fechado, ou com a vaga da chamada de teste livre)?"""
+        with self._lock:
+            self._refresh(self.clock())
+            return self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._probing)
+
+    def _count(self, model: Optional[str], field: str):
+        if model:
+            counts = self._by_model.setdefault(model, {"calls": 0, "failures": 0})
+            counts[field] += 1
+
+    def allow(self, model: Optional[str] = None) -> bool:
+        """Reserva a passagem de uma chamada (no half_open, só uma de teste por vez)."""
+        with self._lock:
+            self._refresh(self.clock())
+            if self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._probing):
+                self._probing = self.state == self.HALF_OPEN
+                self.calls += 1
+                self._count(model, "calls")
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Chamada cancelada sem resultado: libera a vaga de teste do half_open."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, ms: float):
+        with self._lock:
+            self._outcomes.append(True)
+            self._latency.append((self.clock(), ms))
+            self._consecutive = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._probing = False
+                self._outcomes.clear()
+
+    def record_failure(self, model: Optional[str] = None):
+        with self._lock:
+            now = self.clock()
+            self._outcomes.append(False)
+            self._consecutive += 1
+            self.failures += 1
+            self._count(model, "failures")
+            if self.state == self.HALF_OPEN:
+                self._open(now)
+            elif self.state == self.CLOSED and (
+                self._consecutive >= self.failure_threshold
+                or (len(self._outcomes) >= self._outcomes.maxlen // 2 and self._error_rate() >= self.error_rate)
+            ):
+                self._open(now)
+
+    def _error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def p50_ms(self, min_samples: int = 1) -> Optional[float]:
+        """Mediana das latências recentes (amostras mais velhas que latency_ttl_s são ignoradas)."""
+        with self._lock:
+            now = self.clock()
+            samples = sorted(ms for at, ms in self._latency if now - at <= self.latency_ttl_s)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[len(samples) // 2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh(self.clock())
+            out = {
+                "state": self.state,
+                "models": {m: dict(c) for m, c in self._by_model.items()},
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opens": self.opens,
+                "error_rate": round(self._error_rate(), 3),
+                "consecutive_failures": self._consecutive,
+            }
+        out["p50_ms"] = self.p50_ms()
+        return out
+
+
+class GuardedClient:
+    """
+    Envolve um cliente de provedor: transcribe*/reply*/stream_reply* passam pelo
+    disjuntor (recusa rápida quando aberto; sucesso/falha/latência registrados) e,
+    nas chamadas assíncronas, pelo limitador do provedor/modelo.
+    Os demais atributos (model, model_name...) são os do cliente original.
+    """
+
+    _CALLS = ("transcribe", "transcribe_bytes", "reply", "reply_from_text")
+    _STREAMS = ("stream_reply", "stream_reply_from_text")
+
+    def __init__(self, client, breaker: CircuitBreaker, limiter=None, model: Optional[str] = None):
+        self._client = client
+        self._breaker = breaker
+        self._limiter = limiter
+        self._model = model  # rótulo das contagens por modelo no disjuntor do provedor
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self._STREAMS:
+            return self._wrap_stream(attr)
+        if name in self._CALLS:
+            return self._wrap_async(attr, name) if asyncio.iscoroutinefunction(attr) else self._wrap_sync(attr)
+        return attr
+
+    @staticmethod
+    def _tokens(name: str, args: tuple, kwargs: dict) -> int:
+        # só o chat consome o balde de TPM
+        return estimate_tokens(args, kwargs) if "reply" in name else 0
+
+    def _check(self):
+        if not self._breaker.allow(self._model):
+            raise CircuitOpenError(f"Provedor indisponível ({self._breaker.name}): disjuntor aberto.")
+
+    def _wrap_sync(self, fn):
+        def call(*args, **kwargs):
+            self._check()
+            inicio = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                self._breaker.record_failure(self._model)
+                raise
+            self._breaker.record_success((time.perf_counter() - inicio) * 1000)
+            return result
+        return call
+
+    def _wrap_async(self, fn, name: str):
+        async def call(*args, **kwargs):
+            self._check()
+            elapsed_ms = 0.0
+
+            async def timed():
+                # a latência do disjuntor não inclui a espera na fila do limitador
+                nonlocal elapsed_ms
+                inicio = time.perf_counter()
+                result = await fn(*args, **kwargs)
+                elapsed_ms = (time.perf_counter() - inicio) * 1000
+                return result
+
+            try:
+                if self._limiter is None:
+                    result = await timed()
+                else:
+                    result = await self._limiter.run(timed, self._tokens(name, args, kwargs))
+            except asyncio.CancelledError:
+                self._breaker.release()
+                raise
+            except Exception:
+                self._breaker.record_failure(self._model)
+                raise
+            self._breaker.record_success(elapsed_ms)
+            return result
+        return call
+
+    def _wrap_stream(self, fn):
+        async def stream(*args, **kwargs):
+            self._check()
+            try:
+                if self._limiter is None:
+                    inicio = time.perf_counter()
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                else:
+                    async with self._limiter.slot(self._tokens("reply", args, kwargs)):
+                        inicio = time.perf_counter()
+                        async for item in fn(*args, **kwargs):
+                            yield item
+            except (asyncio.CancelledError, GeneratorExit):
+                self._breaker.release()
+                raise
+            except Exception:
+                self._breaker.record_failure(self._model)
+                raise
+            self._breaker.record_success((time.perf_counter() - inicio) * 1000)
+        return stream
+
+
+class ProviderRouter:
+    def __init__(self, fallbacks: Optional[dict] = None, slow_factor: float = 3.0, min_samples: int = 5,
+                 limiters=None, **breaker_options):
+        self.fallbacks = dict(fallbacks or {})
+        self.limiters = limiters
+        self.slow_factor = slow_factor
+        self.min_samples = min_samples
+        self.breaker_options = breaker_options
+        self._breakers: dict[tuple, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _kind(kind: str) -> str:
+        # clientes síncronos e assíncronos do mesmo provedor compartilham o disjuntor
+        return kind[:-len("_async")] if kind.endswith("_async") else kind
+
+    def breaker(self, kind: str, provider: str) -> CircuitBreaker:
+        key = (self._kind(kind), (provider or "").lower())
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(f"{key[0]}:{key[1]}", **self.breaker_options)
+            return breaker
+
+    def guard(self, client, kind: str, provider: str, model: Optional[str] = None) -> GuardedClient:
+        # disjuntor por provedor (o que `choose` consulta), mesmo com modelo explícito
+        breaker = self.breaker(kind, provider)
+        resolved = getattr(client, "model_name", None) or (
+            client.model if isinstance(getattr(client, "model", None), str) else model
+        )
+        # o limitador é por modelo resolvido: transcrição e chat no mesmo modelo dividem a cota
+        limiter = self.limiters.get(provider, resolved) if self.limiters is not None else None
+        return GuardedClient(client, breaker, limiter, resolved)
+
+    def choose(self, kind: str, preferred: str, alternates: Optional[tuple] = None) -> str:
+        """Provedor para a próxima chamada: o pedido, salvo disjuntor aberto ou lentidão clara."""
+        preferred = (preferred or "").lower()
+        if alternates is None:
+            alternates = self.fallbacks.get(self._kind(kind), ())
+        candidates = [p for p in (preferred, *alternates) if p]
+        candidates = list(dict.fromkeys(candidates))
+        available = [p for p in candidates if self.breaker(kind, p).available()]
+        if not available:
+            return preferred  # todos abertos: a chamada falha rápido no disjuntor
+        if available[0] != preferred:
+            return available[0]
+        own = self.breaker(kind, preferred).p50_ms(self.min_samples)
+        if own is None:
+            return preferred
+        faster = [
+            (p50, p) for p in available[1:]
+            if (p50 := self.breaker(kind, p).p50_ms(self.min_samples)) is not None
+        ]
+        if faster and own > self.slow_factor * min(faster)[0]:
+            return min(faster)[1]
+        return preferred
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.stats() for b in breakers}
+
+
+provider_router = ProviderRouter(
+    fallbacks={
+        "transcriber": _providers_env("TRANSCRIPTION_FALLBACK_PROVIDERS"),
+        "chat": _providers_env("CHAT_FALLBACK_PROVIDERS"),
+    },
+    slow_factor=float(os.getenv("ROUTER_SLOW_FACTOR", "3")),
+    failure_threshold=int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5")),
+    error_rate=float(os.getenv("ROUTER_ERROR_RATE", "0.5")),
+    window=int(os.getenv("ROUTER_WINDOW", "20")),
+    open_s=float(os.getenv("ROUTER_OPEN_S", "30")),
+    latency_ttl_s=float(os.getenv("ROUTER_LATENCY_TTL_S", "120")),
+    limiters=provider_limiters,
+)
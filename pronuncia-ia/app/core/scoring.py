@@ -1,4 +1,5 @@
 import json
+import logging
 _lev_source = None
 try:
     # Prefer python-Levenshtein (fast C implementation)
@@ -22,12 +23,12 @@ except Exception:
             return int(round((1.0 - ratio) * max(len(a), len(b))))
         _lev_source = "difflib"
 
-print(f"[DEBUG] Using Levenshtein implementation: {_lev_source}")
-
 import os
 import os
 import sys
+import time
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente do arquivo .env.
@@ -52,28 +53,47 @@ for p in possible_envs:
 
 if env_path:
     load_dotenv(dotenv_path=env_path)
-    print(f"[DEBUG] Carregado .env a partir de: {env_path}")
-else:
-    print(f"[DEBUG] Nenhum .env encontrado em: {[str(p) for p in possible_envs]}")
+
+# Logs e spans (TRACE_LEVEL/TRACE_SAMPLE, lidos depois do .env)
+try:
+    from app.core.tracing import get_logger, span
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent))
+    from tracing import get_logger, span
+
+log = get_logger("scoring")
+log.debug("Levenshtein: %s; .env: %s", _lev_source, env_path or "nenhum encontrado")
 
 # Import dos modelos de chat
 models_path = Path(__file__).parent.parent.parent / "models"
 sys.path.insert(0, str(models_path))
 
-print(f"[DEBUG] 📁 Path para models: {models_path}")
-print(f"[DEBUG] 📁 Arquivo modelos.py existe: {(models_path / 'modelos.py').exists()}")
-
 try:
     from modelos import OpenAIChat, GeminiChat
-    print(f"[DEBUG] ✅ Import dos modelos bem sucedido!")
-    print(f"[DEBUG] OpenAIChat: {OpenAIChat}")
-    print(f"[DEBUG] GeminiChat: {GeminiChat}")
+    from provider_registry import client_model_name, get_async_chat, get_chat
 except ImportError as e:
-    print(f"[DEBUG] ❌ Erro ao importar modelos: {e}")
-    import traceback
-    traceback.print_exc()
+    log.warning("Falha ao importar os modelos de chat (%s): avaliação só por Levenshtein", e, exc_info=True)
     OpenAIChat = None
     GeminiChat = None
+    get_chat = None
+    get_async_chat = None
+    client_model_name = None
+
+# Cache e métricas (import relativo ao pacote quando rodando via API; direto quando via scripts)
+try:
+    from app.core.cache import build_cache, make_key
+    from app.core.micro_batch import MicroBatcher
+    from app.core.streaming import JSONFieldStream
+    from app.core.routing import CircuitOpenError, provider_router
+    from app.core import metrics
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).parent))
+    from cache import build_cache, make_key
+    from micro_batch import MicroBatcher
+    from streaming import JSONFieldStream
+    from routing import CircuitOpenError, provider_router
+    import metrics
+
 
 def _norm(s: str) -> str:
     return "".join(ch.lower() for ch in s.strip() if ch.isalnum() or ch == " ")
@@ -167,39 +187,60 @@ def pronunciation_score(expected: str, predicted: str) -> dict:
         "method": "levenshtein"
     }
 
-def pronunciation_score_with_ai(expected: str, predicted: str, provider: str = "openai", language: str = "português") -> dict:
-    """
-    Avalia pronúncia usando GPT/Gemini para análise qualitativa detalhada.
-    
-    Args:
-        expected: Palavra/frase que deveria ser falada
-        predicted: O que foi realmente transcrito
-        provider: "openai" ou "gemini"
-        language: Idioma para contextualizar a avaliação
-    
-    Returns:
-        dict com score, feedback detalhado, sugestões, etc.
-    """
-    
-    print(f"\n[DEBUG] 🚀 Iniciando avaliação com IA")
-    print(f"[DEBUG] Provider: {provider}")
-    print(f"[DEBUG] Language: {language}")
-    print(f"[DEBUG] Expected: '{expected}'")
-    print(f"[DEBUG] Predicted: '{predicted}'")
-    
-    # Validar se as classes estão disponíveis
-    print(f"[DEBUG] OpenAIChat disponível: {OpenAIChat is not None}")
-    print(f"[DEBUG] GeminiChat disponível: {GeminiChat is not None}")
-    
+SCORING_SYSTEM_PROMPT = "Você é um avaliador de pronúncia preciso. Sempre retorne JSON válido."
+# Mudar o prompt de avaliação exige mudar a versão, para não reaproveitar notas antigas do cache
+SCORING_PROMPT_VERSION = "v2"
+# Geração determinística: a mesma entrada precisa gerar a mesma nota para o cache ser confiável
+SCORING_TEMPERATURE = float(os.getenv("SCORING_TEMPERATURE", "0"))
+
+# Milhares de alunos leem as mesmas frases do catálogo e muitas transcrições se repetem:
+# as avaliações por IA ficam em cache (LRU em memória; SQLite opcional via SCORING_CACHE_DISK).
+scoring_cache = build_cache("SCORING_CACHE", default_path="", default_ttl=30 * 24 * 3600)
+
+
+def _scoring_cache_key(expected: str, predicted: str, provider: str, model: str, language: str,
+                       prompt: str = "single") -> str:
+    # notas do prompt em lote (micro-batching) vêm de outro prompt: ficam em chave própria
+    return make_key(
+        "avaliacao", SCORING_PROMPT_VERSION, _norm(expected or ""), _norm(predicted or ""),
+        provider.lower(), model, (language or "").strip().lower(), *(() if prompt == "single" else (prompt,)),
+    )
+
+
+def _from_cache(cached, expected: str, predicted: str, provider: str):
+    """Cópia da avaliação em cache com os textos desta requisição (ou None em caso de miss)."""
+    metrics.inc("scoring_cache", result="hit" if cached is not None else "miss", provider=provider.lower())
+    if cached is None:
+        return None
+    result = dict(cached)
+    result.update(expected=expected, predicted=predicted, scoring_cache="hit")
+    return result
+
+
+def _cacheable(result: dict) -> bool:
+    """Só avaliações que vieram de fato da IA entram no cache (fallbacks não)."""
+    if scoring_cache.enabled and str(result.get("method", "")).startswith("ai-"):
+        result["scoring_cache"] = "miss"
+        return True
+    return False
+
+
+def _ai_available(provider: str) -> bool:
+    """Verifica se a classe de chat do provedor pôde ser importada."""
     if provider.lower() == "openai" and OpenAIChat is None:
-        print("[DEBUG] ⚠️ OpenAI não disponível, usando método tradicional")
-        return pronunciation_score(expected, predicted)  # Fallback para método tradicional
+        log.debug("OpenAI não disponível, usando método tradicional")
+        metrics.inc("scoring_fallback", reason="unavailable")
+        return False
     if provider.lower() == "gemini" and GeminiChat is None:
-        print("[DEBUG] ⚠️ Gemini não disponível, usando método tradicional")
-        return pronunciation_score(expected, predicted)  # Fallback para método tradicional
-    
-    # Prompt otimizado para avaliação de pronúncia
-    prompt = f"""Você é um professor de {language} especializado em avaliação de pronúncia.
+        log.debug("Gemini não disponível, usando método tradicional")
+        metrics.inc("scoring_fallback", reason="unavailable")
+        return False
+    return True
+
+
+def build_scoring_prompt(expected: str, predicted: str, language: str = "português") -> str:
+    """Prompt otimizado para avaliação de pronúncia"""
+    return f"""Você é um professor de {language} especializado em avaliação de pronúncia.
 
 **TAREFA:** Avaliar a pronúncia do aluno comparando o que ele deveria falar com o que realmente foi transcrito.
 
@@ -221,7 +262,7 @@ def pronunciation_score_with_ai(expected: str, predicted: str, provider: str = "
 
 4. Se houver erros, identifique quais sons/palavras foram problemáticos.
 
-**IMPORTANTE:** Retorne APENAS um JSON válido neste formato exato:
+**IMPORTANTE:** Retorne APENAS um JSON válido neste formato exato, com os campos nesta ordem ("score" primeiro):
 {{
     "score": <número de 0 a 100>,
     "match": <true se transcrição == esperado, false caso contrário>,
@@ -236,66 +277,391 @@ def pronunciation_score_with_ai(expected: str, predicted: str, provider: str = "
 
 NÃO adicione texto antes ou depois do JSON. Retorne apenas o objeto JSON."""
 
+
+def _strip_markdown_json(response_text: str) -> str:
+    """Remove cercas de markdown que alguns modelos adicionam em volta do JSON."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def _ai_result(result: dict, expected: str, predicted: str, provider: str, language: str) -> dict:
+    """Garantir que tem todos os campos necessários"""
+    return {
+        "score": result.get("score", 0),
+        "match": result.get("match", False),
+        "predicted": predicted,
+        "expected": expected,
+        "feedback": result.get("feedback", "Sem feedback disponível."),
+        "errors": result.get("errors", []),
+        "suggestions": result.get("suggestions", []),
+        "highlights": result.get("highlights", {"correct": [], "incorrect": []}),
+        "method": f"ai-{provider}",
+        "language": language
+    }
+
+
+def parse_ai_scoring(response_text: str, expected: str, predicted: str, provider: str, language: str) -> dict:
+    """
+    Converte a resposta textual do LLM no dicionário de avaliação.
+    Se a resposta não for JSON válido, usa o método tradicional como fallback.
+    """
+    inicio = time.perf_counter()
+    response_text = _strip_markdown_json(response_text)
     try:
-        print(f"[DEBUG] 📝 Criando instância do chat {provider}...")
-        
-        # Chamar o modelo apropriado
-        if provider.lower() == "gemini":
-            chat = GeminiChat()
-            print(f"[DEBUG] ✅ GeminiChat instanciado com sucesso")
-        else:  # openai é o padrão
-            chat = OpenAIChat()
-            print(f"[DEBUG] ✅ OpenAIChat instanciado com sucesso")
-        
-        print(f"[DEBUG] 🤖 Enviando prompt para IA...")
-        response_text = chat.reply_from_text(prompt, system="Você é um avaliador de pronúncia preciso. Sempre retorne JSON válido.")
-        print(f"[DEBUG] 📨 Resposta recebida (primeiros 200 chars): {response_text[:200]}...")
-        
-        # Tentar extrair JSON da resposta (alguns modelos podem adicionar markdown)
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            print(f"[DEBUG] 🔧 Removendo marcador ```json")
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            print(f"[DEBUG] 🔧 Removendo marcador ```")
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            print(f"[DEBUG] 🔧 Removendo marcador ``` do final")
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        print(f"[DEBUG] 🔍 Tentando parsear JSON...")
-        # Parse do JSON
         result = json.loads(response_text)
-        print(f"[DEBUG] ✅ JSON parseado com sucesso!")
-        print(f"[DEBUG] Score retornado: {result.get('score')}")
-        
-        # Garantir que tem todos os campos necessários
-        return {
-            "score": result.get("score", 0),
-            "match": result.get("match", False),
-            "predicted": predicted,
-            "expected": expected,
-            "feedback": result.get("feedback", "Sem feedback disponível."),
-            "errors": result.get("errors", []),
-            "suggestions": result.get("suggestions", []),
-            "highlights": result.get("highlights", {"correct": [], "incorrect": []}),
-            "method": f"ai-{provider}",
-            "language": language
-        }
-        
+        metrics.observe("llm_json_parse_duration_ms", (time.perf_counter() - inicio) * 1000, provider=provider.lower(), kind="single")
     except json.JSONDecodeError as e:
         # Se falhar no parse JSON, retornar método tradicional
-        print(f"[DEBUG] ❌ Erro ao parsear JSON da IA: {e}")
-        print(f"[DEBUG] Resposta completa: {response_text}")
+        metrics.inc("scoring_fallback", reason="invalid_json")
+        log.warning("Resposta da IA (%s) não é JSON válido: %s", provider, e)
+        log.debug("Resposta completa: %r", response_text)
         fallback = pronunciation_score(expected, predicted)
         fallback["ai_response"] = response_text  # Para debug
         return fallback
-        
+    return _ai_result(result, expected, predicted, provider, language)
+
+
+def _chat_provider(provider: str) -> str:
+    """Provedor de chat da avaliação: o pedido, ou a alternativa do roteador se ele estiver fora do ar ou lento."""
+    prov = "gemini" if provider.lower() == "gemini" else "openai"  # openai é o padrão
+    return provider_router.choose("chat", prov)
+
+
+def _ai_error_fallback(expected: str, predicted: str, e: Exception) -> dict:
+    if isinstance(e, CircuitOpenError):
+        # provedor fora do ar: nota local na hora, sem esperar timeout
+        metrics.inc("scoring_fallback", reason="circuit_open")
+        result = pronunciation_score(expected, predicted)
+        result["fallback"] = "circuit_open"
+        return result
+    # Qualquer outro erro, retornar método tradicional
+    metrics.inc("scoring_fallback", reason="error")
+    log.warning("Erro ao avaliar com IA: %s: %s", type(e).__name__, e, exc_info=log.isEnabledFor(logging.DEBUG))
+    return pronunciation_score(expected, predicted)
+
+
+def pronunciation_score_with_ai(expected: str, predicted: str, provider: str = "openai", language: str = "português") -> dict:
+    """
+    Avalia pronúncia usando GPT/Gemini para análise qualitativa detalhada.
+    
+    Args:
+        expected: Palavra/frase que deveria ser falada
+        predicted: O que foi realmente transcrito
+        provider: "openai" ou "gemini"
+        language: Idioma para contextualizar a avaliação
+    
+    Returns:
+        dict com score, feedback detalhado, sugestões, etc.
+    """
+    if not _ai_available(provider):
+        return pronunciation_score(expected, predicted)  # Fallback para método tradicional
+
+    prompt = build_scoring_prompt(expected, predicted, language)
+
+    try:
+        # Chamar o modelo apropriado (cliente reaproveitado do registro do processo); cache e `method`
+        # usam o provedor que de fato atende, que o roteador pode ter trocado
+        prov = _chat_provider(provider)
+        chat = get_chat(prov)
+        cache_key = _scoring_cache_key(expected, predicted, prov, client_model_name(chat), language)
+        if scoring_cache.enabled:
+            cached = _from_cache(scoring_cache.get(cache_key), expected, predicted, prov)
+            if cached is not None:
+                return cached
+        with span("scoring.llm", log, provider=prov, model=client_model_name(chat), language=language):
+            response_text = chat.reply_from_text(prompt, system=SCORING_SYSTEM_PROMPT, temperature=SCORING_TEMPERATURE)
+        result = parse_ai_scoring(response_text, expected, predicted, prov, language)
+        if _cacheable(result):
+            scoring_cache.set(cache_key, dict(result))
+        return result
+    except Exception as e:
+        return _ai_error_fallback(expected, predicted, e)
+
+
+async def pronunciation_score_with_ai_stream(expected: str, predicted: str, provider: str = "openai", language: str = "português"):
+    """
+    Versão em streaming de `pronunciation_score_with_ai_async` (gerador assíncrono).
+
+    Gera ("field", {"name", "value"}) para cada campo do JSON assim que o LLM
+    termina de escrevê-lo (o prompt pede `score` primeiro) e, no fim,
+    ("result", avaliação), que é sempre o resultado definitivo (inclusive em
+    fallback e cache hit). Não passa pelo micro-lote: cada avaliação é uma chamada.
+    """
+    if not _ai_available(provider):
+        yield "result", pronunciation_score(expected, predicted)
+        return
+
+    prov = _chat_provider(provider)
+    try:
+        chat = await get_async_chat(prov)
+        cache_key = _scoring_cache_key(expected, predicted, prov, client_model_name(chat), language)
+        if scoring_cache.enabled:
+            cached = _from_cache(await scoring_cache.aget(cache_key), expected, predicted, prov)
+            if cached is not None:
+                yield "result", cached
+                return
+        prompt = build_scoring_prompt(expected, predicted, language)
+        parser = JSONFieldStream()
+        parts = []
+        async for token in chat.stream_reply_from_text(prompt, system=SCORING_SYSTEM_PROMPT, temperature=SCORING_TEMPERATURE):
+            parts.append(token)
+            for name, value in parser.feed(token):
+                yield "field", {"name": name, "value": value}
+        result = parse_ai_scoring("".join(parts), expected, predicted, prov, language)
+        if _cacheable(result):
+            await scoring_cache.aset(cache_key, dict(result))
+    except Exception as e:
+        result = _ai_error_fallback(expected, predicted, e)
+    yield "result", result
+
+
+async def _score_single_async(provider: str, expected: str, predicted: str, language: str) -> dict:
+    """Uma chamada ao LLM para um único par esperado/transcrito."""
+    chat = await get_async_chat(provider)
+    prompt = build_scoring_prompt(expected, predicted, language)
+    with span("scoring.llm", log, provider=provider, model=client_model_name(chat), language=language):
+        response_text = await chat.reply_from_text(prompt, system=SCORING_SYSTEM_PROMPT, temperature=SCORING_TEMPERATURE)
+    return parse_ai_scoring(response_text, expected, predicted, provider, language)
+
+
+def build_batch_scoring_prompt(items: list, language: str = "português") -> str:
+    """Prompt com vários pares esperado/transcrito: as instruções vão uma única vez."""
+    pares = "\n".join(
+        f'{i}. Esperado: "{expected}" | Transcrito: "{predicted}"' for i, (expected, predicted) in enumerate(items)
+    )
+    return f"""Você é um professor de {language} especializado em avaliação de pronúncia.
+
+**TAREFA:** Avaliar a pronúncia de VÁRIOS alunos. Para cada item, compare o que o aluno deveria falar com o que realmente foi transcrito.
+
+**ITENS:**
+{pares}
+
+**INSTRUÇÕES (para cada item):**
+1. Dê uma nota de 0 a 100 considerando:
+   - Precisão das palavras (70%)
+   - Possíveis erros de pronúncia detectados na transcrição (20%)
+   - Clareza e fluência (10%)
+2. Se a transcrição for EXATAMENTE igual ao esperado, dê nota 100.
+3. Forneça feedback construtivo e específico (acertos, erros e dicas práticas).
+4. Se houver erros, identifique quais sons/palavras foram problemáticos.
+
+**IMPORTANTE:** Retorne APENAS um array JSON válido, com um objeto por item, neste formato exato:
+[
+    {{
+        "id": <número do item>,
+        "score": <número de 0 a 100>,
+        "match": <true se transcrição == esperado, false caso contrário>,
+        "feedback": "<feedback detalhado em {language}>",
+        "errors": ["<lista de erros específicos>"],
+        "suggestions": ["<dicas práticas para melhorar>"],
+        "highlights": {{"correct": ["<acertos>"], "incorrect": ["<erros>"]}}
+    }}
+]
+
+NÃO adicione texto antes ou depois do JSON. Retorne apenas o array JSON."""
+
+
+def parse_ai_batch_scoring(response_text: str, items: list, provider: str, language: str) -> list:
+    """
+    Converte a resposta em lote em uma lista alinhada com `items`.
+    Itens ausentes ou malformados ficam como None (serão reavaliados individualmente).
+    """
+    inicio = time.perf_counter()
+    try:
+        parsed = json.loads(_strip_markdown_json(response_text))
+    except json.JSONDecodeError:
+        metrics.inc("scoring_fallback", reason="invalid_json_batch")
+        return [None] * len(items)
+    metrics.observe("llm_json_parse_duration_ms", (time.perf_counter() - inicio) * 1000, provider=provider, kind="batch")
+    if not isinstance(parsed, list):
+        return [None] * len(items)
+    by_id = {}
+    for entry in parsed:
+        if isinstance(entry, dict) and isinstance(entry.get("id"), int) and "score" in entry:
+            by_id[entry["id"]] = entry
+    return [
+        _ai_result(by_id[i], expected, predicted, provider, language) if i in by_id else None
+        for i, (expected, predicted) in enumerate(items)
+    ]
+
+
+async def _score_batch_async(key: tuple, items: list) -> list:
+    provider, language = key
+    chat = await get_async_chat(provider)
+    prompt = build_batch_scoring_prompt(items, language)
+    with span("scoring.llm_batch", log, provider=provider, model=client_model_name(chat), items=len(items)):
+        response_text = await chat.reply_from_text(prompt, system=SCORING_SYSTEM_PROMPT, temperature=SCORING_TEMPERATURE)
+    results = parse_ai_batch_scoring(response_text, items, provider, language)
+    for result in results:
+        if result is not None:
+            result["_prompt"] = "batch"  # retirado em pronunciation_score_with_ai_async (chave do cache)
+    metrics.inc("scoring_microbatch", provider=provider, outcome="partial" if None in results else "ok")
+    return results
+
+
+# Micro-batching: avaliações concorrentes (mesmo provedor e idioma) esperam até
+# SCORING_MICROBATCH_MS e vão ao LLM em um único prompt de até SCORING_MICROBATCH_MAX itens.
+# Desligado por padrão (0): ligado, toda avaliação espera até SCORING_MICROBATCH_MS antes de
+# sair, o que só compensa sob carga alta de avaliações simultâneas.
+SCORING_MICROBATCH_MS = float(os.getenv("SCORING_MICROBATCH_MS", "0"))
+scoring_batcher = MicroBatcher(
+    process_batch=_score_batch_async,
+    process_single=lambda key, item: _score_single_async(key[0], item[0], item[1], key[1]),
+    max_wait_ms=SCORING_MICROBATCH_MS,
+    max_batch=int(os.getenv("SCORING_MICROBATCH_MAX", "8")),
+)
+
+
+async def pronunciation_score_with_ai_async(expected: str, predicted: str, provider: str = "openai", language: str = "português") -> dict:
+    """
+    Mesma avaliação de `pronunciation_score_with_ai`, mas sem bloquear o event loop:
+    usa os clientes assíncronos dos provedores.
+    """
+    if not _ai_available(provider):
+        return pronunciation_score(expected, predicted)  # Fallback para método tradicional
+
+    prov = _chat_provider(provider)
+    try:
+        chat = await get_async_chat(prov)
+        model = client_model_name(chat)
+        cache_key = _scoring_cache_key(expected, predicted, prov, model, language)
+        if scoring_cache.enabled:
+            # com micro-batching, a nota do prompt em lote também serve
+            prompts = ("single", "batch") if SCORING_MICROBATCH_MS > 0 else ("single",)
+            for prompt in prompts:
+                cached = await scoring_cache.aget(_scoring_cache_key(expected, predicted, prov, model, language, prompt))
+                if cached is not None:
+                    break
+            cached = _from_cache(cached, expected, predicted, prov)
+            if cached is not None:
+                return cached
+        if SCORING_MICROBATCH_MS > 0:
+            result = await scoring_batcher.submit((prov, language), (expected, predicted))
+        else:
+            result = await _score_single_async(prov, expected, predicted, language)
+        prompt = result.pop("_prompt", "single")
+        if _cacheable(result):
+            await scoring_cache.aset(_scoring_cache_key(expected, predicted, prov, model, language, prompt), dict(result))
+        return result
     except Exception as e:
-        # Qualquer outro erro, retornar método tradicional
-        print(f"[DEBUG] ❌ Erro ao avaliar com IA: {type(e).__name__}: {e}")
-        import traceback
-        print(f"[DEBUG] Traceback completo:")
-        traceback.print_exc()
-        return pronunciation_score(expected, predicted)
+        return _ai_error_fallback(expected, predicted, e)
+
+
+# ============================================================================
+# AVALIAÇÃO EM NÍVEIS (tiered): similaridade local primeiro, IA só na faixa incerta
+# ============================================================================
+# Transcrição idêntica ao esperado (o próprio prompt manda dar 100) ou muito
+# diferente dele não precisa de LLM: a nota sai localmente em microssegundos.
+# Só transcrições com similaridade dentro de [SCORING_TIER_LOW, SCORING_TIER_HIGH)
+# são enviadas para `pronunciation_score_with_ai`.
+# Opt-in: SCORING_MODE=tiered; o padrão "ai" sempre chama a IA, como antes.
+SCORING_MODE = os.getenv("SCORING_MODE", "ai")
+SCORING_TIER_LOW = float(os.getenv("SCORING_TIER_LOW", "0.3"))
+SCORING_TIER_HIGH = float(os.getenv("SCORING_TIER_HIGH", "0.9"))
+
+
+def word_highlights(expected: str, predicted: str) -> dict:
+    """Separa as palavras esperadas entre reconhecidas e não reconhecidas na transcrição."""
+    spoken = set(_norm(predicted).split())
+    words = _norm(expected).split()
+    return {
+        "correct": [w for w in words if w in spoken],
+        "incorrect": [w for w in words if w not in spoken],
+    }
+
+
+def local_tier_score(expected: str, predicted: str, language: str = "português",
+                     low: Optional[float] = None, high: Optional[float] = None) -> Optional[dict]:
+    """
+    Avalia localmente quando o resultado é óbvio. Retorna None se a transcrição
+    cair na faixa incerta e precisar ser escalada para a IA. Texto esperado ou
+    transcrição vazios nunca contam como acerto: nota baixa (0).
+    """
+    low = SCORING_TIER_LOW if low is None else low
+    high = SCORING_TIER_HIGH if high is None else high
+    expected, predicted = expected or "", predicted or ""
+    vazio = not _norm(expected) or not _norm(predicted)
+
+    if vazio:
+        tier, feedback = "local-low", "Não há o que comparar: o texto esperado ou a transcrição está vazio."
+        suggestions = ["Grave de novo, falando perto do microfone, e confira o texto esperado."]
+    elif _norm(expected) == _norm(predicted):
+        tier, feedback = "local-exact", "Pronúncia correta! A transcrição corresponde exatamente ao texto esperado."
+        suggestions = []
+    else:
+        sim = string_similarity(expected, predicted)
+        if sim >= high:
+            tier, feedback = "local-high", "Pronúncia muito próxima do esperado, com pequenas diferenças."
+            suggestions = ["Repita a frase prestando atenção às palavras destacadas."]
+        elif sim < low:
+            tier, feedback = "local-low", "A transcrição ficou muito diferente do texto esperado."
+            suggestions = [
+                "Fale mais devagar, articulando cada palavra.",
+                "Confira se está lendo o texto correto e grave em um ambiente silencioso.",
+            ]
+        else:
+            return None
+
+    result = pronunciation_score(expected, predicted)
+    highlights = word_highlights(expected, predicted)
+    result.update({
+        "match": result["hit"],
+        "expected": expected,
+        "feedback": feedback,
+        "errors": [f"Palavra não reconhecida: '{w}'" for w in highlights["incorrect"]],
+        "suggestions": suggestions,
+        "highlights": highlights,
+        "language": language,
+        "scoring_tier": tier,
+    })
+    if vazio:
+        result.update(score=0.0, hit=False, match=False)
+    elif tier == "local-exact":
+        result["score"] = 100.0
+    elif tier == "local-high":
+        result["score"] = result["similarity"]
+    return result
+
+
+def pronunciation_score_tiered(expected: str, predicted: str, provider: str = "openai", language: str = "português",
+                               low: Optional[float] = None, high: Optional[float] = None) -> dict:
+    """Avaliação em níveis: local quando o resultado é óbvio, IA na faixa incerta."""
+    local = local_tier_score(expected, predicted, language, low, high)
+    metrics.inc("scoring_tier", tier=local["scoring_tier"] if local else "ai")
+    if local is not None:
+        return local
+    result = pronunciation_score_with_ai(expected, predicted, provider=provider, language=language)
+    result["scoring_tier"] = "ai"
+    return result
+
+
+async def pronunciation_score_tiered_async(expected: str, predicted: str, provider: str = "openai", language: str = "português",
+                                           low: Optional[float] = None, high: Optional[float] = None) -> dict:
+    """Versão assíncrona de `pronunciation_score_tiered`."""
+    local = local_tier_score(expected, predicted, language, low, high)
+    metrics.inc("scoring_tier", tier=local["scoring_tier"] if local else "ai")
+    if local is not None:
+        return local
+    result = await pronunciation_score_with_ai_async(expected, predicted, provider=provider, language=language)
+    result["scoring_tier"] = "ai"
+    return result
+
+
+async def pronunciation_score_tiered_stream(expected: str, predicted: str, provider: str = "openai", language: str = "português",
+                                            low: Optional[float] = None, high: Optional[float] = None):
+    """Versão em streaming de `pronunciation_score_tiered_async` (mesmos eventos de `pronunciation_score_with_ai_stream`)."""
+    local = local_tier_score(expected, predicted, language, low, high)
+    metrics.inc("scoring_tier", tier=local["scoring_tier"] if local else "ai")
+    if local is not None:
+        yield "result", local
+        return
+    async for event, data in pronunciation_score_with_ai_stream(expected, predicted, provider=provider, language=language):
+        if event == "result":
+            data["scoring_tier"] = "ai"
+        yield event, data
@@ -0,0 +1,85 @@
+"""
+Tempos por etapa de uma requisição, devolvidos ao cliente.
+
+Cada resposta de /avaliar, /transcrever, /falar e /chat_texto leva o cabeçalho
+`Server-Timing` (ingest, transcription, scoring/chat, serialization, total; o
+`desc` traz provedor e modelo) e, com `timings=true`, o mesmo detalhamento no
+campo `timings` do JSON. Assim o app cruza sessões lentas com a latência do
+provedor sem acesso aos logs do servidor.
+
+A serialização é medida sobre o corpo sem o campo `timings`, que é anexado
+depois (um json.dumps de poucos bytes) para não serializar a resposta duas vezes.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+def _json_bytes(body) -> bytes:
+    # mesmos parâmetros do JSONResponse do Starlette
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class RequestTimings:
+    def __init__(self, include: bool = False):
+        self.include = include   # anexar o campo `timings` ao corpo JSON
+        self.inicio = time.perf_counter()
+        self.stages: dict = {}   # etapa -> ms
+        self.details: dict = {}  # etapa -> {"provider": ..., "model": ...}
+
+    def add(self, stage: str, ms: float, **details):
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+        self.describe(stage, **details)
+
+    def describe(self, stage: str, **details):
+        """Acrescenta detalhes (provedor, modelo, cache...) a uma etapa; valores None são ignorados."""
+        details = {k: v for k, v in details.items() if v is not None}
+        if details:
+            self.details.setdefault(stage, {}).update(details)
+
+    @contextmanager
+    def stage(self, stage: str, **details):
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(stage, (time.perf_counter() - inicio) * 1000, **details)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_ms(), 1),
+            "stages": {
+                stage: {"ms": round(ms, 1), **self.details.get(stage, {})}
+                for stage, ms in self.stages.items()
+            },
+        }
+
+    def header(self) -> str:
+        """Valor do cabeçalho Server-Timing (etapas na ordem em que foram medidas + total)."""
+        parts = []
+        for stage, ms in self.stages.items():
+            part = f"{stage};dur={ms:.1f}"
+            desc = " ".join(str(v) for k, v in self.details.get(stage, {}).items() if k in ("provider", "model", "method"))
+            if desc:
+                part += ';desc="' + desc.replace("\\", "").replace('"', "'") + '"'
+            parts.append(part)
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def render_json(self, body) -> bytes:
+        """Serializa `body` medindo a etapa "serialization"; com `include`, anexa o campo `timings`."""
+        inicio = time.perf_counter()
+        content = _json_bytes(body)
+        self.add("serialization", (time.perf_counter() - inicio) * 1000)
+        if self.include and isinstance(body, dict):
+            timings = _json_bytes(self.as_dict())
+            content = content[:-1] + (b',"timings":' if len(content) > 2 else b'"timings":') + timings + b"}"
+        return content
+
+
+def wants_timings(flag: Optional[object]) -> bool:
+    return flag is not None and str(flag).lower() in ("true", "1")
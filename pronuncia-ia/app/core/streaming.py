@@ -0,0 +1,88 @@
+"""
+Respostas em streaming (Server-Sent Events).
+
+- `sse_event` formata um evento SSE com dados JSON.
+- `JSONFieldStream` recebe o texto de um objeto JSON em pedaços (tokens do LLM)
+  e devolve cada campo de primeiro nível assim que o valor dele termina; com
+  `score` primeiro no prompt, a nota chega ao cliente antes do `feedback`.
+"""
+import json
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def wants_stream(flag, accept: str = "") -> bool:
+    """Streaming pedido pelo campo `stream` ou pelo cabeçalho Accept: text/event-stream."""
+    if flag is not None and str(flag).lower() in ("true", "1"):
+        return True
+    return "text/event-stream" in (accept or "").lower()
+
+
+class JSONFieldStream:
+    """
+    Parser incremental de um objeto JSON.
+
+    `feed(texto)` devolve a lista de (campo, valor) de primeiro nível concluídos
+    nesse pedaço. Texto antes do primeiro "{" (ex.: cerca ```json) é ignorado.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._key = None
+        self._value_start = None
+        self.fields = {}
+        self.closed = False
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        done = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self.closed:
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        self._key = json.loads(buffer[self._string_start:i + 1])
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[self._value_start:i] if self._value_start is not None else "", done)
+                    self.closed = True
+            elif self._depth == 1 and c == ":" and self._value_start is None:
+                self._value_start = i + 1
+            elif self._depth == 1 and c == ",":
+                self._emit(buffer[self._value_start:i] if self._value_start is not None else "", done)
+            i += 1
+        self._pos = i
+        return done
+
+    def _emit(self, raw: str, done: list):
+        key, self._key, self._value_start = self._key, None, None
+        if key is None or not raw.strip():
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return  # valor malformado: o parse final decide
+        self.fields[key] = value
+        done.append((key, value))
@@ -0,0 +1,385 @@
+"""
+Fila assíncrona de avaliações (/avaliar com mode=async).
+
+A requisição grava o áudio em disco e uma linha na fila SQLite e responde 202
+na hora; workers (tarefas da própria API e/ou outros processos rodando
+scripts/submission_worker.py) pegam as submissões, processam e gravam o
+resultado, consultado em GET /submissions/{id} ou entregue por webhook.
+
+Cada submissão pega por um worker recebe um prazo (lease): se o processo
+morrer no meio, ela volta para a fila quando o prazo vence, até
+SUBMISSION_MAX_ATTEMPTS tentativas. O SQLite em modo WAL deixa vários
+processos disputarem a mesma fila com segurança.
+
+O servidor faz um POST para a `webhook_url` informada pelo cliente, então a URL
+passa por `validate_webhook_url` (na submissão e de novo na entrega): só https,
+e o host precisa resolver apenas para endereços públicos (nada de loopback,
+rede interna ou link-local, como o metadata da nuvem) ou estar em
+SUBMISSION_WEBHOOK_ALLOWED_HOSTS. Na entrega, `pin_webhook_url` conecta no
+endereço que acabou de ser validado (Host e SNI continuam os da URL): uma
+segunda resolução de DNS não tem como trocar o destino (DNS rebinding).
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+STATUSES = ("queued", "processing", "done", "error")
+
+SUBMISSION_POLL_S = float(os.getenv("SUBMISSION_POLL_S", "0.5"))
+SUBMISSION_LEASE_S = float(os.getenv("SUBMISSION_LEASE_S", "300"))
+SUBMISSION_MAX_ATTEMPTS = int(os.getenv("SUBMISSION_MAX_ATTEMPTS", "3"))
+SUBMISSION_RETENTION_S = float(os.getenv("SUBMISSION_RETENTION_S", str(7 * 24 * 3600)))
+WEBHOOK_ATTEMPTS = int(os.getenv("SUBMISSION_WEBHOOK_ATTEMPTS", "3"))
+# Hosts liberados mesmo sem passar pela checagem de endereço público ("exemplo.com" ou ".exemplo.com"
+# para incluir subdomínios); vazio = qualquer host público
+WEBHOOK_ALLOWED_HOSTS = tuple(
+    h.strip().lower() for h in os.getenv("SUBMISSION_WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()
+)
+
+
+class WebhookURLError(ValueError):
+    """webhook_url recusada (esquema, host ou endereço não permitido)."""
+
+
+class PermanentSubmissionError(RuntimeError):
+    """Falha que não muda com nova tentativa (ex.: áudio ausente ou inválido); não volta para a fila."""
+
+
+# 4xx que ainda valem nova tentativa: timeout, conflito, rate limit
+_RETRYABLE_4XX = (408, 409, 425, 429)
+
+
+def is_permanent_error(exc: Exception) -> bool:
+    """PermanentSubmissionError ou erro HTTP 4xx do provedor (pedido recusado), exceto os passageiros."""
+    if isinstance(exc, PermanentSubmissionError):
+        return True
+    for status in (getattr(exc, "status_code", None), getattr(exc, "code", None),
+                   getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(status, int) and not isinstance(status, bool):
+            return 400 <= status < 500 and status not in _RETRYABLE_4XX
+    return False
+
+
+def _host_allowed(host: str, allowed_hosts: tuple) -> bool:
+    return any(host == h.lstrip(".") or (h.startswith(".") and host.endswith(h)) for h in allowed_hosts)
+
+
+def validate_webhook_url(url: str, allowed_hosts: tuple = WEBHOOK_ALLOWED_HOSTS, resolver=socket.getaddrinfo) -> str:
+    """
+    Devolve a URL se ela puder receber o webhook; senão levanta WebhookURLError.
+    Faz resolução de DNS (bloqueante): em código assíncrono, chame via asyncio.to_thread.
+    """
+    return _resolve_webhook_url(url, allowed_hosts, resolver)[0]
+
+
+def pin_webhook_url(url: str, allowed_hosts: tuple = WEBHOOK_ALLOWED_HOSTS, resolver=socket.getaddrinfo) -> tuple:
+    """
+    Valida a URL e devolve (url_com_ip, headers, extensions) para o httpx conectar no
+    endereço validado, com Host e SNI (verificação do certificado) do host original.
+    Hosts da allowlist não são resolvidos aqui: seguem com a URL original.
+    """
+    url, addresses = _resolve_webhook_url(url, allowed_hosts, resolver)
+    if not addresses:
+        return url, {}, {}
+    parts = urlsplit(url)
+    address = addresses[0]
+    netloc = f"[{address}]" if ":" in address else address
+    if parts.port:
+        netloc += f":{parts.port}"
+    return parts._replace(netloc=netloc).geturl(), {"Host": parts.netloc}, {"sni_hostname": parts.hostname}
+
+
+def _resolve_webhook_url(url: str, allowed_hosts: tuple, resolver) -> tuple:
+    """(url, endereços públicos validados); lista vazia para host da allowlist."""
+    try:
+        parts = urlsplit(str(url or ""))
+        port = parts.port or 443
+    except ValueError:
+        raise WebhookURLError("webhook_url inválida.")
+    if parts.scheme.lower() != "https":
+        raise WebhookURLError("webhook_url precisa usar https.")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise WebhookURLError("webhook_url sem host.")
+    if parts.username or parts.password:
+        raise WebhookURLError("webhook_url não pode conter credenciais.")
+    if _host_allowed(host, allowed_hosts):
+        return url, []
+    if allowed_hosts:
+        raise WebhookURLError(f"Host {host} fora da lista SUBMISSION_WEBHOOK_ALLOWED_HOSTS.")
+    try:
+        addresses = list(dict.fromkeys(info[4][0] for info in resolver(host, port, proto=socket.IPPROTO_TCP)))
+    except (OSError, UnicodeError):
+        raise WebhookURLError(f"Host {host} não resolve.")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            # loopback, rede privada, link-local (metadata da nuvem), reservado...
+            raise WebhookURLError(f"Host {host} resolve para um endereço não público ({ip}).")
+    if not addresses:
+        raise WebhookURLError(f"Host {host} não resolve.")
+    return url, addresses
+
+
+class SubmissionQueue:
+    """Fila durável em SQLite; o áudio de cada submissão fica em `<pasta da fila>/audio`."""
+
+    def __init__(self, path: str, lease_s: float = SUBMISSION_LEASE_S, max_attempts: int = SUBMISSION_MAX_ATTEMPTS):
+        self.path = str(path)
+        self.audio_dir = Path(self.path).parent / "audio"
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, audio_path TEXT,"
+            " webhook_url TEXT, webhook_status TEXT, result TEXT, error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL,"
+            " created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS submissions_status ON submissions(status, created)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, submission_id: str, params: dict, audio: bytes, audio_name: str = "audio.wav",
+                webhook_url: Optional[str] = None):
+        """Grava o áudio (de forma atômica) e depois a submissão; só então ela fica visível aos workers."""
+        suffix = os.path.splitext(audio_name or "")[1] or ".wav"
+        audio_path = self.audio_dir / f"{submission_id}{suffix}"
+        tmp = audio_path.with_suffix(suffix + ".tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, audio_path)
+            now = time.time()
+            self._conn().execute(
+                "INSERT INTO submissions (id, status, params, audio_path, webhook_url, created, updated)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (submission_id, json.dumps(params, ensure_ascii=False), str(audio_path), webhook_url, now, now),
+            )
+        except BaseException:
+            # sem a linha na fila, nenhum worker vai processar (nem apagar) o áudio
+            for leftover in (tmp, audio_path):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+            raise
+
+    def claim(self) -> Optional[dict]:
+        """Pega a submissão mais antiga na fila (ou com lease vencido) para processamento."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM submissions WHERE status = 'queued'"
+                " OR (status = 'processing' AND lease_until < ?) ORDER BY created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] >= self.max_attempts:
+                # worker morreu em todas as tentativas: desiste em vez de repetir para sempre
+                self._finish(conn, row["id"], "error", error="Prazo de processamento esgotado.")
+                conn.execute("COMMIT")
+                return self.claim()
+            conn.execute(
+                "UPDATE submissions SET status = 'processing', attempts = attempts + 1,"
+                " lease_until = ?, updated = ? WHERE id = ?",
+                (now + self.lease_s, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._record(row, status="processing", attempts=row["attempts"] + 1)
+
+    def complete(self, submission_id: str, result: dict):
+        self._finish(self._conn(), submission_id, "done", result=result)
+
+    def fail(self, submission_id: str, error: str, retry: bool = False) -> bool:
+        """
+        Registra a falha; com `retry`, devolve a submissão à fila enquanto houver
+        tentativas. Retorna True se ela voltou para a fila.
+        """
+        conn = self._conn()
+        if retry:
+            cur = conn.execute(
+                "UPDATE submissions SET status = 'queued', error = ?, lease_until = NULL, updated = ?"
+                " WHERE id = ? AND attempts < ?",
+                (error, time.time(), submission_id, self.max_attempts),
+            )
+            if cur.rowcount:
+                return True
+        self._finish(conn, submission_id, "error", error=error)
+        return False
+
+    def _finish(self, conn: sqlite3.Connection, submission_id: str, status: str,
+                result: Optional[dict] = None, error: Optional[str] = None):
+        row = conn.execute("SELECT audio_path FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+        conn.execute(
+            "UPDATE submissions SET status = ?, result = ?, error = ?, lease_until = NULL,"
+            " audio_path = NULL, updated = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             time.time(), submission_id),
+        )
+        if row is not None and row["audio_path"]:
+            # o áudio só serve para processar; terminado (com sucesso ou não), sai do disco
+            try:
+                os.remove(row["audio_path"])
+            except OSError:
+                pass
+
+    def set_webhook_status(self, submission_id: str, webhook_status: str):
+        self._conn().execute(
+            "UPDATE submissions SET webhook_status = ? WHERE id = ?", (webhook_status, submission_id)
+        )
+
+    def get(self, submission_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def purge(self, older_than_s: float = SUBMISSION_RETENTION_S) -> int:
+        """Remove submissões terminadas há mais de `older_than_s` segundos."""
+        cur = self._conn().execute(
+            "DELETE FROM submissions WHERE status IN ('done', 'error') AND updated < ?",
+            (time.time() - older_than_s,),
+        )
+        return cur.rowcount
+
+    def stats(self) -> dict:
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, n in self._conn().execute("SELECT status, COUNT(*) FROM submissions GROUP BY status"):
+            counts[status] = n
+        oldest = self._conn().execute(
+            "SELECT MIN(created) FROM submissions WHERE status = 'queued'"
+        ).fetchone()[0]
+        counts["oldest_queued_s"] = round(time.time() - oldest, 1) if oldest else None
+        return counts
+
+    @staticmethod
+    def _record(row: sqlite3.Row, **overrides) -> dict:
+        record = dict(row)
+        record.update(overrides)
+        record["params"] = json.loads(record["params"])
+        record["result"] = json.loads(record["result"]) if record.get("result") else None
+        return record
+
+
+class SubmissionWorker:
+    """
+    `concurrency` tarefas asyncio consumindo a fila. `handler(submissão)` devolve o
+    resultado; `notify(url, corpo)` (opcional) entrega o webhook.
+    """
+
+    def __init__(self, queue: SubmissionQueue, handler: Callable[[dict], Awaitable[dict]], concurrency: int = 2,
+                 notify: Optional[Callable[[str, dict], Awaitable[None]]] = None, poll_s: float = SUBMISSION_POLL_S):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.notify = notify
+        self.poll_s = poll_s
+        self.processed = 0
+        self.failed = 0
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks or self.concurrency <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        """Para processos dedicados (scripts/submission_worker.py)."""
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    def wake(self):
+        """Avisa que há submissão nova (evita esperar o próximo poll)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _loop(self):
+        last_purge = 0.0
+        while True:
+            submission = await asyncio.to_thread(self.queue.claim)
+            if submission is None:
+                if time.monotonic() - last_purge > 3600:
+                    last_purge = time.monotonic()
+                    await asyncio.to_thread(self.queue.purge)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.process(submission)
+
+    async def process(self, submission: dict):
+        try:
+            result = await self.handler(submission)
+        except Exception as e:
+            # falhas de provedor costumam ser passageiras: volta para a fila enquanto houver tentativas;
+            # erros permanentes (áudio inválido, 4xx do provedor) terminam na hora
+            retry = not is_permanent_error(e)
+            if await asyncio.to_thread(self.queue.fail, submission["id"], f"{type(e).__name__}: {e}", retry):
+                return
+            self.failed += 1
+            body = {"submission_id": submission["id"], "status": "error", "error": str(e)}
+        else:
+            self.processed += 1
+            await asyncio.to_thread(self.queue.complete, submission["id"], result)
+            body = {"submission_id": submission["id"], "status": "done", "result": result}
+        if submission.get("webhook_url") and self.notify is not None:
+            await self._deliver(submission["id"], submission["webhook_url"], body)
+
+    async def _deliver(self, submission_id: str, url: str, body: dict):
+        error = None
+        for attempt in range(WEBHOOK_ATTEMPTS):
+            try:
+                await self.notify(url, body)
+                await asyncio.to_thread(self.queue.set_webhook_status, submission_id, "delivered")
+                return
+            except Exception as e:
+                error = e
+                await asyncio.sleep(2 ** attempt)
+        await asyncio.to_thread(self.queue.set_webhook_status, submission_id, f"failed: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,146 @@
+"""
+Logs de depuração e spans cronometrados (no lugar dos print("[DEBUG] ...")).
+
+Tudo passa pelo logger "pronuncia" do módulo logging:
+- TRACE_LEVEL: nível mínimo (DEBUG, INFO, WARNING...; padrão WARNING). Abaixo
+  dele, `log.debug(...)` e `span(...)` custam só uma comparação de inteiros: a
+  mensagem nem chega a ser formatada (passe argumentos com %s, não f-strings).
+- TRACE_SAMPLE: fração das requisições rastreadas (0 a 1, padrão 1). O sorteio
+  acontece no primeiro span da requisição e vale para os logs e spans internos
+  dela (contextvars): uma requisição aparece inteira ou não aparece. Avisos e
+  erros saem sempre.
+
+Uso:
+    log = get_logger("scoring")
+    log.debug("resposta com %d chars", len(texto))
+    with span("scoring.ai", log, provider=prov) as s:
+        ...
+        s.set(method=result["method"])
+"""
+import contextvars
+import logging
+import os
+import random
+import time
+
+ROOT_LOGGER = "pronuncia"
+TRACE_SAMPLE = float(os.getenv("TRACE_SAMPLE", "1"))
+
+_sampled: contextvars.ContextVar = contextvars.ContextVar("trace_sampled", default=None)
+
+
+class _SampleFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or _sampled.get() is not False
+
+
+_filter = _SampleFilter()
+
+
+def configure(level: str = None, sample: float = None):
+    """Aplica TRACE_LEVEL/TRACE_SAMPLE (chamado no import; útil de novo em testes)."""
+    global TRACE_SAMPLE
+    if sample is not None:
+        TRACE_SAMPLE = sample
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel((level or os.getenv("TRACE_LEVEL", "WARNING")).upper())
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger "pronuncia.<name>", sujeito à amostragem de TRACE_SAMPLE."""
+    logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+    if _filter not in logger.filters:
+        logger.addFilter(_filter)
+    return logger
+
+
+class _NullSpan:
+    """Span desligado: entra, sai e ignora atributos sem medir nada."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "logger", "attrs", "elapsed_ms", "_inicio", "_token")
+
+    def __init__(self, name: str, logger: logging.Logger, attrs: dict, token=None):
+        self.name = name
+        self.logger = logger
+        self.attrs = attrs
+        self.elapsed_ms = None
+        self._token = token
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed_ms = (time.perf_counter() - self._inicio) * 1000
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.logger.debug("%s %.1fms %s", self.name, self.elapsed_ms, self.attrs)
+        _reset(self._token)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _UnsampledSpan(_NullSpan):
+    """Primeiro span de uma requisição fora da amostra: só desfaz o sorteio na saída."""
+
+    __slots__ = ("_token",)
+
+    def __init__(self, token):
+        self._token = token
+
+    def __exit__(self, *exc):
+        _reset(self._token)
+        return False
+
+
+def _reset(token):
+    if token is not None:
+        try:
+            _sampled.reset(token)
+        except ValueError:
+            pass  # saiu em outro contexto (ex.: gerador retomado em outra tarefa)
+
+
+def span(name: str, logger: logging.Logger = None, **attrs):
+    """
+    Context manager que mede o bloco e registra "<nome> <ms> <atributos>" em DEBUG.
+    Com o nível acima de DEBUG ou a requisição fora da amostra, não mede nada.
+    """
+    logger = logger or _log
+    if not logger.isEnabledFor(logging.DEBUG):
+        return _NULL_SPAN
+    sampled = _sampled.get()
+    token = None
+    if sampled is None:
+        sampled = TRACE_SAMPLE >= 1 or random.random() < TRACE_SAMPLE
+        token = _sampled.set(sampled)
+    if not sampled:
+        return _UnsampledSpan(token) if token is not None else _NULL_SPAN
+    return Span(name, logger, attrs, token)
+
+
+configure()
+_log = get_logger("trace")
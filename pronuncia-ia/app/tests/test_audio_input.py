@@ -0,0 +1,154 @@
+# Testes da ingestão de áudio em memória (AudioPayload)
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sys
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.audio_input import AudioDecodeError, AudioPayload, BodyTooLarge, read_json_bounded, read_json_with_audio
+
+
+def test_small_upload_stays_in_memory():
+    payload = AudioPayload("fala.opus", spool_max=1024)
+    payload.write(b"abc")
+    payload.write(b"def")
+
+    assert payload.in_memory
+    assert payload.data() == b"abcdef"
+    assert payload.sha256 == hashlib.sha256(b"abcdef").hexdigest()
+    assert payload.mime == "audio/ogg"
+    payload.close()
+
+
+def test_large_upload_spools_to_disk_and_is_removed():
+    payload = AudioPayload("fala.wav", spool_max=4)
+    payload.write(b"1234")
+    payload.write(b"5678")
+
+    assert not payload.in_memory
+    path = payload.path()
+    assert path.endswith(".wav") and os.path.exists(path)
+    assert payload.data() == b"12345678"
+    payload.close()
+    assert not os.path.exists(path)
+
+
+def test_path_is_materialized_only_on_demand():
+    with AudioPayload.from_bytes(b"RIFF....", "a.wav") as payload:
+        assert payload.in_memory
+        path = payload.path()
+        with open(path, "rb") as f:
+            assert f.read() == b"RIFF...."
+    assert not os.path.exists(path)
+
+
+def test_from_path_does_not_delete_callers_file(tmp_path):
+    audio = tmp_path / "aluno.wav"
+    audio.write_bytes(b"audio")
+    with AudioPayload.from_path(str(audio)) as payload:
+        assert payload.sha256 == hashlib.sha256(b"audio").hexdigest()
+        assert payload.path() == str(audio)
+    assert audio.exists()
+
+
+def test_clone_has_its_own_spool():
+    payload = AudioPayload("fala.wav", spool_max=4)
+    payload.write(b"12345678")
+    copia = payload.clone()
+
+    assert copia.path() != payload.path()
+    assert copia.sha256 == payload.sha256
+    payload.close()
+    assert copia.data() == b"12345678"
+    path = copia.path()
+    copia.close()
+    assert not os.path.exists(path)
+
+    with AudioPayload.from_bytes(b"RIFF", "a.wav") as original, original.clone() as copia:
+        assert copia.path() != original.path()
+
+
+def _stream(body: bytes, size: int):
+    async def gen():
+        for i in range(0, len(body), size):
+            yield body[i:i + size]
+    return gen()
+
+
+def test_json_base64_is_decoded_incrementally():
+    audio = bytes(range(256)) * 5
+    b64 = base64.b64encode(audio).decode().replace("/", "\\/")
+    body = json.dumps({"target_word": "maçã", "audio": {"base64": "X", "name": "a.opus"}}).replace('"X"', '"' + b64 + '"')
+    for size in (1, 7, 4096):  # o áudio atravessa fronteiras de bloco e escapes
+        data, payload = asyncio.run(read_json_with_audio(_stream(body.encode(), size)))
+        assert data == {"target_word": "maçã", "audio": {"base64": "", "name": "a.opus"}}
+        assert payload.data() == audio
+        assert payload.sha256 == hashlib.sha256(audio).hexdigest()
+        payload.close()
+
+
+def test_json_without_audio_and_invalid_base64():
+    data, payload = asyncio.run(read_json_with_audio(_stream(b'{"action": "transcribe"}', 3)))
+    assert data == {"action": "transcribe"} and payload is None
+
+    # como o b64decode(validate=False) de antes: fora do alfabeto é descartado (aqui, sobra nada)
+    data, payload = asyncio.run(read_json_with_audio(_stream(b'{"audio_base64": "@@@@"}', 5)))
+    assert payload is None
+
+    try:
+        asyncio.run(read_json_with_audio(_stream(b'{"audio_base64": "QUJDR"}', 5)))
+    except AudioDecodeError:
+        pass
+    else:
+        raise AssertionError("esperava AudioDecodeError")
+
+
+def test_body_and_audio_size_limits():
+    try:
+        asyncio.run(read_json_with_audio(_stream(b'{"audio_base64": "AAAAAAAA"}', 4), max_body=10))
+    except BodyTooLarge:
+        pass
+    else:
+        raise AssertionError("esperava BodyTooLarge")
+
+    payload = AudioPayload("a.wav", max_bytes=4)
+    payload.write(b"1234")
+    try:
+        payload.write(b"5")
+    except BodyTooLarge:
+        pass
+    else:
+        raise AssertionError("esperava BodyTooLarge")
+    payload.close()
+
+
+def test_bounded_json_reader_limits_and_requires_object():
+    body = json.dumps({"items": [{"audio_base64": "AAAA"}] * 3}).encode()
+    assert len(asyncio.run(read_json_bounded(_stream(body, 8), max_body=len(body)))["items"]) == 3
+
+    for corpo, limite, erro in ((body, len(body) - 1, BodyTooLarge), (b"[1, 2]", 100, ValueError)):
+        try:
+            asyncio.run(read_json_bounded(_stream(corpo, 8), max_body=limite))
+        except erro:
+            pass
+        else:
+            raise AssertionError(f"esperava {erro.__name__}")
+
+
+def test_json_audio_only_at_known_paths_and_unescaped():
+    audio = bytes(range(256))
+    b64 = base64.b64encode(audio).decode()
+    body = json.dumps({
+        "meta": {"base64": "QUJD"},                      # mesma chave em outro nível: metadado
+        "items": [{"audio_base64": "QUJD"}],
+        "audio_base64": "\n".join(b64[i:i + 76] for i in range(0, len(b64), 76)),
+    }).replace("/", "\\u002f")
+    for size in (1, 3, 4096):  # o \uXXXX também atravessa fronteiras de bloco
+        data, payload = asyncio.run(read_json_with_audio(_stream(body.encode(), size)))
+        assert data["meta"] == {"base64": "QUJD"} and data["items"] == [{"audio_base64": "QUJD"}]
+        assert payload.data() == audio
+        payload.close()
@@ -0,0 +1,72 @@
+# Testes do pré-processamento de áudio (mono, 16 kHz, corte de silêncio)
+import io
+import sys
+import pathlib
+import wave
+
+import pytest
+
+try:
+    import numpy as np  # importado já na coleta: test_models.py troca numpy por um mock em sys.modules
+except Exception:
+    np = None
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.audio_input import AudioPayload
+from app.core.audio_preprocess import config_signature, preprocess_bytes, preprocess_config, preprocess_payload
+
+
+def test_config_per_provider(monkeypatch):
+    monkeypatch.delenv("AUDIO_PREPROCESS_PROVIDERS", raising=False)
+    assert preprocess_config("openai") is None  # opt-in: sem configuração, áudio original
+
+    monkeypatch.setenv("AUDIO_PREPROCESS_PROVIDERS", "openai,gemini")
+    monkeypatch.setenv("AUDIO_PREPROCESS_CODEC", "flac")
+    monkeypatch.setenv("AUDIO_PREPROCESS_CODEC_OPENAI", "wav")
+
+    assert preprocess_config("gemini")["codec"] == "flac"
+    assert preprocess_config("openai")["codec"] == "wav"
+    assert preprocess_config("mock") is None
+    assert config_signature(None) == "original"
+    assert config_signature(preprocess_config("openai")) == "wav:16000:40"
+
+
+def test_unsupported_audio_is_sent_unchanged():
+    cfg = {"sample_rate": 16000, "trim_db": 40.0, "codec": "wav"}
+    data, name, _, info = preprocess_bytes(b"nao e audio", "a.mp3", cfg)
+
+    assert data == b"nao e audio" and name == "a.mp3"
+    assert info["applied"] is False and info["bytes_saved"] == 0
+
+    payload = AudioPayload.from_bytes(b"nao e audio", "a.mp3")
+    assert preprocess_payload(payload, cfg) is payload
+
+
+def _stereo_wav(sr=48000, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    voice = 0.5 * np.sin(2 * np.pi * 220 * t)
+    silence = np.zeros(int(sr * 0.5))
+    mono = np.concatenate([silence, voice, silence])
+    stereo = np.stack([mono, mono], axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((stereo * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.skipif(np is None, reason="numpy não instalado")
+def test_stereo_48k_is_downmixed_resampled_and_trimmed():
+    original = _stereo_wav()
+    cfg = {"sample_rate": 16000, "trim_db": 40.0, "codec": "wav"}
+    data, name, mime, info = preprocess_bytes(original, "aluno.wav", cfg)
+
+    assert info["applied"] and name == "aluno.wav" and mime == "audio/wav"
+    assert info["bytes_saved"] == len(original) - len(data)
+    assert len(data) < len(original) / 6  # 2 canais, 1/3 da taxa e sem o silêncio
+    assert info["trimmed_s"] > 0.6
+    with wave.open(io.BytesIO(data), "rb") as w:
+        assert w.getnchannels() == 1 and w.getframerate() == 16000
@@ -0,0 +1,80 @@
+# Testes do cache em dois níveis (memória + SQLite)
+import asyncio
+import sys
+import pathlib
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.cache import LRUCache, SQLiteCache, TieredCache, make_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_lru_evicts_by_size_and_ttl():
+    cache = LRUCache(max_entries=100, max_bytes=10, ttl=0.05)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)  # passa de 10 bytes -> remove "a"
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    time.sleep(0.06)
+    assert cache.get("b") is None
+
+
+def test_sqlite_persists_between_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    SQLiteCache(path).set("k", {"text": "olá"})
+
+    assert SQLiteCache(path).get("k") == {"text": "olá"}
+
+
+def test_sqlite_evicts_oldest_when_over_budget(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite3", max_bytes=30)
+    cache.set("a", "a" * 12)
+    time.sleep(0.01)
+    cache.set("b", "b" * 12)
+    time.sleep(0.01)
+    cache.set("c", "c" * 12)
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "c" * 12
+
+
+def test_tiered_promotes_disk_hits_to_memory(tmp_path):
+    disk = SQLiteCache(tmp_path / "cache.sqlite3")
+    key = make_key("transcricao", "abc123", "gemini", "models/gemini-2.5-flash")
+    TieredCache("t", LRUCache(), disk).set(key, "o rato roeu")
+
+    cache = TieredCache("t", LRUCache(), disk)  # outro worker: memória vazia
+    assert asyncio.run(cache.alookup(key)) == ("o rato roeu", "disk")
+    assert asyncio.run(cache.alookup(key)) == ("o rato roeu", "memory")
+    assert asyncio.run(cache.alookup("outra")) == (None, None)
+    assert cache.stats()["hits_disk"] == 1
+    assert cache.stats()["hits_memory"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_keeps_running_total_of_bytes(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = SQLiteCache(path)
+    cache.set("a", "a" * 10)
+    cache.set("b", "b" * 20)
+    cache.set("a", "a" * 4)  # substituição ajusta o total pela diferença
+    assert cache.total_bytes() == len('"bbbbbbbbbbbbbbbbbbbb"') + len('"aaaa"')
+
+    cache._conn().execute("DELETE FROM cache WHERE key = 'b'")
+    assert cache.total_bytes() == len('"aaaa"')
+    assert SQLiteCache(path).total_bytes() == len('"aaaa"')  # outro processo vê o mesmo contador
+    cache.clear()
+    assert cache.total_bytes() == 0
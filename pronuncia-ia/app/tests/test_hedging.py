@@ -0,0 +1,65 @@
+# Testes das requisições hedged (chamada de reserva contra a cauda de latência)
+import asyncio
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.hedging import Hedger, LatencyTracker
+
+
+def _call(result, delay, log, fail=False):
+    async def call():
+        log.append(f"{result}:start")
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"{result}:cancelled")
+            raise
+        if fail:
+            raise RuntimeError(result)
+        return result
+    return call
+
+
+def test_fast_primary_does_not_hedge():
+    hedger = Hedger(default_delay_ms=50)
+    log = []
+    result = asyncio.run(hedger.run("gemini", _call("gemini", 0, log), _call("openai", 0, log)))
+
+    assert result == ("gemini", "primary", False)
+    assert log == ["gemini:start"]
+    assert hedger.stats()["gemini"]["hedge_rate"] == 0.0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = Hedger(default_delay_ms=20)
+    log = []
+    result = asyncio.run(hedger.run("gemini", _call("gemini", 5, log), _call("openai", 0.01, log)))
+
+    assert result == ("openai", "secondary", True)
+    assert log == ["gemini:start", "openai:start", "gemini:cancelled"]
+    stats = hedger.stats()["gemini"]
+    assert (stats["hedge_rate"], stats["win_rate"]) == (1.0, 1.0)
+
+
+def test_primary_error_fires_secondary_immediately_and_both_failing_raises():
+    hedger = Hedger(default_delay_ms=10_000)
+    log = []
+    result = asyncio.run(hedger.run("gemini", _call("gemini", 0, log, fail=True), _call("openai", 0, log)))
+    assert result == ("openai", "secondary", True)
+
+    with pytest.raises(RuntimeError, match="gemini"):
+        asyncio.run(hedger.run("gemini", _call("gemini", 0, log, fail=True), _call("openai", 0, log, fail=True)))
+
+
+def test_delay_follows_latency_percentile():
+    tracker = LatencyTracker(window=100)
+    hedger = Hedger(percentile=90, default_delay_ms=3000, min_delay_ms=50, min_samples=10, tracker=tracker)
+    assert hedger.delay_ms("gemini") == 3000
+    for ms in range(1, 101):
+        tracker.record("gemini", ms * 10)
+
+    assert hedger.delay_ms("gemini") == 900
@@ -0,0 +1,102 @@
+# Testes do pool de modelos locais (faster-whisper) e do orçamento de RAM
+import sys
+import pathlib
+import threading
+
+import pytest
+
+models_path = pathlib.Path(__file__).parent.parent.parent / "models"
+sys.path.insert(0, str(models_path))
+
+MB = 1024 * 1024
+
+
+class FakeMemory:
+    """RSS simulado: cada modelo carregado ocupa 100 MB."""
+
+    def __init__(self, base_mb=200):
+        self.bytes = base_mb * MB
+
+    def rss(self):
+        return self.bytes
+
+
+def _factory(memory, calls):
+    class FakeModel:
+        def __init__(self):
+            memory.bytes += 100 * MB
+            calls.append(self)
+
+        def transcribe(self, audio):
+            return f"texto de {audio}"
+
+    return FakeModel
+
+
+def _pool(*args, **kwargs):
+    # importado só na execução: test_models.py precisa instalar seus mocks antes de `modelos` ser importado
+    from local_stt import ModelPool
+    return ModelPool(*args, **kwargs)
+
+
+def test_pool_warms_all_instances_and_reuses_them():
+    memory, calls = FakeMemory(), []
+    pool = _pool("fake", _factory(memory, calls), size=2, ram_budget_mb=0, rss=memory.rss)
+
+    assert pool.warm() == 2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.transcribe("a.wav"))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["texto de a.wav"] * 6
+    assert len(calls) == 2  # nenhuma instância nova por requisição
+    stats = pool.stats()
+    assert stats["requests"] == 6 and stats["idle"] == 2 and stats["instance_mb"] == 100.0
+
+
+def test_pool_stops_loading_at_ram_budget():
+    memory, calls = FakeMemory(), []
+    pool = _pool("fake", _factory(memory, calls), size=4, ram_budget_mb=450, rss=memory.rss)
+
+    assert pool.warm() == 2  # 200 base + 2 x 100; a terceira passaria de 450 MB
+    assert pool.stats()["skipped_for_budget"] == 2
+
+
+def test_pool_refuses_model_larger_than_budget():
+    memory, calls = FakeMemory(), []
+    pool = _pool("fake", _factory(memory, calls), size=1, ram_budget_mb=250, rss=memory.rss)
+
+    with pytest.raises(MemoryError):
+        pool.warm()
+    assert pool.loaded == 0
+
+
+def test_process_pool_size_follows_cores():
+    from local_stt import available_cores, process_pool_size
+
+    assert process_pool_size("0") == 0
+    assert process_pool_size("3") == 3
+    assert process_pool_size("auto", threads=1) == available_cores()
+    assert process_pool_size("auto", threads=10_000) == 1
+
+
+def test_process_pool_runs_outside_the_api_process():
+    import asyncio
+    import os
+
+    from local_stt import LocalProcessPool, _worker_pid
+
+    pool = LocalProcessPool(2, start_method="spawn")
+    try:
+        async def run():
+            return await asyncio.gather(*[pool.run(_worker_pid) for _ in range(4)])
+
+        pids = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert os.getpid() not in pids
+    assert pool.stats()["completed"] == 4 and pool.stats()["in_flight"] == 0
@@ -0,0 +1,51 @@
+# Testes dos contadores/histogramas e da exposição no formato Prometheus
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core import metrics
+
+
+@pytest.fixture(autouse=True)
+def _limpa_metricas():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.observe("transcription_duration_ms", 3, provider="gemini", model="gemini-2.5-flash")
+    metrics.observe("transcription_duration_ms", 100, provider="gemini", model="gemini-2.5-flash")
+    metrics.observe("transcription_duration_ms", 60000, provider="gemini", model="gemini-2.5-flash")
+    text = metrics.render_prometheus()
+    labels = 'model="gemini-2.5-flash",provider="gemini"'
+    assert "# TYPE pronuncia_transcription_duration_ms histogram" in text
+    assert f'pronuncia_transcription_duration_ms_bucket{{{labels},le="5"}} 1' in text
+    assert f'pronuncia_transcription_duration_ms_bucket{{{labels},le="100"}} 2' in text  # limite inclusivo
+    assert f'pronuncia_transcription_duration_ms_bucket{{{labels},le="30000"}} 2' in text
+    assert f'pronuncia_transcription_duration_ms_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f"pronuncia_transcription_duration_ms_count{{{labels}}} 3" in text
+    assert f"pronuncia_transcription_duration_ms_sum{{{labels}}} 60103" in text
+
+
+def test_counters_get_total_suffix_and_escaped_labels():
+    metrics.inc("scoring_fallback", reason="circuit_open")
+    metrics.inc("transcription_ms_total", 12.5, provider="gemini")
+    metrics.inc("request_errors", stage="ingest", reason='a"b')
+    text = metrics.render_prometheus()
+    assert "# TYPE pronuncia_scoring_fallback_total counter" in text
+    assert 'pronuncia_scoring_fallback_total{reason="circuit_open"} 1' in text
+    assert 'pronuncia_transcription_ms_total{provider="gemini"} 12.5' in text
+    assert 'reason="a\\"b"' in text
+
+
+def test_timer_records_even_on_error():
+    with pytest.raises(ValueError):
+        with metrics.timer("scoring_duration_ms", method="levenshtein"):
+            raise ValueError("falhou")
+    [entrada] = metrics.histogram_snapshot()["scoring_duration_ms"]
+    assert entrada["method"] == "levenshtein"
+    assert entrada["count"] == 1
@@ -0,0 +1,84 @@
+# Testes do micro-batcher de chamadas assíncronas
+import asyncio
+import sys
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.micro_batch import MicroBatcher
+
+
+def _batcher(batch_fn, max_batch=8):
+    calls = {"batch": [], "single": []}
+
+    async def process_batch(key, items):
+        calls["batch"].append(list(items))
+        return await batch_fn(key, items)
+
+    async def process_single(key, item):
+        calls["single"].append(item)
+        return f"single:{item}"
+
+    return MicroBatcher(process_batch, process_single, max_wait_ms=5, max_batch=max_batch), calls
+
+
+async def _two_items(batcher):
+    return await asyncio.gather(batcher.submit("k", 0), batcher.submit("k", 1))
+
+
+def test_concurrent_calls_share_one_batch():
+    async def ok(key, items):
+        return [f"batch:{i}" for i in items]
+
+    batcher, calls = _batcher(ok)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit("gemini", i) for i in range(3)])
+
+    assert asyncio.run(run()) == ["batch:0", "batch:1", "batch:2"]
+    assert calls["batch"] == [[0, 1, 2]]
+    assert calls["single"] == []
+
+
+def test_max_batch_splits_and_lone_item_runs_single():
+    async def ok(key, items):
+        return [f"batch:{i}" for i in items]
+
+    batcher, calls = _batcher(ok, max_batch=2)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit("gemini", i) for i in range(3)])
+
+    assert asyncio.run(run()) == ["batch:0", "batch:1", "single:2"]
+    assert calls["batch"] == [[0, 1]]
+
+
+def test_partial_and_failed_batches_fall_back_per_item():
+    async def partial(key, items):
+        return ["batch:0", None]
+
+    batcher, calls = _batcher(partial)
+    assert asyncio.run(_two_items(batcher)) == ["batch:0", "single:1"]
+    assert batcher.stats()["fallbacks"] == 1
+
+    async def boom(key, items):
+        raise RuntimeError("429")
+
+    batcher, calls = _batcher(boom)
+    assert asyncio.run(_two_items(batcher)) == ["single:0", "single:1"]
+
+
+def test_groups_are_batched_separately():
+    async def ok(key, items):
+        return [f"{key}:{i}" for i in items]
+
+    batcher, calls = _batcher(ok)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit("gemini", 0), batcher.submit("openai", 1),
+            batcher.submit("gemini", 2), batcher.submit("openai", 3),
+        )
+
+    assert asyncio.run(run()) == ["gemini:0", "openai:1", "gemini:2", "openai:3"]
+    assert len(calls["batch"]) == 2
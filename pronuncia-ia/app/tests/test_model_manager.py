@@ -0,0 +1,87 @@
+# Testes do gerenciador de modelos locais (carregamento preguiçoso e despejo LRU)
+import sys
+import pathlib
+
+import pytest
+
+models_path = pathlib.Path(__file__).parent.parent.parent / "models"
+sys.path.insert(0, str(models_path))
+
+from model_manager import LocalModelManager
+
+MB = 1024 * 1024
+
+
+class FakeMemory:
+    def __init__(self, base_mb=100):
+        self.bytes = base_mb * MB
+
+    def rss(self):
+        return self.bytes
+
+
+def _manager(budget_mb, sizes_mb):
+    memory = FakeMemory()
+    built = []
+
+    def factory(name, size):
+        def build():
+            memory.bytes += size * MB
+            built.append(name)
+            model = type("FakeModel", (), {})()
+            model.unload = lambda: setattr(memory, "bytes", memory.bytes - size * MB)
+            return model
+        return build
+
+    manager = LocalModelManager(
+        {name: factory(name, size) for name, size in sizes_mb.items()},
+        ram_budget_mb=budget_mb, rss=memory.rss,
+    )
+    return manager, built
+
+
+def test_lazy_load_and_shared_instance():
+    manager, built = _manager(0, {"whisper": 300})
+    assert built == []
+
+    first = manager.get("whisper")
+    assert manager.get("whisper") is first
+    assert built == ["whisper"]
+    stats = manager.stats()
+    assert stats["loaded"]["whisper"]["mb"] == 300.0
+    assert stats["loaded"]["whisper"]["uses"] == 2
+    assert stats["events"][0]["event"] == "load"
+
+
+def test_evicts_least_recently_used_to_fit_budget():
+    manager, built = _manager(700, {"whisper": 300, "wav2vec2": 200, "faster_whisper": 250})
+    manager.get("whisper")
+    manager.get("wav2vec2")
+    manager.get("whisper")          # wav2vec2 passa a ser o menos usado recentemente
+    manager.get("faster_whisper")   # 100 + 300 + 200 + 250 > 700: despeja wav2vec2
+
+    assert set(manager.stats()["loaded"]) == {"whisper", "faster_whisper"}
+    assert manager.evictions == 1
+    assert [e["model"] for e in manager.events if e["event"] == "evict"] == ["wav2vec2"]
+
+
+def test_model_in_use_is_not_evicted():
+    manager, _ = _manager(500, {"whisper": 300, "wav2vec2": 200})
+    with manager.use("whisper"):
+        with pytest.raises(MemoryError):
+            manager.get("wav2vec2")  # whisper está em uso e wav2vec2 não cabe junto
+    assert set(manager.stats()["loaded"]) == {"whisper"}
+
+    manager.get("wav2vec2")  # liberado: agora whisper pode ser despejado
+    assert set(manager.stats()["loaded"]) == {"wav2vec2"}
+
+
+def test_freed_memory_is_not_counted_twice():
+    # o RSS cai no despejo; descontar de novo os bytes liberados pararia cedo demais
+    manager, _ = _manager(600, {"whisper": 100, "wav2vec2": 100, "faster_whisper": 500})
+    manager.get("whisper")
+    manager.get("wav2vec2")
+    manager.get("faster_whisper")   # 100 + 100 + 100 + 500: precisa despejar os dois
+
+    assert set(manager.stats()["loaded"]) == {"faster_whisper"}
+    assert manager.stats()["rss_mb"] <= 600
@@ -14,6 +14,7 @@ mock_modules = {
     'wave': mock.MagicMock(),
     'faster_whisper': mock.MagicMock(),
     'coqui': mock.MagicMock(),
+    'onnxruntime': mock.MagicMock(),
 }
 
 # Apply mocks to sys.modules
@@ -33,7 +34,7 @@ models_path = pathlib.Path(__file__).parent.parent.parent / "models"
 sys.path.insert(0, str(models_path))
 
 # Now import the classes
-from modelos import Whisper, Wav2Vec2, DeepSpeech, CoquiSTT, FasterWhisper
+from modelos import Whisper, Wav2Vec2, Wav2Vec2ONNX, DeepSpeech, CoquiSTT, FasterWhisper
 
 # Tests for the speech-to-text models
 
@@ -97,6 +98,80 @@ def test_wav2vec2():
     assert transcription == "test transcription"
 
 
+# Teste do lote do Wav2Vec2 (um único forward para vários áudios)
+def test_wav2vec2_batch():
+    mock_processor_instance = mock.MagicMock()
+    mock_modules['transformers'].Wav2Vec2Processor.from_pretrained.return_value = mock_processor_instance
+    mock_model_instance = mock.MagicMock()
+    mock_model_instance.to.return_value = mock_model_instance
+    mock_modules['transformers'].Wav2Vec2ForCTC.from_pretrained.return_value = mock_model_instance
+    mock_modules['librosa'].load.return_value = (mock.MagicMock(), 16000)
+    mock_processor_instance.batch_decode.return_value = ["primeira", "segunda"]
+
+    wav2vec_model = Wav2Vec2(device='cpu')
+    transcriptions = wav2vec_model.transcribe_batch(["a.wav", "b.wav"])
+
+    assert transcriptions == ["primeira", "segunda"]
+    assert mock_model_instance.call_count == 1  # um forward para o lote inteiro
+    args, kwargs = mock_processor_instance.call_args
+    assert len(args[0]) == 2 and kwargs["padding"] is True
+    assert "attention_mask" in mock_model_instance.call_args.kwargs
+
+
+# Teste da quantização int8 do Wav2Vec2 (quantiza uma vez e reaproveita o cache)
+def test_wav2vec2_int8_quantizes_once_and_caches(tmp_path, monkeypatch):
+    import modelos
+
+    monkeypatch.setattr(modelos, "QUANTIZED_CACHE_DIR", str(tmp_path))
+    torch_mock = mock_modules['torch']
+    torch_mock.__version__ = "2.5.1"
+    torch_mock.save.side_effect = lambda model, path: pathlib.Path(path).write_bytes(b"modelo")
+    torch_mock.quantization.quantize_dynamic.reset_mock()
+    torch_mock.load.reset_mock()
+    from_pretrained = mock_modules['transformers'].Wav2Vec2ForCTC.from_pretrained
+    from_pretrained.reset_mock()
+
+    first = Wav2Vec2(device='cuda', quantize='int8')
+    assert first.device == 'cpu'
+    torch_mock.quantization.quantize_dynamic.assert_called_once()
+    assert len(list(tmp_path.glob("*-wav2vec2-int8-torch2.5.1.pt"))) == 1
+
+    second = Wav2Vec2(device='cpu', quantize='int8')
+    from_pretrained.assert_called_once()  # o fp32 só foi lido na primeira vez
+    assert second.model is torch_mock.load.return_value
+    torch_mock.save.side_effect = None
+
+    with pytest.raises(ValueError):
+        Wav2Vec2(device='cpu', quantize='int4')
+
+
+# Teste do Wav2Vec2 em ONNX Runtime (grafo já exportado no cache)
+def test_wav2vec2_onnx_uses_cached_graph(tmp_path):
+    onnx_dir = tmp_path / "jonatasgrosman__wav2vec2-large-xlsr-53-portuguese"
+    onnx_dir.mkdir()
+    (onnx_dir / "wav2vec2.onnx").write_bytes(b"grafo")
+
+    mock_processor_instance = mock.MagicMock()
+    mock_processor_instance.batch_decode.return_value = ["texto onnx"]
+    mock_modules['transformers'].Wav2Vec2Processor.from_pretrained.return_value = mock_processor_instance
+    mock_modules['transformers'].Wav2Vec2ForCTC.from_pretrained.reset_mock()
+    mock_modules['librosa'].load.return_value = (mock.MagicMock(), 16000)
+
+    input_values = mock.MagicMock()
+    input_values.name = "input_values"
+    mock_session = mock.MagicMock()
+    mock_session.get_inputs.return_value = [input_values]
+    mock_session.run.return_value = [mock.MagicMock()]
+    mock_modules['onnxruntime'].InferenceSession.return_value = mock_session
+
+    model = Wav2Vec2ONNX(cache_dir=str(tmp_path))
+
+    assert model.transcribe("fake_audio.wav") == "texto onnx"
+    mock_modules['transformers'].Wav2Vec2ForCTC.from_pretrained.assert_not_called()  # sem exportar de novo
+    assert mock_modules['onnxruntime'].InferenceSession.call_args.args[0] == str(onnx_dir / "wav2vec2.onnx")
+    mock_session.run.assert_called_once()
+
+
 # Teste para o modelo DeepSpeech
 def test_deepspeech():
     # Configure DeepSpeech model mock
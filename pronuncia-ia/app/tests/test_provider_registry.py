@@ -0,0 +1,107 @@
+# Testes do registro de clientes de provedores
+import asyncio
+import sys
+import pathlib
+import threading
+import time
+
+models_path = pathlib.Path(__file__).parent.parent.parent / "models"
+sys.path.insert(0, str(models_path))
+sys.path.insert(0, str(models_path.parent))
+
+from provider_registry import ProviderRegistry
+
+
+class FakeChat:
+    instances = 0
+
+    def __init__(self, model=None):
+        FakeChat.instances += 1
+        time.sleep(0.01)  # simula genai.configure + list_models
+        self.model_name = model or "models/fake-auto"
+
+
+def _registry(ttl=3600):
+    FakeChat.instances = 0
+    return ProviderRegistry(factories={("chat", "fake"): FakeChat}, ttl=ttl)
+
+
+def test_registry_reuses_clients_and_counts():
+    reg = _registry()
+    first = reg.get("chat", "fake")
+    second = reg.get("chat", "FAKE")
+
+    assert first is second
+    assert FakeChat.instances == 1
+    assert reg.stats()["hits"] == 1
+    assert reg.stats()["misses"] == 1
+    assert reg.stats()["clients"] == [{"kind": "chat", "provider": "fake", "model": "models/fake-auto"}]
+
+
+def test_registry_keys_by_model():
+    reg = _registry()
+    auto = reg.get("chat", "fake")
+    explicit = reg.get("chat", "fake", "models/fake-pro")
+
+    assert auto is not explicit
+    assert explicit.model_name == "models/fake-pro"
+
+
+def test_registry_rediscovers_after_ttl():
+    reg = _registry(ttl=0.05)
+    first = reg.get("chat", "fake")
+    pinned = reg.get("chat", "fake", "models/fake-pro")
+    time.sleep(0.06)
+
+    assert reg.get("chat", "fake") is not first
+    assert reg.get("chat", "fake", "models/fake-pro") is pinned  # modelo explícito não expira
+
+
+def test_registry_builds_once_under_concurrency():
+    reg = _registry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(reg.get("chat", "fake"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert FakeChat.instances == 1
+    assert all(r is results[0] for r in results)
+    assert reg.stats()["misses"] == 1
+
+
+def test_registry_unknown_provider():
+    reg = _registry()
+    try:
+        reg.get("transcriber", "fake")
+    except RuntimeError as e:
+        assert "fake" in str(e)
+    else:
+        raise AssertionError("esperava RuntimeError")
+
+
+def test_registry_aget_shares_instances_with_get():
+    reg = _registry()
+    built = asyncio.run(reg.aget("chat", "fake"))
+
+    assert reg.get("chat", "fake") is built
+    assert asyncio.run(reg.aget("chat", "fake")) is built
+    assert reg.stats()["misses"] == 1
+
+
+def test_registry_guards_clients_with_router():
+    from app.core.routing import ProviderRouter
+
+    class FakeAsyncChat(FakeChat):
+        async def reply_from_text(self, text):
+            return "ok"
+
+    router = ProviderRouter()
+    reg = ProviderRegistry(factories={("chat_async", "fake"): FakeAsyncChat}, router=router)
+    client = reg.get("chat_async", "fake")
+
+    assert client.model_name == "models/fake-auto"
+    assert reg.stats()["clients"][0]["model"] == "models/fake-auto"
+    assert asyncio.run(client.reply_from_text("olá")) == "ok"
+    assert router.stats()["chat:fake"]["models"] == {"models/fake-auto": {"calls": 1, "failures": 0}}
@@ -0,0 +1,83 @@
+# Testes dos limites por provedor (concorrência, baldes de fichas, backoff em 429)
+import asyncio
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.ratelimit import ProviderLimiter, TokenBucket, is_rate_limit_error, limit_from_env
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_token_bucket_reserves_in_arrival_order():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])  # 1 ficha por segundo
+    assert bucket.reserve(60) == 0
+    assert round(bucket.reserve(1), 6) == 1.0
+    assert round(bucket.reserve(1), 6) == 2.0  # quem chegou depois espera mais
+    now[0] = 10
+    assert bucket.reserve(1) == 0
+
+
+def test_concurrency_limit_is_fifo():
+    limiter = ProviderLimiter("fake", max_concurrency=1)
+    order = []
+
+    async def call(i):
+        async with limiter.slot():
+            order.append(i)
+            assert limiter.in_flight == 1
+            await asyncio.sleep(0.001)
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(5)))
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.in_flight == 0 and limiter.queued == 0
+    assert limiter.stats()["calls"] == 5
+
+
+def test_rate_limit_errors_are_retried_with_backoff():
+    limiter = ProviderLimiter("fake", max_retries=2, backoff_base_s=0.001, backoff_max_s=0.01)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError("429 Too Many Requests")
+        return "ok"
+
+    assert asyncio.run(limiter.run(flaky)) == "ok"
+    assert (limiter.rate_limited, limiter.retries) == (2, 2)
+
+    async def always_429():
+        raise RateLimitError("quota")
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(limiter.run(always_429))
+
+    async def other_error():
+        raise ValueError("resposta inválida")
+
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.run(other_error))
+    assert limiter.retries == 4  # erro comum não é repetido
+
+
+def test_limits_from_env_most_specific_first(monkeypatch):
+    monkeypatch.setenv("PROVIDER_RPM", "100")
+    monkeypatch.setenv("PROVIDER_RPM_GEMINI", "60")
+    monkeypatch.setenv("PROVIDER_RPM_GEMINI_GEMINI_2_5_FLASH", "30")
+
+    assert limit_from_env("PROVIDER_RPM", "gemini", "gemini-2.5-flash", 0) == 30
+    assert limit_from_env("PROVIDER_RPM", "gemini", "models/gemini-2.5-flash", 0) == 30
+    assert limit_from_env("PROVIDER_RPM", "gemini", "gemini-pro", 0) == 60
+    assert limit_from_env("PROVIDER_RPM", "openai", "gpt-4o-mini", 0) == 100
+    assert is_rate_limit_error(RuntimeError("429 Resource has been exhausted"))
+    assert not is_rate_limit_error(RuntimeError("timeout"))
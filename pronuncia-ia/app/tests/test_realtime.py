@@ -0,0 +1,80 @@
+# Testes da sessão de áudio em tempo real (/ws/avaliar)
+import sys
+import pathlib
+import struct
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+pytest.importorskip("dotenv")  # app.core.scoring carrega o .env
+
+from app.core import realtime
+from app.core.audio_input import BodyTooLarge
+from app.core.realtime import StreamingAudioSession, provisional_score
+
+
+def _pcm(seconds: float, sample_rate: int = 16000) -> bytes:
+    return struct.pack(f"<{int(seconds * sample_rate)}h", *([1000] * int(seconds * sample_rate)))
+
+
+def test_pcm_session_builds_wav_payload():
+    session = StreamingAudioSession("pcm16", 8000)
+    session.add(_pcm(0.5, 8000))
+    session.add(b"\x01")  # meia amostra fica de fora
+
+    assert session.duration_s == 0.5
+    with session.to_payload() as payload:
+        assert payload.name == "audio.wav"
+        data = payload.data()
+    riff, _, fmt, channels, rate, bits, data_size = struct.unpack("<4sI4s10xHI6xH4xI", data[:44])
+    assert (riff, fmt, channels, rate, bits, data_size) == (b"RIFF", b"WAVE", 1, 8000, 16, 8000)
+    assert len(data) == 44 + 8000
+
+
+def test_partial_emitted_after_interval(monkeypatch):
+    monkeypatch.setattr(realtime, "WS_PARTIAL_INTERVAL_S", 0.8)
+    session = StreamingAudioSession()
+
+    session.add(_pcm(0.5))
+    assert not session.should_emit_partial()
+    session.add(_pcm(0.5))
+    assert session.should_emit_partial()
+    session.mark_partial()
+    assert not session.should_emit_partial()
+    session.add(_pcm(0.8))
+    assert session.should_emit_partial()
+    assert session.partials == 1
+
+
+def test_session_size_limit():
+    session = StreamingAudioSession("webm", max_bytes=10)
+    session.add(b"x" * 8)
+    with pytest.raises(BodyTooLarge):
+        session.add(b"x" * 3)
+    assert session.window() == b"x" * 8
+
+
+def test_provisional_score_compares_expected_prefix():
+    result = provisional_score("o rato roeu a roupa", "o rato")
+
+    assert result["score"] == 100
+    assert result["progress"] == 0.4
+    assert result["method"] == "local-provisional"
+    assert provisional_score("o rato roeu", "o gato")["score"] < 100
+
+
+def test_windowed_partial_is_aligned_with_expected_text(monkeypatch):
+    texto = "o rato roeu a roupa do rei de roma e a rainha com raiva resolveu remendar"
+    # janela com o fim da leitura: comparada com o trecho equivalente, não com o início do texto
+    result = provisional_score(texto, "rei de roma e a rainha", windowed=True)
+    assert result["score"] == 100
+    assert result["progress"] == 0.75  # 12 de 16 palavras
+    assert provisional_score(texto, "rei de roma e a rainha")["score"] < 50
+
+    monkeypatch.setattr(realtime, "WS_WINDOW_S", 1.0)
+    session = StreamingAudioSession()
+    session.add(_pcm(1.0))
+    assert not session.windowed
+    session.add(_pcm(0.5))
+    assert session.windowed
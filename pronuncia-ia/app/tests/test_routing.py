@@ -0,0 +1,150 @@
+# Testes dos disjuntores e do roteamento de provedores
+import asyncio
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.routing import CircuitBreaker, CircuitOpenError, GuardedClient, ProviderRouter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTranscriber:
+    model = "fake-stt"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    async def transcribe_bytes(self, data, mime="audio/wav", name="audio.wav"):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("provedor lento")
+        return "ok"
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker("chat:gemini", failure_threshold=3, open_s=30, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow() and not breaker.available()
+
+    clock.now = 31
+    assert breaker.available()
+    assert breaker.allow()          # chamada de teste
+    assert not breaker.allow()      # só uma por vez
+    breaker.record_failure()
+    assert breaker.state == "open"  # teste falhou: abre de novo
+
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record_success(120)
+    assert breaker.state == "closed"
+    assert breaker.stats()["opens"] == 2
+
+
+def test_guarded_client_fails_fast_when_open():
+    breaker = CircuitBreaker("transcriber:gemini", failure_threshold=2)
+    fake = FakeTranscriber(fail=True)
+    client = GuardedClient(fake, breaker)
+    assert client.model == "fake-stt"
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            asyncio.run(client.transcribe_bytes(b"x"))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.transcribe_bytes(b"x"))
+    assert fake.calls == 2
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_router_prefers_requested_unless_open_or_much_slower():
+    router = ProviderRouter(fallbacks={"transcriber": ("openai",)}, slow_factor=3, min_samples=2, failure_threshold=1)
+    assert router.choose("transcriber_async", "gemini") == "gemini"
+
+    for _ in range(2):
+        router.breaker("transcriber", "gemini").record_success(4000)
+        router.breaker("transcriber", "openai").record_success(800)
+    assert router.choose("transcriber_async", "gemini") == "openai"  # 5x mais lento
+
+    router.breaker("transcriber", "openai").record_failure()
+    assert router.choose("transcriber_async", "gemini") == "gemini"  # alternativa com disjuntor aberto
+    router.breaker("transcriber", "gemini").record_failure()
+    assert router.choose("transcriber_async", "gemini") == "gemini"  # todos abertos: falha rápida no pedido
+    assert set(router.stats()) == {"transcriber:gemini", "transcriber:openai"}
+
+
+def test_guarded_client_retries_rate_limits_without_tripping_breaker():
+    from app.core.ratelimit import ProviderLimiter
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    class Chat:
+        model_name = "fake-chat"
+        calls = 0
+
+        async def reply_from_text(self, text, system="", temperature=None):
+            Chat.calls += 1
+            if Chat.calls == 1:
+                raise RateLimited("429")
+            return "resposta"
+
+    breaker = CircuitBreaker("chat:fake", failure_threshold=1)
+    limiter = ProviderLimiter("fake", backoff_base_s=0.001, backoff_max_s=0.01)
+    client = GuardedClient(Chat(), breaker, limiter)
+
+    assert asyncio.run(client.reply_from_text("olá")) == "resposta"
+    assert breaker.state == "closed"
+    assert limiter.stats()["retries"] == 1
+
+
+def test_guard_with_explicit_model_feeds_breaker_used_by_choose():
+    router = ProviderRouter(fallbacks={"transcriber": ("openai",)}, failure_threshold=1)
+    client = router.guard(FakeTranscriber(fail=True), "transcriber_async", "gemini", "gemini-2.5-pro")
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.transcribe_bytes(b"x"))
+    assert router.choose("transcriber_async", "gemini") == "openai"
+    assert router.stats()["transcriber:gemini"]["models"] == {"fake-stt": {"calls": 1, "failures": 1}}
+
+
+def test_breaker_counts_each_model_separately():
+    class Modelo(FakeTranscriber):
+        def __init__(self, model, fail=False):
+            super().__init__(fail)
+            self.model = model
+
+    router = ProviderRouter(failure_threshold=5)
+    flash = router.guard(Modelo("gemini-flash"), "transcriber_async", "gemini")
+    pro = router.guard(Modelo("gemini-pro", fail=True), "transcriber_async", "gemini", "gemini-pro")
+    asyncio.run(flash.transcribe_bytes(b"x"))
+    with pytest.raises(TimeoutError):
+        asyncio.run(pro.transcribe_bytes(b"x"))
+    asyncio.run(flash.transcribe_bytes(b"x"))  # o último guard não muda o rótulo dos outros clientes
+
+    stats = router.stats()["transcriber:gemini"]
+    assert stats["models"] == {"gemini-flash": {"calls": 2, "failures": 0}, "gemini-pro": {"calls": 1, "failures": 1}}
+    assert (stats["calls"], stats["failures"]) == (3, 1)
+
+
+def test_choose_skips_half_open_provider_while_probe_in_flight():
+    clock = Clock()
+    router = ProviderRouter(fallbacks={"chat": ("openai",)}, failure_threshold=1, open_s=30, clock=clock)
+    router.breaker("chat", "gemini").record_failure()
+    clock.now = 31
+    assert router.choose("chat", "gemini") == "gemini"     # half_open: vaga de teste livre
+    assert router.breaker("chat", "gemini").allow()        # chamada de teste em andamento
+    assert router.choose("chat", "gemini") == "openai"     # não manda outra para o disjuntor recusar
@@ -0,0 +1,106 @@
+# Testes da avaliação por IA (cache, roteamento de provedor) sem chamar provedores reais
+import asyncio
+import json
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+pytest.importorskip("dotenv")  # app.core.scoring carrega o .env
+
+from app.core import scoring
+
+
+class _FakeChat:
+    def __init__(self, model: str, score: int = 70):
+        self.model = model
+        self.score = score
+        self.calls = 0
+
+    def reply(self, prompt):
+        self.calls += 1
+        return json.dumps({"score": self.score, "feedback": "ok"})
+
+    async def reply_from_text(self, prompt, system=None, temperature=None):
+        return self.reply(prompt)
+
+
+class _SyncChat(_FakeChat):
+    def reply_from_text(self, prompt, system=None, temperature=None):
+        return self.reply(prompt)
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    chats = {"gemini": _FakeChat("gemini-fake", 60), "openai": _FakeChat("gpt-fake", 80)}
+
+    async def get_async_chat(provider):
+        return chats[provider]
+
+    monkeypatch.setattr(scoring, "get_async_chat", get_async_chat)
+    monkeypatch.setattr(scoring, "_ai_available", lambda provider: True)
+    monkeypatch.setattr(scoring, "SCORING_MICROBATCH_MS", 0)
+    scoring.scoring_cache.clear()
+    yield chats
+    scoring.scoring_cache.clear()
+
+
+def test_routed_provider_labels_method_and_cache(chats, monkeypatch):
+    # disjuntor do gemini aberto: o roteador manda a avaliação para o openai
+    monkeypatch.setattr(scoring.provider_router, "choose", lambda kind, preferred, alternates=None: "openai")
+    result = asyncio.run(scoring.pronunciation_score_with_ai_async("casa", "caza", provider="gemini"))
+    assert result["method"] == "ai-openai"
+    assert result["score"] == 80
+    chave = scoring._scoring_cache_key("casa", "caza", "openai", "gpt-fake", "português")
+    assert scoring.scoring_cache.get(chave)["score"] == 80
+
+    # gemini de volta: a nota do openai não é servida como se fosse do gemini
+    monkeypatch.setattr(scoring.provider_router, "choose", lambda kind, preferred, alternates=None: preferred)
+    result = asyncio.run(scoring.pronunciation_score_with_ai_async("casa", "caza", provider="gemini"))
+    assert (result["method"], result["score"]) == ("ai-gemini", 60)
+    assert chats["gemini"].calls == 1
+
+
+def test_sync_path_labels_routed_provider(chats, monkeypatch):
+    monkeypatch.setattr(scoring, "get_chat", lambda provider: _SyncChat(provider + "-sync", 75))
+    monkeypatch.setattr(scoring.provider_router, "choose", lambda kind, preferred, alternates=None: "openai")
+    result = scoring.pronunciation_score_with_ai("casa", "caza", provider="gemini")
+    assert (result["method"], result["score"]) == ("ai-openai", 75)
+    chave = scoring._scoring_cache_key("casa", "caza", "openai", "openai-sync", "português")
+    assert scoring.scoring_cache.get(chave) is not None
+
+
+def test_batch_grades_cached_under_own_key(chats, monkeypatch):
+    async def submit(key, item):
+        return {"score": 55, "feedback": "lote", "method": "ai-gemini", "_prompt": "batch"}
+
+    monkeypatch.setattr(scoring, "SCORING_MICROBATCH_MS", 10)
+    monkeypatch.setattr(scoring.scoring_batcher, "submit", submit)
+    result = asyncio.run(scoring.pronunciation_score_with_ai_async("casa", "caza", provider="gemini"))
+    assert "_prompt" not in result
+    args = ("casa", "caza", "gemini", "gemini-fake", "português")
+    assert scoring.scoring_cache.get(scoring._scoring_cache_key(*args)) is None
+    assert scoring.scoring_cache.get(scoring._scoring_cache_key(*args, "batch"))["score"] == 55
+
+    # com o micro-batching ligado, a nota em lote é reaproveitada; desligado, não
+    result = asyncio.run(scoring.pronunciation_score_with_ai_async("casa", "caza", provider="gemini"))
+    assert (result["score"], result["scoring_cache"]) == (55, "hit")
+    monkeypatch.setattr(scoring, "SCORING_MICROBATCH_MS", 0)
+    result = asyncio.run(scoring.pronunciation_score_with_ai_async("casa", "caza", provider="gemini"))
+    assert (result["score"], chats["gemini"].calls) == (60, 1)
+
+
+@pytest.mark.parametrize("expected, predicted", [("", ""), ("casa", ""), ("", "casa"), ("  ", "!")])
+def test_local_tier_never_passes_empty_text(expected, predicted):
+    result = scoring.local_tier_score(expected, predicted)
+    assert result["scoring_tier"] == "local-low"
+    assert (result["score"], result["hit"], result["match"]) == (0.0, False, False)
+
+
+def test_local_high_band_reached_without_exact_match():
+    assert scoring.SCORING_MODE == "ai"  # avaliação em níveis é opt-in
+    result = scoring.local_tier_score("bom dia a todos", "bom dia a todo", high=0.9)
+    assert result["scoring_tier"] == "local-high"
+    assert scoring.local_tier_score("casa amarela", "casa amarga", high=0.9) is None
@@ -0,0 +1,47 @@
+# Testes do detalhamento de tempos por requisição (Server-Timing / campo timings)
+import json
+import sys
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.server_timing import RequestTimings, wants_timings
+
+
+def test_header_lists_stages_in_order_with_provider_and_model():
+    tempos = RequestTimings()
+    tempos.add("ingest", 1.23, format="multipart")
+    with tempos.stage("transcription"):
+        pass
+    tempos.describe("transcription", provider="gemini", model="gemini-2.5-flash", cache="miss", extra=None)
+    tempos.add("scoring", 40, method="ai-gemini", tier="ai")
+    header = tempos.header()
+    nomes = [parte.split(";")[0] for parte in header.split(", ")]
+    assert nomes == ["ingest", "transcription", "scoring", "total"]
+    assert header.startswith("ingest;dur=1.2, transcription;dur=")
+    assert 'desc="gemini gemini-2.5-flash"' in header
+    assert 'scoring;dur=40.0;desc="ai-gemini"' in header
+
+
+def test_render_json_appends_timings_only_when_requested():
+    tempos = RequestTimings()
+    tempos.add("transcription", 12.5, provider="openai", model="whisper-1")
+    corpo = {"transcript": "olá"}
+    assert json.loads(tempos.render_json(corpo)) == corpo
+    assert "serialization" in tempos.stages
+
+    tempos.include = True
+    data = json.loads(tempos.render_json(corpo))
+    assert data["transcript"] == "olá"
+    etapas = data["timings"]["stages"]
+    assert etapas["transcription"] == {"ms": 12.5, "provider": "openai", "model": "whisper-1"}
+    assert "serialization" in etapas
+    assert data["timings"]["total_ms"] >= 0
+
+    vazio = RequestTimings(include=True)
+    assert set(json.loads(vazio.render_json({}))) == {"timings"}
+
+
+def test_wants_timings():
+    assert wants_timings(True) and wants_timings("1") and wants_timings("true")
+    assert not wants_timings(None) and not wants_timings(False) and not wants_timings("no")
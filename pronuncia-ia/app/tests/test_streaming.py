@@ -0,0 +1,46 @@
+# Testes do parser incremental de JSON e do formato SSE
+import json
+import sys
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core.streaming import JSONFieldStream, sse_event, wants_stream
+
+RESPOSTA = '''```json
+{
+    "score": 85,
+    "match": false,
+    "feedback": "Boa leitura, mas \\"roeu\\" saiu como {roel}, veja: [r]",
+    "errors": ["roeu"],
+    "highlights": {"correct": ["rato"], "incorrect": ["roeu"]}
+}
+```'''
+
+
+def test_fields_emitted_as_soon_as_complete():
+    parser = JSONFieldStream()
+    emitted = []
+    for i, c in enumerate(RESPOSTA):
+        for name, value in parser.feed(c):
+            emitted.append((name, value, i))
+
+    assert [e[0] for e in emitted] == ["score", "match", "feedback", "errors", "highlights"]
+    assert parser.fields == json.loads(RESPOSTA.strip("`").removeprefix("json"))
+    # a nota sai na vírgula logo depois dela, muito antes do fim do texto
+    assert emitted[0][:2] == ("score", 85)
+    assert emitted[0][2] == RESPOSTA.index(",")
+    assert parser.closed
+
+
+def test_incomplete_value_is_not_emitted():
+    parser = JSONFieldStream()
+    assert parser.feed('{"score": 7') == []
+    assert parser.feed('0, "feedback": "Mui') == [("score", 70)]
+    assert parser.feed('to bem"}') == [("feedback", "Muito bem")]
+
+
+def test_sse_event_format():
+    assert sse_event("field", {"name": "score", "value": 90}) == 'event: field\ndata: {"name": "score", "value": 90}\n\n'
+    assert wants_stream("true") and wants_stream(None, "text/event-stream")
+    assert not wants_stream(False, "application/json")
@@ -0,0 +1,66 @@
+# Testes dos logs/spans com nível e amostragem configuráveis
+import logging
+import sys
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+from app.core import tracing
+
+
+class _Coleta(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.mensagens = []
+
+    def emit(self, record):
+        self.mensagens.append((record.levelno, record.getMessage()))
+
+
+@pytest.fixture
+def coleta():
+    handler = _Coleta()
+    root = logging.getLogger(tracing.ROOT_LOGGER)
+    root.addHandler(handler)
+    yield handler
+    root.removeHandler(handler)
+    tracing.configure("WARNING", 1.0)
+
+
+def test_span_is_a_noop_above_debug(coleta):
+    tracing.configure("WARNING", 1.0)
+    log = tracing.get_logger("teste")
+    with tracing.span("etapa", log, provider="gemini") as s:
+        s.set(model="x")
+    assert s is tracing._NULL_SPAN
+    assert coleta.mensagens == []
+
+
+def test_span_logs_elapsed_and_attributes(coleta):
+    tracing.configure("DEBUG", 1.0)
+    log = tracing.get_logger("teste")
+    with pytest.raises(RuntimeError):
+        with tracing.span("etapa", log, provider="gemini") as s:
+            s.set(model="x")
+            raise RuntimeError("falhou")
+    assert s.elapsed_ms is not None
+    [(nivel, mensagem)] = coleta.mensagens
+    assert nivel == logging.DEBUG
+    assert mensagem.startswith("etapa ")
+    assert "'provider': 'gemini'" in mensagem and "'model': 'x'" in mensagem
+    assert "'error': 'RuntimeError'" in mensagem
+
+
+def test_unsampled_request_drops_debug_but_keeps_warnings(coleta):
+    tracing.configure("DEBUG", 0.0)
+    log = tracing.get_logger("teste")
+    with tracing.span("http", log):
+        with tracing.span("interno", log):
+            log.debug("detalhe")
+        log.warning("aviso")
+    assert coleta.mensagens == [(logging.WARNING, "aviso")]
+    # fora da requisição o sorteio é desfeito
+    log.debug("depois")
+    assert coleta.mensagens[-1] == (logging.DEBUG, "depois")
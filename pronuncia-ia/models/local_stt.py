@@ -0,0 +1,446 @@
+"""
+Transcrição local (sem custo por requisição).
+
+O Whisper via transformers foi desligado no main.py por consumir RAM demais.
+O faster-whisper roda quantizado em int8 e fica em um pool de instâncias
+já carregadas (aquecidas na subida da API), para a primeira requisição não
+pagar o carregamento do modelo. O pool respeita um orçamento de RAM: não carrega
+instâncias além do que cabe em LOCAL_STT_RAM_BUDGET_MB.
+
+Todos os modelos locais passam pelo LocalModelManager (`local_models`): são
+carregados no primeiro uso e despejados por LRU quando o orçamento de RAM
+não comporta um novo modelo. Só os provedores listados em LOCAL_STT_PROVIDERS
+são atendidos localmente.
+
+A inferência (e o pré-processamento com librosa/tokenização, que seguram a
+GIL) pode rodar em um pool de processos (LOCAL_STT_PROCESSES), para a vazão
+crescer com o número de núcleos sem travar o processo da API. Cada processo
+tem seu próprio LocalModelManager (o orçamento de RAM vale por processo).
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from model_manager import LocalModelManager, current_rss_bytes
+try:
+    from app.core.micro_batch import MicroBatcher
+except Exception:
+    MicroBatcher = None  # fora da API (ex.: só a pasta models no path): Wav2Vec2 roda sem lotes
+from modelos import (
+    CoquiSTT,
+    DeepSpeech,
+    FasterWhisper,
+    Wav2Vec2,
+    Wav2Vec2ONNX,
+    Whisper,
+    WhisperModel,
+    WhisperONNX,
+)
+
+# Logs (TRACE_LEVEL, ver app/core/tracing.py)
+try:
+    from app.core.tracing import get_logger
+except ImportError:
+    from logging import getLogger as get_logger
+
+log = get_logger("local_stt")
+
+FASTER_WHISPER_MODEL = os.getenv("FASTER_WHISPER_MODEL", "small")
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+FASTER_WHISPER_POOL_SIZE = int(os.getenv("FASTER_WHISPER_POOL_SIZE", "1"))
+FASTER_WHISPER_CPU_THREADS = int(os.getenv("FASTER_WHISPER_CPU_THREADS", "0"))  # 0 = padrão do CTranslate2
+FASTER_WHISPER_LANGUAGE = os.getenv("FASTER_WHISPER_LANGUAGE", "pt")
+# Carregar o pool na subida da API (senão carrega na primeira requisição)
+FASTER_WHISPER_PRELOAD = os.getenv("FASTER_WHISPER_PRELOAD", "false").strip().lower() in ("1", "true", "yes", "sim", "on")
+# Orçamento de RAM (RSS do processo) para modelos locais; 0 = sem limite
+LOCAL_STT_RAM_BUDGET_MB = float(os.getenv("LOCAL_STT_RAM_BUDGET_MB", "0"))
+# Provedores atendidos localmente; os demais nomes locais ("whisper"...) continuam indo para a nuvem
+LOCAL_STT_PROVIDERS = tuple(
+    p.strip().lower() for p in os.getenv("LOCAL_STT_PROVIDERS", "faster_whisper").split(",") if p.strip()
+)
+LOCAL_STT_DEVICE = os.getenv("LOCAL_STT_DEVICE", "cpu")
+# "int8" = quantização dinâmica das camadas Linear do whisper/wav2vec2 (torch, CPU); vazio = fp32
+LOCAL_STT_QUANTIZE = os.getenv("LOCAL_STT_QUANTIZE", "").strip().lower() or None
+# Lotes dinâmicos do Wav2Vec2: mais espera/lotes maiores = mais vazão, mais latência (1 desliga)
+WAV2VEC2_BATCH_MAX = int(os.getenv("WAV2VEC2_BATCH_MAX", "8"))
+WAV2VEC2_BATCH_WAIT_MS = float(os.getenv("WAV2VEC2_BATCH_WAIT_MS", "25"))
+# Pool de processos: "0" = threads no próprio processo; "auto" = núcleos disponíveis / threads por processo
+LOCAL_STT_PROCESSES = os.getenv("LOCAL_STT_PROCESSES", "0")
+LOCAL_STT_THREADS_PER_PROCESS = int(os.getenv("LOCAL_STT_THREADS_PER_PROCESS", "1"))
+# "spawn" (padrão, carrega os modelos uma vez por processo) ou "fork" (herda os modelos
+# pré-carregados no processo pai, compartilhados por copy-on-write)
+LOCAL_STT_START_METHOD = os.getenv("LOCAL_STT_START_METHOD", "spawn")
+
+_MB = 1024 * 1024
+
+
+class ModelPool:
+    """
+    Pool de instâncias de um modelo local. Cada transcrição usa uma instância
+    livre com exclusividade; com todas ocupadas, a chamada espera a próxima.
+    """
+
+    def __init__(self, name: str, factory: Callable, size: int = 1,
+                 ram_budget_mb: float = LOCAL_STT_RAM_BUDGET_MB, rss: Callable[[], int] = current_rss_bytes):
+        self.name = name
+        self._factory = factory
+        self.size = max(1, size)
+        self.ram_budget = int(ram_budget_mb * _MB) if ram_budget_mb else 0
+        self._rss = rss
+        self._idle: "queue.Queue" = queue.Queue()
+        self._instances: list = []
+        self._load_lock = threading.Lock()
+        self.instance_bytes = 0      # RAM estimada por instância (delta de RSS no carregamento)
+        self.load_seconds = 0.0
+        self.skipped_for_budget = 0  # instâncias não carregadas por falta de orçamento
+        self.requests = 0
+        self.total_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> int:
+        return len(self._instances)
+
+    def _load_one(self):
+        before = self._rss()
+        inicio = time.perf_counter()
+        instance = self._factory()
+        self.load_seconds += time.perf_counter() - inicio
+        delta = max(0, self._rss() - before)
+        self.instance_bytes = max(self.instance_bytes, delta)
+        self._instances.append(instance)
+        self._idle.put(instance)
+
+    def warm(self) -> int:
+        """Carrega instâncias até `size` ou até o orçamento de RAM. Retorna quantas estão carregadas."""
+        with self._load_lock:
+            while self.loaded < self.size:
+                if self.loaded and self.ram_budget and self._rss() + self.instance_bytes > self.ram_budget:
+                    self.skipped_for_budget = self.size - self.loaded
+                    break
+                self._load_one()
+                if self.loaded == 1 and self.ram_budget and self._rss() > self.ram_budget:
+                    self.unload()
+                    raise MemoryError(
+                        f"Modelo local '{self.name}' excede LOCAL_STT_RAM_BUDGET_MB "
+                        f"({self.ram_budget // _MB} MB)."
+                    )
+        return self.loaded
+
+    def unload(self):
+        """Descarta todas as instâncias (a RAM volta quando o GC liberar os modelos)."""
+        self._instances = []
+        self._idle = queue.Queue()
+
+    @contextmanager
+    def instance(self):
+        if not self._instances:
+            self.warm()
+        instance = self._idle.get()
+        try:
+            yield instance
+        finally:
+            self._idle.put(instance)
+
+    def transcribe(self, audio) -> str:
+        """Bloqueante: chamar via asyncio.to_thread em código assíncrono."""
+        with self.instance() as model:
+            inicio = time.perf_counter()
+            text = model.transcribe(audio)
+            elapsed = time.perf_counter() - inicio
+        with self._stats_lock:
+            self.requests += 1
+            self.total_seconds += elapsed
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "size": self.size,
+            "loaded": self.loaded,
+            "idle": self._idle.qsize(),
+            "skipped_for_budget": self.skipped_for_budget,
+            "instance_mb": round(self.instance_bytes / _MB, 1),
+            "load_seconds": round(self.load_seconds, 2),
+            "requests": self.requests,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else None,
+            "rss_mb": round(self._rss() / _MB, 1),
+            "ram_budget_mb": self.ram_budget // _MB if self.ram_budget else None,
+        }
+
+
+def _new_faster_whisper() -> FasterWhisper:
+    return FasterWhisper(
+        model_size=FASTER_WHISPER_MODEL,
+        device="cpu",
+        compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+        cpu_threads=FASTER_WHISPER_CPU_THREADS or None,
+        language=FASTER_WHISPER_LANGUAGE or None,
+    )
+
+
+FASTER_WHISPER_POOL_NAME = f"faster-whisper-{FASTER_WHISPER_MODEL}-{FASTER_WHISPER_COMPUTE_TYPE}"
+
+
+def _load_faster_whisper_pool() -> ModelPool:
+    if WhisperModel is None:
+        raise RuntimeError("faster-whisper não instalado (pip install faster-whisper).")
+    pool = ModelPool(FASTER_WHISPER_POOL_NAME, _new_faster_whisper, size=FASTER_WHISPER_POOL_SIZE)
+    pool.warm()
+    return pool
+
+
+local_models = LocalModelManager(ram_budget_mb=LOCAL_STT_RAM_BUDGET_MB)
+local_models.register("faster_whisper", _load_faster_whisper_pool)
+local_models.register("whisper", lambda: Whisper(device=LOCAL_STT_DEVICE, quantize=LOCAL_STT_QUANTIZE))
+local_models.register("wav2vec2", lambda: Wav2Vec2(device=LOCAL_STT_DEVICE, quantize=LOCAL_STT_QUANTIZE))
+# ONNX Runtime em CPU (grafo exportado uma vez e mantido em ONNX_CACHE_DIR)
+local_models.register("wav2vec2_onnx", lambda: Wav2Vec2ONNX(threads=LOCAL_STT_THREADS_PER_PROCESS or None))
+local_models.register("whisper_onnx", lambda: WhisperONNX())
+if os.getenv("DEEPSPEECH_MODEL_PATH"):
+    local_models.register("deepspeech", lambda: DeepSpeech(os.environ["DEEPSPEECH_MODEL_PATH"]))
+if os.getenv("COQUI_MODEL_PATH"):
+    local_models.register("coqui", lambda: CoquiSTT(os.environ["COQUI_MODEL_PATH"]))
+
+# nome do modelo exibido em /status e usado na chave do cache de transcrição
+LOCAL_MODEL_NAMES = {
+    "faster_whisper": FASTER_WHISPER_POOL_NAME,
+    "whisper": "openai/whisper-small" + (f":{LOCAL_STT_QUANTIZE}" if LOCAL_STT_QUANTIZE else ""),
+    "wav2vec2": "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese" + (f":{LOCAL_STT_QUANTIZE}" if LOCAL_STT_QUANTIZE else ""),
+    "wav2vec2_onnx": "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese:onnx",
+    "whisper_onnx": "openai/whisper-small:onnx",
+}
+
+
+def transcribe_local(name: str, audio) -> str:
+    """Bloqueante: transcreve com o modelo local `name`, carregando-o se preciso."""
+    with local_models.use(name) as model:
+        return model.transcribe(audio)
+
+
+def transcribe_local_batch(name: str, audios: list) -> list:
+    """Bloqueante: transcreve vários áudios; usa um único forward quando o modelo suporta lotes."""
+    with local_models.use(name) as model:
+        if hasattr(model, "transcribe_batch"):
+            return model.transcribe_batch(audios)
+        return [model.transcribe(audio) for audio in audios]
+
+
+def transcribe_local_bytes(name: str, data: bytes) -> str:
+    """Como transcribe_local, para modelos que leem objetos binários (bytes atravessam processos)."""
+    return transcribe_local(name, io.BytesIO(data))
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except Exception:
+        return os.cpu_count() or 1
+
+
+def process_pool_size(setting: str = LOCAL_STT_PROCESSES, threads: int = LOCAL_STT_THREADS_PER_PROCESS) -> int:
+    setting = (setting or "0").strip().lower()
+    if setting == "auto":
+        return max(1, available_cores() // max(1, threads))
+    return max(0, int(setting))
+
+
+def _init_worker(threads: int, preload_names: tuple):
+    """Inicialização de cada processo do pool: limita threads do torch e aquece os modelos."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    for name in preload_names:
+        try:
+            local_models.get(name)
+        except Exception as e:
+            log.warning("processo %d: falha ao pré-carregar %s: %s", os.getpid(), name, e)
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+class LocalProcessPool:
+    """
+    Executa as transcrições locais em processos separados, sem bloquear o
+    event loop. Se um processo morrer (ex.: OOM), o pool é recriado na
+    próxima chamada.
+    """
+
+    def __init__(self, size: int, start_method: str = LOCAL_STT_START_METHOD,
+                 threads: int = LOCAL_STT_THREADS_PER_PROCESS):
+        self.size = size
+        self.start_method = start_method
+        self.threads = threads
+        self.preload_names: tuple = ()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _get(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.threads, self.preload_names),
+                )
+            return self._executor
+
+    def start(self, preload_names: tuple = ()):
+        """Sobe todos os processos já (em vez de sob demanda), aquecendo os modelos indicados."""
+        self.preload_names = tuple(preload_names)
+        executor = self._get()
+        for future in [executor.submit(_worker_pid) for _ in range(self.size)]:
+            future.result()
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        try:
+            result = await loop.run_in_executor(self._get(), fn, *args)
+        except BrokenProcessPool as e:
+            self.failed += 1
+            with self._lock:
+                self._executor = None
+                self.restarts += 1
+            raise RuntimeError(f"Processo de transcrição local encerrado inesperadamente: {e}") from e
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "processes": self.size,
+            "start_method": self.start_method,
+            "threads_per_process": self.threads,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.submitted - self.completed - self.failed,
+            "restarts": self.restarts,
+        }
+
+
+process_pool = LocalProcessPool(process_pool_size())
+
+
+async def run_local(fn, *args):
+    """Roda uma função de transcrição local no pool de processos, ou numa thread se ele estiver desligado."""
+    if process_pool.enabled:
+        return await process_pool.run(fn, *args)
+    return await asyncio.to_thread(fn, *args)
+
+
+async def _batch_local(name: str, audios: list) -> list:
+    return await run_local(transcribe_local_batch, name, audios)
+
+
+async def _single_local(name: str, audio) -> str:
+    return await run_local(transcribe_local, name, audio)
+
+
+# Áudios que chegam juntos (até WAV2VEC2_BATCH_WAIT_MS) viram um único forward pass
+wav2vec2_batcher = (
+    MicroBatcher(_batch_local, _single_local, max_wait_ms=WAV2VEC2_BATCH_WAIT_MS, max_batch=WAV2VEC2_BATCH_MAX)
+    if MicroBatcher is not None and WAV2VEC2_BATCH_MAX > 1 else None
+)
+
+
+def preload():
+    """Aquece os modelos locais configurados e sobe o pool de processos (chamado na subida da API)."""
+    names = ()
+    if FASTER_WHISPER_PRELOAD and "faster_whisper" in LOCAL_STT_PROVIDERS and WhisperModel is not None:
+        names = ("faster_whisper",)
+    if not process_pool.enabled:
+        for name in names:
+            local_models.get(name)
+        return
+    if process_pool.start_method == "fork":
+        # carrega no pai antes do fork: os filhos herdam os pesos por copy-on-write
+        for name in names:
+            local_models.get(name)
+        process_pool.start()
+    else:
+        process_pool.start(preload_names=names)
+
+
+def shutdown():
+    process_pool.shutdown()
+
+
+class AsyncLocalTranscriber:
+    """Mesma interface dos transcritores assíncronos de nuvem, usando um modelo local gerenciado."""
+
+    local_name = "whisper"
+
+    def __init__(self, model: Optional[str] = None):
+        self.model_name = model or LOCAL_MODEL_NAMES.get(self.local_name, self.local_name)
+
+    async def transcribe(self, audio_path: str) -> str:
+        return await run_local(transcribe_local, self.local_name, audio_path)
+
+
+class AsyncWav2Vec2Transcriber(AsyncLocalTranscriber):
+    local_name = "wav2vec2"
+
+    async def transcribe(self, audio_path: str) -> str:
+        if wav2vec2_batcher is None:
+            return await super().transcribe(audio_path)
+        return await wav2vec2_batcher.submit(self.local_name, audio_path)
+
+
+class AsyncWav2Vec2ONNXTranscriber(AsyncWav2Vec2Transcriber):
+    local_name = "wav2vec2_onnx"
+
+
+class AsyncWhisperONNXTranscriber(AsyncLocalTranscriber):
+    local_name = "whisper_onnx"
+
+
+class AsyncDeepSpeechTranscriber(AsyncLocalTranscriber):
+    local_name = "deepspeech"
+
+
+class AsyncCoquiTranscriber(AsyncLocalTranscriber):
+    local_name = "coqui"
+
+
+class AsyncFasterWhisperTranscriber(AsyncLocalTranscriber):
+    local_name = "faster_whisper"
+
+    def __init__(self, model: Optional[str] = None):
+        if WhisperModel is None:
+            raise RuntimeError("faster-whisper não instalado (pip install faster-whisper).")
+        super().__init__(model)
+
+    async def transcribe_bytes(self, data: bytes, mime: str = "audio/wav", name: str = "audio.wav") -> str:
+        # faster-whisper decodifica objetos binários (PyAV): sem arquivo temporário
+        return await run_local(transcribe_local_bytes, self.local_name, bytes(data))
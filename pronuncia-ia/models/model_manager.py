@@ -0,0 +1,201 @@
+"""
+Gerenciador do ciclo de vida dos modelos locais de STT.
+
+As classes de modelos.py (Whisper, Wav2Vec2, FasterWhisper, DeepSpeech,
+CoquiSTT) carregam os pesos no __init__ e nada controlava quanto tempo ficam
+em memória. O gerenciador carrega cada modelo no primeiro uso, compartilha
+uma única instância entre as requisições, mede a memória residente de cada
+um (delta de RSS no carregamento) e, quando carregar um modelo passaria do
+orçamento de RAM, descarrega os menos usados recentemente.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+_MB = 1024 * 1024
+
+
+def current_rss_bytes() -> int:
+    """Memória residente atual do processo (Linux: /proc; fallback: pico via resource)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+class LocalModelManager:
+    """
+    Registro de modelos locais com carregamento preguiçoso e despejo LRU.
+
+    `use(nome)` fixa o modelo durante a inferência: modelos em uso nunca são
+    despejados. Se um modelo sozinho não cabe no orçamento, o carregamento
+    falha com MemoryError.
+    """
+
+    def __init__(self, factories: Optional[dict] = None, ram_budget_mb: float = 0,
+                 rss: Callable[[], int] = current_rss_bytes):
+        self._factories: dict[str, Callable] = dict(factories or {})
+        self.ram_budget = int(ram_budget_mb * _MB) if ram_budget_mb else 0
+        self._rss = rss
+        self._lock = threading.Lock()
+        self._build_locks: dict[str, threading.Lock] = {}
+        self._models: "OrderedDict[str, dict]" = OrderedDict()  # ordem LRU (mais recente no fim)
+        self._known_bytes: dict[str, int] = {}  # tamanho medido no último carregamento
+        self.events: deque = deque(maxlen=50)   # últimos carregamentos/despejos, com tempos
+        self.loads = 0
+        self.evictions = 0
+
+    def register(self, name: str, factory: Callable):
+        self._factories[name] = factory
+
+    @property
+    def available(self) -> list:
+        return sorted(self._factories)
+
+    # ---------------------------------------------------------------- acesso
+    def _touch(self, name: str, pin: bool):
+        entry = self._models.get(name)
+        if entry is None:
+            return None
+        self._models.move_to_end(name)
+        entry["uses"] += 1
+        entry["last_used"] = time.time()
+        if pin:
+            entry["in_use"] += 1
+        return entry["model"]
+
+    def _acquire(self, name: str, pin: bool):
+        with self._lock:
+            model = self._touch(name, pin)
+            if model is not None:
+                return model
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                model = self._touch(name, pin)
+                if model is not None:
+                    return model
+            factory = self._factories.get(name)
+            if factory is None:
+                raise RuntimeError(f"Modelo local desconhecido: '{name}'.")
+            self._make_room(self._known_bytes.get(name, 0), keep=name)
+
+            before = self._rss()
+            inicio = time.perf_counter()
+            model = factory()
+            load_seconds = time.perf_counter() - inicio
+            size = max(0, self._rss() - before)
+            with self._lock:
+                self._models[name] = {
+                    "model": model, "bytes": size, "load_seconds": load_seconds,
+                    "loaded_at": time.time(), "last_used": time.time(),
+                    "uses": 1, "in_use": 1 if pin else 0,
+                }
+                self._known_bytes[name] = size
+                self.loads += 1
+                self.events.append({"event": "load", "model": name, "seconds": round(load_seconds, 3),
+                                    "mb": round(size / _MB, 1), "at": time.time()})
+
+            # o tamanho real só é conhecido depois de carregar: ajusta despejando outros
+            if not self._make_room(0, keep=name):
+                self.evict(name, force=True)
+                raise MemoryError(
+                    f"Modelo local '{name}' ({size // _MB} MB) não cabe no orçamento de "
+                    f"{self.ram_budget // _MB} MB."
+                )
+            return model
+
+    def get(self, name: str):
+        """Retorna o modelo (carregando se preciso), sem fixá-lo."""
+        return self._acquire(name, pin=False)
+
+    @contextmanager
+    def use(self, name: str):
+        """Fixa o modelo enquanto o bloco executa (não pode ser despejado no meio da inferência)."""
+        model = self._acquire(name, pin=True)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None and entry["model"] is model:
+                    entry["in_use"] -= 1
+
+    # ---------------------------------------------------------------- despejo
+    def _make_room(self, needed: int, keep: Optional[str] = None) -> bool:
+        """Despeja modelos LRU livres até `rss + needed` caber no orçamento. Retorna se coube."""
+        if not self.ram_budget:
+            return True
+        inicial = self._rss()
+        freed = 0
+        while True:
+            with self._lock:
+                # cada despejo é descontado uma vez da medida inicial; se o RSS já caiu
+                # de verdade (memória devolvida ao SO), vale a leitura atual
+                if min(self._rss(), inicial - freed) + needed <= self.ram_budget:
+                    return True
+                victim = next(
+                    (n for n, e in self._models.items() if n != keep and e["in_use"] == 0),
+                    None,
+                )
+            if victim is None:
+                return False
+            freed += self.evict(victim)
+
+    def evict(self, name: str, force: bool = False) -> int:
+        """Descarrega o modelo; retorna os bytes que ele ocupava (0 se não estava carregado ou em uso)."""
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None or (entry["in_use"] and not force):
+                return 0
+            del self._models[name]
+        inicio = time.perf_counter()
+        unload = getattr(entry["model"], "unload", None)
+        if callable(unload):
+            unload()
+        entry["model"] = None
+        gc.collect()
+        seconds = time.perf_counter() - inicio
+        with self._lock:
+            self.evictions += 1
+            self.events.append({"event": "evict", "model": name, "seconds": round(seconds, 3),
+                                "mb": round(entry["bytes"] / _MB, 1), "at": time.time()})
+        return entry["bytes"]
+
+    def evict_all(self):
+        for name in list(self._models):
+            self.evict(name, force=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {}
+            for name, e in self._models.items():
+                models[name] = {
+                    "mb": round(e["bytes"] / _MB, 1),
+                    "load_seconds": round(e["load_seconds"], 2),
+                    "uses": e["uses"],
+                    "in_use": e["in_use"],
+                    "idle_seconds": round(time.time() - e["last_used"], 1),
+                }
+                if hasattr(e["model"], "stats"):
+                    models[name]["details"] = e["model"].stats()
+            return {
+                "available": self.available,
+                "loaded": models,
+                "rss_mb": round(self._rss() / _MB, 1),
+                "ram_budget_mb": self.ram_budget // _MB if self.ram_budget else None,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "events": list(self.events),
+            }
@@ -1,12 +1,17 @@
 import os
+import asyncio
 import mimetypes
+import threading
+import time
 from typing import Optional
 
 # Imports de bibliotecas STT (opcionais - podem não estar instaladas)
 try:
-    from transformers import pipeline, Wav2Vec2ForCTC, Wav2Vec2Processor
+    from transformers import pipeline, AutoModelForSpeechSeq2Seq, AutoProcessor, Wav2Vec2ForCTC, Wav2Vec2Processor
 except Exception:
     pipeline = None
+    AutoModelForSpeechSeq2Seq = None
+    AutoProcessor = None
     Wav2Vec2ForCTC = None
     Wav2Vec2Processor = None
 
@@ -45,22 +50,193 @@ try:
 except Exception:
     coqui = None
 
+# Backend ONNX Runtime (opcional): pip install onnxruntime optimum[onnxruntime]
+try:
+    import onnxruntime as ort
+except Exception:
+    ort = None
+
+try:
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+except Exception:
+    ORTModelForSpeechSeq2Seq = None
+
 # SDKs opcionais (não falhar no import do módulo inteiro se não instalados)
 try:
-    from openai import OpenAI  # pip install openai>=1.0
+    from openai import OpenAI, AsyncOpenAI  # pip install openai>=1.0
 except Exception:
     OpenAI = None
+    AsyncOpenAI = None
+
+try:
+    import httpx  # dependência do SDK openai; usado para o pool HTTP compartilhado
+except Exception:
+    httpx = None
 
 try:
     import google.generativeai as genai  # pip install google-generativeai
 except Exception:
     genai = None
 
+# Logs de depuração (TRACE_LEVEL/TRACE_SAMPLE, ver app/core/tracing.py)
+try:
+    from app.core.tracing import get_logger
+except ImportError:
+    from logging import getLogger as get_logger
+
+log = get_logger("modelos")
+
+# ----------------------------------------------------------------------------
+# Configuração e descoberta de modelos Gemini (compartilhadas pelo processo)
+# ----------------------------------------------------------------------------
+# genai.list_models() é uma chamada de rede; antes era feita a cada instanciação de
+# GeminiTranscriber/GeminiChat. Agora o nome resolvido fica em cache e só é
+# redescoberto depois de GEMINI_DISCOVERY_TTL segundos.
+GEMINI_DISCOVERY_TTL = float(os.getenv("GEMINI_DISCOVERY_TTL", "3600"))
+_GEMINI_FALLBACK_MODEL = "gemini-1.5-flash"
+
+# Prefer models that support generateContent for our transcribe flow
+_GEMINI_TRANSCRIBE_PREFERRED = (
+    "models/gemini-2.5-flash",
+    "models/gemini-2.5-pro",
+    "models/gemini-flash-latest",
+    # native-audio models may require bidiGenerateContent; try them after generateContent-capable models
+    "models/gemini-2.5-flash-native-audio-latest",
+    "models/gemini-2.0-flash",
+)
+_GEMINI_TRANSCRIBE_METHODS = ("generateContent", "bidiGenerateContent", "batchGenerateContent")
+
+# Prefer models that support generateContent for chat
+_GEMINI_CHAT_PREFERRED = (
+    "models/gemini-2.5-flash",
+    "models/gemini-2.5-pro",
+    "models/gemini-pro-latest",
+    "models/gemini-flash-latest",
+)
+_GEMINI_CHAT_METHODS = ("generateContent", "batchGenerateContent")
+
+_gemini_lock = threading.Lock()
+_gemini_configured_key = None
+_gemini_discovery_cache = {}  # (preferred, methods) -> (model_name, expira_em)
+
+
+def _configurar_genai(api_key: str):
+    """Chama genai.configure apenas quando a chave muda."""
+    global _gemini_configured_key
+    with _gemini_lock:
+        if _gemini_configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key = api_key
+
+
+def _descobrir_modelo_gemini(preferred: tuple, methods: tuple) -> str:
+    """
+    Escolhe um modelo Gemini disponível na conta, reaproveitando o resultado em cache.
+    """
+    key = (preferred, methods)
+    now = time.monotonic()
+    with _gemini_lock:
+        cached = _gemini_discovery_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    model_name = None
+    ttl = GEMINI_DISCOVERY_TTL
+    try:
+        available = {}
+        for m in genai.list_models():
+            name = getattr(m, "name", None) or getattr(m, "model", None) or getattr(m, "id", None)
+            supported = getattr(m, "supported_generation_methods", None)
+            if name:
+                available[name] = supported or []
+
+        # choose first preferred that is available and supports one of the methods
+        for p in preferred:
+            if p in available and any(x in available[p] for x in methods):
+                model_name = p
+                break
+
+        # fallback: pick any model that supports one of the methods
+        if not model_name:
+            for name, supported in available.items():
+                if any(x in supported for x in methods):
+                    model_name = name
+                    break
+    except Exception:
+        # If listing fails for any reason, fall back to a conservative default
+        # e tenta de novo em pouco tempo, sem esperar o TTL completo.
+        ttl = min(ttl, 60.0)
+
+    model_name = model_name or _GEMINI_FALLBACK_MODEL
+    with _gemini_lock:
+        _gemini_discovery_cache[key] = (model_name, now + ttl)
+    return model_name
+
+
+def invalidar_descoberta_gemini():
+    """Descarta os modelos Gemini resolvidos, forçando nova descoberta."""
+    with _gemini_lock:
+        _gemini_discovery_cache.clear()
+
+
+# ----------------------------------------------------------------------------
+# Quantização dinâmica int8 (CPU) dos modelos torch locais
+# ----------------------------------------------------------------------------
+# As camadas Linear passam a usar pesos int8 (ativações quantizadas em tempo de
+# execução). O modelo quantizado inteiro fica em cache no disco: nas próximas
+# cargas o fp32 nem é lido, o que também reduz o pico de RAM.
+QUANTIZED_CACHE_DIR = os.getenv(
+    "QUANTIZED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "cache", "quantized"),
+)
+QUANTIZE_MODES = (None, "int8")
+
+
+def _quantized_cache_path(model_name: str, kind: str) -> str:
+    # o pickle do módulo depende da versão do torch: versões diferentes não compartilham cache
+    versao = str(getattr(torch, "__version__", "torch")).replace("+", "_")
+    return os.path.join(QUANTIZED_CACHE_DIR, f"{model_name.replace('/', '__')}-{kind}-int8-torch{versao}.pt")
+
+
+def _load_quantized_int8(load_fp32, model_name: str, kind: str):
+    """Carrega o modelo com Linear em int8 dinâmico, usando o cache em disco quando existir."""
+    path = _quantized_cache_path(model_name, kind)
+    if os.path.exists(path):
+        return torch.load(path, weights_only=False)
+    model = torch.quantization.quantize_dynamic(load_fp32().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    torch.save(model, tmp)
+    os.replace(tmp, path)
+    return model
+
+
+def _check_quantize(quantize):
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"quantize inválido: {quantize!r} (use None ou 'int8').")
+
+
 # Classe para o Whisper
 class Whisper:
-    def __init__(self, device='cuda'):
+    def __init__(self, device='cuda', quantize=None, model_name='openai/whisper-small'):
+        """
+        `quantize="int8"` aplica quantização dinâmica às camadas Linear (só CPU).
+        """
+        _check_quantize(quantize)
+        self.quantize = quantize
+        if quantize == "int8":
+            self.device = 'cpu'
+            model = _load_quantized_int8(
+                lambda: AutoModelForSpeechSeq2Seq.from_pretrained(model_name), model_name, "whisper"
+            )
+            processor = AutoProcessor.from_pretrained(model_name)
+            self.model = pipeline(
+                'automatic-speech-recognition', model=model,
+                tokenizer=processor.tokenizer, feature_extractor=processor.feature_extractor, device=self.device,
+            )
+            return
         self.device = device
-        self.model = pipeline('automatic-speech-recognition', model='openai/whisper-small', device=self.device)
+        self.model = pipeline('automatic-speech-recognition', model=model_name, device=self.device)
 
     def transcribe(self, audio_path):
         """
@@ -71,13 +247,21 @@ class Whisper:
 
 # Classe para o Wav2Vec2
 class Wav2Vec2:
-    def __init__(self, model_name='jonatasgrosman/wav2vec2-large-xlsr-53-portuguese', device='cuda'):
+    def __init__(self, model_name='jonatasgrosman/wav2vec2-large-xlsr-53-portuguese', device='cuda', quantize=None):
         """
         Inicializa o modelo Wav2Vec2 com o nome e o dispositivo especificado.
+        `quantize="int8"` aplica quantização dinâmica às camadas Linear (só CPU).
         """
-        self.device = device
+        _check_quantize(quantize)
+        self.quantize = quantize
+        self.device = 'cpu' if quantize else device
         self.processor = Wav2Vec2Processor.from_pretrained(model_name)
-        self.model = Wav2Vec2ForCTC.from_pretrained(model_name).to(self.device)
+        if quantize == "int8":
+            self.model = _load_quantized_int8(
+                lambda: Wav2Vec2ForCTC.from_pretrained(model_name), model_name, "wav2vec2"
+            )
+        else:
+            self.model = Wav2Vec2ForCTC.from_pretrained(model_name).to(self.device)
 
     def transcribe(self, audio_path):
         """
@@ -96,6 +280,139 @@ class Wav2Vec2:
         transcription = self.processor.decode(predicted_ids[0])
         return transcription
 
+    def transcribe_batch(self, audio_paths):
+        """
+        Transcreve vários áudios com um único forward pass.
+        As entradas são completadas (padding) até o maior áudio do lote; a
+        attention mask, quando o feature extractor do modelo a produz (caso do
+        xlsr-53 large), impede que o padding influencie a saída.
+        """
+        audios = [librosa.load(path, sr=16000)[0] for path in audio_paths]
+        inputs = self.processor(audios, return_tensors='pt', sampling_rate=16000, padding=True)
+
+        kwargs = {"input_values": inputs.input_values.to(self.device)}
+        attention_mask = getattr(inputs, "attention_mask", None)
+        if attention_mask is not None:
+            kwargs["attention_mask"] = attention_mask.to(self.device)
+        with torch.no_grad():
+            logits = self.model(**kwargs).logits
+
+        predicted_ids = torch.argmax(logits, dim=-1)
+        return list(self.processor.batch_decode(predicted_ids))
+
+# ----------------------------------------------------------------------------
+# Backends ONNX Runtime (CPU): mesma interface transcribe(audio_path)
+# ----------------------------------------------------------------------------
+# Os grafos exportados ficam em cache no disco; a exportação só acontece uma vez por modelo.
+ONNX_CACHE_DIR = os.getenv(
+    "ONNX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "cache", "onnx"),
+)
+
+
+def _onnx_dir(model_name: str, cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or ONNX_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def _ort_session(path: str, threads: Optional[int] = None):
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class Wav2Vec2ONNX:
+    def __init__(self, model_name='jonatasgrosman/wav2vec2-large-xlsr-53-portuguese', cache_dir=None, threads=None):
+        """
+        Wav2Vec2 executado com ONNX Runtime. Na primeira vez o modelo torch é
+        exportado para ONNX (eixos dinâmicos de lote e amostras) e salvo em cache.
+        """
+        if ort is None:
+            raise RuntimeError("onnxruntime não instalado (pip install onnxruntime).")
+        self.model_name = model_name
+        self.processor = Wav2Vec2Processor.from_pretrained(model_name)
+        self.onnx_path = os.path.join(_onnx_dir(model_name, cache_dir), "wav2vec2.onnx")
+        if not os.path.exists(self.onnx_path):
+            self.export(model_name, self.onnx_path)
+        self.session = _ort_session(self.onnx_path, threads)
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_name: str, path: str):
+        """Exporta o Wav2Vec2ForCTC para ONNX (escrita atômica: vários processos podem exportar juntos)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        model = Wav2Vec2ForCTC.from_pretrained(model_name).eval()
+        dummy = torch.zeros(1, 16000)
+        mask = torch.ones(1, 16000, dtype=torch.long)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model, (dummy, mask), tmp,
+                input_names=["input_values", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_values": {0: "batch", 1: "samples"},
+                    "attention_mask": {0: "batch", 1: "samples"},
+                    "logits": {0: "batch", 1: "frames"},
+                },
+                opset_version=17,
+            )
+        os.replace(tmp, path)
+
+    def logits(self, audios):
+        """Logits do lote (numpy), com padding e attention mask como no caminho torch."""
+        inputs = self.processor(audios, sampling_rate=16000, padding=True, return_tensors='np')
+        feeds = {"input_values": inputs.input_values.astype(np.float32)}
+        if "attention_mask" in self._input_names:
+            mask = getattr(inputs, "attention_mask", None)
+            feeds["attention_mask"] = (
+                mask.astype(np.int64) if mask is not None else np.ones(feeds["input_values"].shape, dtype=np.int64)
+            )
+        return self.session.run(["logits"], feeds)[0]
+
+    def transcribe(self, audio_path):
+        """
+        Transcreve o áudio usando o Wav2Vec2 em ONNX Runtime.
+        """
+        return self.transcribe_batch([audio_path])[0]
+
+    def transcribe_batch(self, audio_paths):
+        audios = [librosa.load(path, sr=16000)[0] for path in audio_paths]
+        predicted_ids = np.argmax(self.logits(audios), axis=-1)
+        return list(self.processor.batch_decode(predicted_ids))
+
+
+class WhisperONNX:
+    def __init__(self, model_name='openai/whisper-small', cache_dir=None):
+        """
+        Whisper com encoder e decoder exportados para ONNX (via optimum) e
+        executados com ONNX Runtime; o export fica em cache no disco.
+        """
+        if ORTModelForSpeechSeq2Seq is None:
+            raise RuntimeError("optimum não instalado (pip install optimum[onnxruntime]).")
+        self.model_name = model_name
+        export_dir = _onnx_dir(model_name, cache_dir)
+        if os.path.exists(os.path.join(export_dir, "config.json")):
+            model = ORTModelForSpeechSeq2Seq.from_pretrained(export_dir)
+            processor = AutoProcessor.from_pretrained(export_dir)
+        else:
+            model = ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True)
+            processor = AutoProcessor.from_pretrained(model_name)
+            model.save_pretrained(export_dir)
+            processor.save_pretrained(export_dir)
+        self.model = pipeline(
+            'automatic-speech-recognition', model=model,
+            tokenizer=processor.tokenizer, feature_extractor=processor.feature_extractor,
+        )
+
+    def transcribe(self, audio_path):
+        """
+        Transcreve o áudio usando o Whisper em ONNX Runtime.
+        """
+        result = self.model(audio_path)
+        return result['text']
+
 # Classe para o DeepSpeech
 class DeepSpeech:
     def __init__(self, model_path):
@@ -134,17 +451,31 @@ class CoquiSTT:
 
 # Classe para o Faster Whisper
 class FasterWhisper:
-    def __init__(self, model_size='small', device='cuda'):
+    def __init__(self, model_size='small', device='cuda', compute_type=None, cpu_threads=None, language=None):
         """
         Inicializa o modelo Faster Whisper com o tamanho e dispositivo especificado.
+        `compute_type="int8"` quantiza os pesos para rodar em CPU com menos RAM.
         """
         self.device = device
-        self.model = WhisperModel(model_size, device=self.device)
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.language = language
+        kwargs = {}
+        if compute_type:
+            kwargs["compute_type"] = compute_type
+        if cpu_threads:
+            kwargs["cpu_threads"] = cpu_threads
+        self.model = WhisperModel(model_size, device=self.device, **kwargs)
+
     def transcribe(self, audio_path):
         """
         Transcreve o áudio usando o modelo Faster Whisper.
+        Aceita caminho de arquivo ou objeto binário (ex.: io.BytesIO).
         """
-        segments, info = self.model.transcribe(audio_path)
+        if self.language:
+            segments, info = self.model.transcribe(audio_path, language=self.language)
+        else:
+            segments, info = self.model.transcribe(audio_path)
         transcription = " ".join([segment.text for segment in segments])
         return transcription
 class OpenAITranscriber:
@@ -160,6 +491,14 @@ class OpenAITranscriber:
         with open(audio_path, "rb") as f:
             resp = self.client.audio.transcriptions.create(model=self.model, file=f)
         return getattr(resp, "text", "")
+
+    def transcribe_bytes(self, data: bytes, mime: str = "audio/wav", name: str = "audio.wav") -> str:
+        """Transcreve áudio já em memória (sem arquivo temporário)."""
+        resp = self.client.audio.transcriptions.create(model=self.model, file=(name, data, mime))
+        return getattr(resp, "text", "")
+GEMINI_TRANSCRIBE_PROMPT = "Transcreva o áudio exatamente como falado, mantendo o idioma."
+
+
 class GeminiTranscriber:
     def __init__(self, model: Optional[str] = None):
         if genai is None:
@@ -167,60 +506,37 @@ class GeminiTranscriber:
         api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("GOOGLE_API_KEY/GEMINI_API_KEY não configurada no ambiente.")
-        genai.configure(api_key=api_key)
-        # Prefer explicit model arg, then GEMINI_MODEL env, otherwise try to pick a supported model
-        self.model_name = model or os.getenv("GEMINI_MODEL")
-        if not self.model_name:
-            # Try to pick a sensible default from the account's available models
-            try:
-                # Prefer models that support generateContent for our transcribe flow
-                preferred = [
-                    "models/gemini-2.5-flash",
-                    "models/gemini-2.5-pro",
-                    "models/gemini-flash-latest",
-                    # native-audio models may require bidiGenerateContent; try them after generateContent-capable models
-                    "models/gemini-2.5-flash-native-audio-latest",
-                    "models/gemini-2.0-flash",
-                ]
-                available = {}
-                for m in genai.list_models():
-                    name = getattr(m, "name", None) or getattr(m, "model", None) or getattr(m, "id", None)
-                    methods = getattr(m, "supported_generation_methods", None)
-                    if name:
-                        available[name] = methods or []
-
-                # choose first preferred that is available and supports generateContent/bidiGenerateContent
-                for p in preferred:
-                    if p in available and any(x in available[p] for x in ("generateContent", "bidiGenerateContent", "batchGenerateContent")):
-                        self.model_name = p
-                        break
-
-                # fallback: pick any model that supports generateContent
-                if not self.model_name:
-                    for name, methods in available.items():
-                        if any(x in methods for x in ("generateContent", "bidiGenerateContent", "batchGenerateContent")):
-                            self.model_name = name
-                            break
-            except Exception:
-                # If listing fails for any reason, fall back to a conservative default
-                self.model_name = "gemini-1.5-flash"
-
-        # final fallback
-        if not self.model_name:
-            self.model_name = "gemini-1.5-flash"
-
-        print(f"[DEBUG] GeminiTranscriber usando modelo: {self.model_name}")
+        _configurar_genai(api_key)
+        # Prefer explicit model arg, then GEMINI_MODEL env, otherwise pick a supported model
+        # (a descoberta via genai.list_models() fica em cache por GEMINI_DISCOVERY_TTL segundos)
+        self.model_name = model or os.getenv("GEMINI_MODEL") or _descobrir_modelo_gemini(
+            _GEMINI_TRANSCRIBE_PREFERRED, _GEMINI_TRANSCRIBE_METHODS
+        )
+
+        log.debug("GeminiTranscriber usando modelo %s", self.model_name)
         self.model = genai.GenerativeModel(self.model_name)
 
     def transcribe(self, audio_path: str) -> str:
         with open(audio_path, "rb") as f:
             data = f.read()
         mime = mimetypes.guess_type(audio_path)[0] or "audio/wav"
-        prompt = "Transcreva o áudio exatamente como falado, mantendo o idioma."
-        resp = self.model.generate_content([prompt, {"mime_type": mime, "data": data}])
+        return self.transcribe_bytes(data, mime)
+
+    def transcribe_bytes(self, data: bytes, mime: str = "audio/wav", name: str = "audio.wav") -> str:
+        """Transcreve áudio já em memória (sem arquivo temporário)."""
+        resp = self.model.generate_content([GEMINI_TRANSCRIBE_PROMPT, {"mime_type": mime, "data": data}])
         return getattr(resp, "text", "")
 
 
+def _openai_generation(temperature: Optional[float]) -> dict:
+    """Parâmetros de geração opcionais (temperature=0 torna a resposta reprodutível)."""
+    return {} if temperature is None else {"temperature": temperature}
+
+
+def _gemini_generation(temperature: Optional[float]) -> dict:
+    return {} if temperature is None else {"generation_config": {"temperature": temperature, "candidate_count": 1}}
+
+
 class OpenAIChat:
     def __init__(self, model: Optional[str] = None):
         if OpenAI is None:
@@ -230,90 +546,188 @@ class OpenAIChat:
         self.client = OpenAI()
         self.model = model or os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 
-    def reply(self, messages: list[dict]) -> str:
-        resp = self.client.chat.completions.create(model=self.model, messages=messages)
+    def reply(self, messages: list[dict], temperature: Optional[float] = None) -> str:
+        resp = self.client.chat.completions.create(model=self.model, messages=messages, **_openai_generation(temperature))
         return resp.choices[0].message.content
 
-    def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil."):
+    def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
         messages = [{"role": "system", "content": system}, {"role": "user", "content": user_text}]
-        return self.reply(messages)
+        return self.reply(messages, temperature=temperature)
+
+
+def _gemini_prompt(messages: list[dict]) -> str:
+    # Concatena system + turns simples em texto
+    sys_msg = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user_msgs = [m["content"] for m in messages if m.get("role") == "user"]
+    return (sys_msg + "\n\n" if sys_msg else "") + "\n\n".join(user_msgs)
+
 
 class GeminiChat:
     def __init__(self, model: Optional[str] = None):
-        print(f"[DEBUG] 🔧 Inicializando GeminiChat...")
-        
         if genai is None:
-            print(f"[DEBUG] ❌ Pacote google-generativeai não está instalado!")
             raise RuntimeError("Pacote 'google-generativeai' não instalado. Use: pip install google-generativeai")
-        
-        print(f"[DEBUG] ✅ Pacote google-generativeai disponível")
-        
+
         # Verificar variáveis de ambiente
         google_key = os.getenv("GOOGLE_API_KEY")
         gemini_key = os.getenv("GEMINI_API_KEY")
-        
-        print(f"[DEBUG] GOOGLE_API_KEY encontrada: {google_key is not None}")
-        print(f"[DEBUG] GEMINI_API_KEY encontrada: {gemini_key is not None}")
-        
         api_key = google_key or gemini_key
         if not api_key:
-            print(f"[DEBUG] ❌ Nenhuma chave de API encontrada!")
             raise RuntimeError("GOOGLE_API_KEY/GEMINI_API_KEY não configurada no ambiente.")
-        
-        print(f"[DEBUG] ✅ Chave de API encontrada: {api_key[:20]}...")
-        
-        genai.configure(api_key=api_key)
+        log.debug("GeminiChat: chave de %s", "GOOGLE_API_KEY" if google_key else "GEMINI_API_KEY")
+
+        _configurar_genai(api_key)
 
         # Prefer explicit model arg, then GEMINI_CHAT_MODEL, then GEMINI_MODEL, otherwise pick from available models
-        self.model_name = model or os.getenv("GEMINI_CHAT_MODEL") or os.getenv("GEMINI_MODEL")
-        if not self.model_name:
-            try:
-                # Prefer models that support generateContent for chat
-                preferred = [
-                    "models/gemini-2.5-flash",
-                    "models/gemini-2.5-pro",
-                    "models/gemini-pro-latest",
-                    "models/gemini-flash-latest",
-                ]
-                available = {}
-                for m in genai.list_models():
-                    name = getattr(m, "name", None) or getattr(m, "model", None) or getattr(m, "id", None)
-                    methods = getattr(m, "supported_generation_methods", None)
-                    if name:
-                        available[name] = methods or []
-
-                for p in preferred:
-                    if p in available and any(x in available[p] for x in ("generateContent", "batchGenerateContent")):
-                        self.model_name = p
-                        break
-
-                if not self.model_name:
-                    for name, methods in available.items():
-                        if any(x in methods for x in ("generateContent", "batchGenerateContent")):
-                            self.model_name = name
-                            break
-            except Exception:
-                self.model_name = "gemini-1.5-flash"
-
-        if not self.model_name:
-            self.model_name = "gemini-1.5-flash"
-
-        print(f"[DEBUG] 📦 Usando modelo: {self.model_name}")
+        self.model_name = (
+            model
+            or os.getenv("GEMINI_CHAT_MODEL")
+            or os.getenv("GEMINI_MODEL")
+            or _descobrir_modelo_gemini(_GEMINI_CHAT_PREFERRED, _GEMINI_CHAT_METHODS)
+        )
+
+        log.debug("GeminiChat usando modelo %s", self.model_name)
         self.model = genai.GenerativeModel(self.model_name)
-        print(f"[DEBUG] ✅ GeminiChat inicializado com sucesso!")
-
-    def reply(self, messages: list[dict]) -> str:
-        print(f"[DEBUG] 💬 GeminiChat.reply() chamado com {len(messages)} mensagens")
-        # Concatena system + turns simples em texto
-        sys_msg = next((m["content"] for m in messages if m.get("role") == "system"), "")
-        user_msgs = [m["content"] for m in messages if m.get("role") == "user"]
-        prompt = (sys_msg + "\n\n" if sys_msg else "") + "\n\n".join(user_msgs)
-        print(f"[DEBUG] 📤 Enviando prompt para Gemini (tamanho: {len(prompt)} chars)...")
-        resp = self.model.generate_content(prompt)
+
+    def reply(self, messages: list[dict], temperature: Optional[float] = None) -> str:
+        prompt = _gemini_prompt(messages)
+        resp = self.model.generate_content(prompt, **_gemini_generation(temperature))
         result = getattr(resp, "text", "")
-        print(f"[DEBUG] 📥 Resposta recebida (tamanho: {len(result)} chars)")
+        log.debug("GeminiChat.reply: %d mensagens, prompt de %d chars, resposta de %d chars",
+                  len(messages), len(prompt), len(result))
         return result
 
-    def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil."):
-        print(f"[DEBUG] 💬 GeminiChat.reply_from_text() chamado")
-        return self.reply([{"role": "system", "content": system}, {"role": "user", "content": user_text}])
\ No newline at end of file
+    def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
+        return self.reply([{"role": "system", "content": system}, {"role": "user", "content": user_text}], temperature=temperature)
+
+
+# ----------------------------------------------------------------------------
+# Variantes assíncronas (usadas pelos endpoints da API)
+# ----------------------------------------------------------------------------
+# Os endpoints são `async def`; chamar os clientes síncronos acima bloqueava o
+# event loop inteiro durante cada chamada ao provedor. As classes abaixo têm a
+# mesma interface, mas com métodos `async`.
+#
+# Os clientes OpenAI compartilham um único httpx.AsyncClient com keep-alive,
+# então a concorrência cresce com o número de requisições em andamento, não com
+# o número de workers. O SDK do Gemini usa seu próprio canal (gRPC/REST) que é
+# mantido vivo pelo cliente reaproveitado no registro de provedores.
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def shared_async_http_client():
+    """Retorna o httpx.AsyncClient compartilhado pelo processo (criado sob demanda)."""
+    global _http_client
+    if httpx is None:
+        return None
+    with _http_client_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+                ),
+                timeout=httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", "60")), connect=10.0),
+            )
+        return _http_client
+
+
+async def close_shared_async_http_client():
+    """Fecha o pool HTTP compartilhado (chamado no shutdown da API)."""
+    global _http_client
+    with _http_client_lock:
+        client, _http_client = _http_client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _ler_audio(audio_path: str) -> bytes:
+    with open(audio_path, "rb") as f:
+        return f.read()
+
+
+class AsyncOpenAITranscriber(OpenAITranscriber):
+    def __init__(self, model: Optional[str] = None):
+        if AsyncOpenAI is None:
+            raise RuntimeError("Pacote 'openai' não instalado. Use: pip install openai")
+        if not os.getenv("OPENAI_API_KEY"):
+            raise RuntimeError("OPENAI_API_KEY não configurada no ambiente.")
+        self.client = AsyncOpenAI(http_client=shared_async_http_client())
+        self.model = model or os.getenv("OPENAI_TRANSCRIBE_MODEL", "gpt-4o-transcribe")
+
+    async def transcribe(self, audio_path: str) -> str:
+        data = await asyncio.to_thread(_ler_audio, audio_path)
+        mime = mimetypes.guess_type(audio_path)[0] or "audio/wav"
+        return await self.transcribe_bytes(data, mime, os.path.basename(audio_path))
+
+    async def transcribe_bytes(self, data: bytes, mime: str = "audio/wav", name: str = "audio.wav") -> str:
+        resp = await self.client.audio.transcriptions.create(model=self.model, file=(name, data, mime))
+        return getattr(resp, "text", "")
+
+
+class AsyncGeminiTranscriber(GeminiTranscriber):
+    async def transcribe(self, audio_path: str) -> str:
+        data = await asyncio.to_thread(_ler_audio, audio_path)
+        mime = mimetypes.guess_type(audio_path)[0] or "audio/wav"
+        return await self.transcribe_bytes(data, mime)
+
+    async def transcribe_bytes(self, data: bytes, mime: str = "audio/wav", name: str = "audio.wav") -> str:
+        resp = await self.model.generate_content_async([GEMINI_TRANSCRIBE_PROMPT, {"mime_type": mime, "data": data}])
+        return getattr(resp, "text", "")
+
+
+class AsyncOpenAIChat(OpenAIChat):
+    def __init__(self, model: Optional[str] = None):
+        if AsyncOpenAI is None:
+            raise RuntimeError("Pacote 'openai' não instalado. Use: pip install openai")
+        if not os.getenv("OPENAI_API_KEY"):
+            raise RuntimeError("OPENAI_API_KEY não configurada no ambiente.")
+        self.client = AsyncOpenAI(http_client=shared_async_http_client())
+        self.model = model or os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+
+    async def reply(self, messages: list[dict], temperature: Optional[float] = None) -> str:
+        resp = await self.client.chat.completions.create(
+            model=self.model, messages=messages, **_openai_generation(temperature)
+        )
+        return resp.choices[0].message.content
+
+    async def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user_text}]
+        return await self.reply(messages, temperature=temperature)
+
+    async def stream_reply(self, messages: list[dict], temperature: Optional[float] = None):
+        """Gera o texto da resposta em pedaços, conforme o modelo produz os tokens."""
+        stream = await self.client.chat.completions.create(
+            model=self.model, messages=messages, stream=True, **_openai_generation(temperature)
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def stream_reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user_text}]
+        return self.stream_reply(messages, temperature=temperature)
+
+
+class AsyncGeminiChat(GeminiChat):
+    async def reply(self, messages: list[dict], temperature: Optional[float] = None) -> str:
+        resp = await self.model.generate_content_async(_gemini_prompt(messages), **_gemini_generation(temperature))
+        return getattr(resp, "text", "")
+
+    async def reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
+        return await self.reply([{"role": "system", "content": system}, {"role": "user", "content": user_text}], temperature=temperature)
+
+    async def stream_reply(self, messages: list[dict], temperature: Optional[float] = None):
+        """Gera o texto da resposta em pedaços, conforme o modelo produz os tokens."""
+        resp = await self.model.generate_content_async(_gemini_prompt(messages), stream=True, **_gemini_generation(temperature))
+        async for chunk in resp:
+            try:
+                text = chunk.text
+            except ValueError:  # pedaço sem texto (ex.: só metadados de segurança)
+                continue
+            if text:
+                yield text
+
+    def stream_reply_from_text(self, user_text: str, system: str = "Você é um assistente útil.", temperature: Optional[float] = None):
+        return self.stream_reply([{"role": "system", "content": system}, {"role": "user", "content": user_text}], temperature=temperature)
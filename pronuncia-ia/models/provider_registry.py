@@ -0,0 +1,176 @@
+"""
+Registro de clientes de provedores (transcrição e chat) compartilhado pelo processo.
+
+Antes cada requisição criava um GeminiTranscriber/GeminiChat novo, pagando
+genai.configure + genai.list_models() antes do trabalho real. O registro cria
+cada cliente uma única vez por (tipo, provedor, modelo) e o reaproveita.
+Clientes com modelo resolvido automaticamente expiram após REGISTRY_TTL
+segundos, para que a descoberta do modelo seja refeita periodicamente.
+No registro do processo, os clientes são entregues atrás do disjuntor do
+provedor (app/core/routing.py).
+"""
+import os
+import asyncio
+import threading
+import time
+from typing import Callable, Optional
+
+from modelos import (
+    AsyncGeminiChat,
+    AsyncGeminiTranscriber,
+    AsyncOpenAIChat,
+    AsyncOpenAITranscriber,
+    GeminiChat,
+    GeminiTranscriber,
+    OpenAIChat,
+    OpenAITranscriber,
+)
+from local_stt import (
+    AsyncCoquiTranscriber,
+    AsyncDeepSpeechTranscriber,
+    AsyncFasterWhisperTranscriber,
+    AsyncLocalTranscriber,
+    AsyncWav2Vec2ONNXTranscriber,
+    AsyncWav2Vec2Transcriber,
+    AsyncWhisperONNXTranscriber,
+)
+
+try:
+    from app.core.routing import provider_router
+except Exception:
+    provider_router = None
+
+REGISTRY_TTL = float(os.getenv("REGISTRY_TTL", os.getenv("GEMINI_DISCOVERY_TTL", "3600")))
+
+# (tipo, provedor) -> classe/fábrica que aceita `model` opcional
+DEFAULT_FACTORIES: dict[tuple[str, str], Callable] = {
+    ("transcriber", "gemini"): GeminiTranscriber,
+    ("transcriber", "openai"): OpenAITranscriber,
+    ("chat", "gemini"): GeminiChat,
+    ("chat", "openai"): OpenAIChat,
+    ("transcriber_async", "gemini"): AsyncGeminiTranscriber,
+    ("transcriber_async", "openai"): AsyncOpenAITranscriber,
+    ("chat_async", "gemini"): AsyncGeminiChat,
+    ("chat_async", "openai"): AsyncOpenAIChat,
+    # locais: o wrapper é leve, o modelo fica no LocalModelManager de local_stt (não expira com o TTL)
+    ("transcriber_async", "faster_whisper"): AsyncFasterWhisperTranscriber,
+    ("transcriber_async", "whisper"): AsyncLocalTranscriber,
+    ("transcriber_async", "wav2vec2"): AsyncWav2Vec2Transcriber,
+    ("transcriber_async", "wav2vec2_onnx"): AsyncWav2Vec2ONNXTranscriber,
+    ("transcriber_async", "whisper_onnx"): AsyncWhisperONNXTranscriber,
+    ("transcriber_async", "deepspeech"): AsyncDeepSpeechTranscriber,
+    ("transcriber_async", "coqui"): AsyncCoquiTranscriber,
+}
+
+
+def client_model_name(client) -> Optional[str]:
+    """Nome do modelo efetivamente usado pelo cliente (Gemini usa `model_name`, OpenAI `model`)."""
+    name = getattr(client, "model_name", None)
+    if name is None and isinstance(getattr(client, "model", None), str):
+        name = client.model
+    return name
+
+
+class ProviderRegistry:
+    """
+    Cache de instâncias de clientes, seguro para uso concorrente.
+
+    Só uma thread constrói cada cliente; as demais que pedirem a mesma chave
+    esperam e recebem a mesma instância.
+    """
+
+    def __init__(self, factories: Optional[dict] = None, ttl: float = REGISTRY_TTL, router=None):
+        self._factories = dict(DEFAULT_FACTORIES if factories is None else factories)
+        self._ttl = ttl
+        self._router = router
+        self._lock = threading.Lock()
+        self._build_locks: dict[tuple, threading.Lock] = {}
+        self._entries: dict[tuple, tuple] = {}  # chave -> (cliente, expira_em | None)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: tuple, now: float):
+        entry = self._entries.get(key)
+        if entry and (entry[1] is None or entry[1] > now):
+            self.hits += 1
+            return entry[0]
+        return None
+
+    def get(self, kind: str, provider: str, model: Optional[str] = None):
+        """Retorna o cliente de `kind` ("transcriber" | "chat" | "*_async") para o provedor/modelo."""
+        provider = (provider or "").lower()
+        key = (kind, provider, model)
+        with self._lock:
+            client = self._lookup(key, time.monotonic())
+            if client is not None:
+                return client
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # outra thread pode ter construído enquanto esperávamos
+            with self._lock:
+                client = self._lookup(key, time.monotonic())
+                if client is not None:
+                    return client
+
+            factory = self._factories.get((kind, provider))
+            if factory is None:
+                raise RuntimeError(f"Provider sem {kind}: '{provider}'.")
+            client = factory(model) if model else factory()
+            if self._router is not None:
+                client = self._router.guard(client, kind, provider, model)
+            # modelo explícito não depende de descoberta, então não expira
+            expires = None if model else time.monotonic() + self._ttl
+            with self._lock:
+                self._entries[key] = (client, expires)
+                self.misses += 1
+            return client
+
+    async def aget(self, kind: str, provider: str, model: Optional[str] = None):
+        """
+        Versão para código assíncrono: em caso de miss, a construção do cliente
+        (que pode ir à rede para descobrir o modelo) roda fora do event loop.
+        """
+        key = (kind, (provider or "").lower(), model)
+        with self._lock:
+            client = self._lookup(key, time.monotonic())
+        if client is not None:
+            return client
+        return await asyncio.to_thread(self.get, kind, provider, model)
+
+    def invalidate(self, kind: Optional[str] = None, provider: Optional[str] = None):
+        """Remove clientes do registro (todos, ou apenas do tipo/provedor informado)."""
+        with self._lock:
+            for key in list(self._entries):
+                if (kind is None or key[0] == kind) and (provider is None or key[1] == provider.lower()):
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "clients": [
+                    {"kind": k[0], "provider": k[1], "model": client_model_name(c) or k[2]}
+                    for k, (c, _) in self._entries.items()
+                ],
+            }
+
+
+registry = ProviderRegistry(router=provider_router)
+
+
+def get_transcriber(provider: str, model: Optional[str] = None):
+    return registry.get("transcriber", provider, model)
+
+
+def get_chat(provider: str, model: Optional[str] = None):
+    return registry.get("chat", provider, model)
+
+
+async def get_async_transcriber(provider: str, model: Optional[str] = None):
+    return await registry.aget("transcriber_async", provider, model)
+
+
+async def get_async_chat(provider: str, model: Optional[str] = None):
+    return await registry.aget("chat_async", provider, model)
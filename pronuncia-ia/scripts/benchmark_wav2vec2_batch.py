@@ -0,0 +1,94 @@
+"""
+Benchmark do Wav2Vec2 com lotes dinâmicos (latência x vazão)
+
+Compara o caminho sequencial (um forward por áudio) com o MicroBatcher em
+várias combinações de tamanho máximo de lote e tempo máximo de espera,
+simulando N requisições simultâneas.
+
+Execute: python scripts/benchmark_wav2vec2_batch.py audio1.wav audio2.wav ... \
+             --requests 32 --batch-sizes 1,4,8 --wait-ms 10,25,50
+"""
+import argparse
+import asyncio
+import pathlib
+import statistics
+import sys
+import time
+
+project_root = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "models"))
+
+from app.core.micro_batch import MicroBatcher
+from modelos import Wav2Vec2
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _linha(nome: str, total: float, latencias: list, n: int) -> str:
+    return (f"{nome:<22} {n / total:>8.2f} áudios/s   "
+            f"p50 {_percentil(latencias, 50) * 1000:>8.0f} ms   p95 {_percentil(latencias, 95) * 1000:>8.0f} ms")
+
+
+async def _rodar_lotes(model: Wav2Vec2, audios: list, max_batch: int, wait_ms: float) -> tuple:
+    async def batch(_, paths):
+        return await asyncio.to_thread(model.transcribe_batch, paths)
+
+    async def single(_, path):
+        return await asyncio.to_thread(model.transcribe, path)
+
+    batcher = MicroBatcher(batch, single, max_wait_ms=wait_ms, max_batch=max_batch)
+
+    async def uma(path):
+        inicio = time.perf_counter()
+        await batcher.submit("wav2vec2", path)
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*[uma(a) for a in audios])
+    return time.perf_counter() - inicio, list(latencias), batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audios", nargs="+", help="arquivos de áudio (repetidos até --requests)")
+    parser.add_argument("--requests", type=int, default=32, help="requisições simultâneas simuladas")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="tamanhos máximos de lote")
+    parser.add_argument("--wait-ms", default="10,25,50", help="tempos máximos de espera do lote")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    audios = [args.audios[i % len(args.audios)] for i in range(args.requests)]
+
+    print("Carregando Wav2Vec2...")
+    inicio = time.perf_counter()
+    model = Wav2Vec2(device=args.device)
+    print(f"Modelo carregado em {time.perf_counter() - inicio:.1f}s\n")
+    model.transcribe(audios[0])  # aquecimento
+
+    # Referência: um forward por áudio, em sequência
+    latencias = []
+    inicio = time.perf_counter()
+    referencia = []
+    for audio in audios:
+        referencia.append(model.transcribe(audio))
+        latencias.append(time.perf_counter() - inicio)  # espera na fila + inferência
+    print(_linha("sequencial", time.perf_counter() - inicio, latencias, len(audios)))
+
+    for max_batch in [int(b) for b in args.batch_sizes.split(",")]:
+        for wait_ms in [float(w) for w in args.wait_ms.split(",")]:
+            total, latencias, stats = asyncio.run(_rodar_lotes(model, audios, max_batch, wait_ms))
+            nome = f"lote {max_batch} / {wait_ms:g} ms"
+            print(_linha(nome, total, latencias, len(audios)) + f"   lotes {stats['batches']}")
+
+    # O padding muda minimamente os logits; confere se as transcrições batem
+    lote = model.transcribe_batch(audios[:min(8, len(audios))])
+    iguais = sum(a.strip() == b.strip() for a, b in zip(lote, referencia))
+    print(f"\nTranscrições idênticas ao caminho sequencial: {iguais}/{len(lote)}")
+
+
+if __name__ == "__main__":
+    main()
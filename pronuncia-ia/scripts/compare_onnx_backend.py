@@ -0,0 +1,90 @@
+"""
+Comparação de paridade e velocidade: PyTorch x ONNX Runtime (CPU)
+
+Para cada áudio, transcreve com o caminho torch (Wav2Vec2 / Whisper) e com o
+backend ONNX equivalente, e mostra:
+- latência média e p50 de cada backend e o ganho (speedup)
+- quantas transcrições são idênticas e a similaridade média do texto
+- (wav2vec2) a maior diferença absoluta entre os logits
+
+Execute: python scripts/compare_onnx_backend.py --backend wav2vec2 audio1.wav audio2.wav ...
+"""
+import argparse
+import difflib
+import pathlib
+import statistics
+import sys
+import time
+
+project_root = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / "models"))
+
+from modelos import Wav2Vec2, Wav2Vec2ONNX, Whisper, WhisperONNX, librosa, np, torch
+
+
+def _cronometrar(fn, audios: list, repeticoes: int) -> tuple:
+    fn(audios[0])  # aquecimento (alocação de buffers, otimização do grafo)
+    tempos, textos = [], []
+    for audio in audios:
+        amostras = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            texto = fn(audio)
+            amostras.append(time.perf_counter() - inicio)
+        tempos.append(min(amostras))
+        textos.append(texto)
+    return tempos, textos
+
+
+def _diferenca_logits(torch_model: Wav2Vec2, onnx_model: Wav2Vec2ONNX, audio_path: str) -> float:
+    audio, _ = librosa.load(audio_path, sr=16000)
+    inputs = torch_model.processor([audio], return_tensors='pt', sampling_rate=16000, padding=True)
+    kwargs = {"input_values": inputs.input_values}
+    if getattr(inputs, "attention_mask", None) is not None:
+        kwargs["attention_mask"] = inputs.attention_mask
+    with torch.no_grad():
+        esperado = torch_model.model(**kwargs).logits.numpy()
+    obtido = onnx_model.logits([audio])
+    return float(np.max(np.abs(esperado - obtido)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audios", nargs="+")
+    parser.add_argument("--backend", choices=["wav2vec2", "whisper"], default="wav2vec2")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por áudio (vale a mais rápida)")
+    args = parser.parse_args()
+
+    print(f"Carregando {args.backend} (torch e ONNX; a primeira execução exporta o grafo)...")
+    inicio = time.perf_counter()
+    torch_model = Wav2Vec2(device="cpu") if args.backend == "wav2vec2" else Whisper(device="cpu")
+    print(f"  torch carregado em {time.perf_counter() - inicio:.1f}s")
+    inicio = time.perf_counter()
+    onnx_model = Wav2Vec2ONNX() if args.backend == "wav2vec2" else WhisperONNX()
+    print(f"  ONNX carregado em {time.perf_counter() - inicio:.1f}s\n")
+
+    tempos_torch, textos_torch = _cronometrar(torch_model.transcribe, args.audios, args.repeticoes)
+    tempos_onnx, textos_onnx = _cronometrar(onnx_model.transcribe, args.audios, args.repeticoes)
+
+    print(f"{'backend':<8} {'média':>10} {'p50':>10}")
+    for nome, tempos in (("torch", tempos_torch), ("onnx", tempos_onnx)):
+        print(f"{nome:<8} {statistics.mean(tempos) * 1000:>8.0f}ms {statistics.median(tempos) * 1000:>8.0f}ms")
+    print(f"\nSpeedup ONNX: {statistics.mean(tempos_torch) / statistics.mean(tempos_onnx):.2f}x")
+
+    iguais = sum(a.strip() == b.strip() for a, b in zip(textos_torch, textos_onnx))
+    similaridade = statistics.mean(
+        difflib.SequenceMatcher(None, a.strip().lower(), b.strip().lower()).ratio()
+        for a, b in zip(textos_torch, textos_onnx)
+    )
+    print(f"Transcrições idênticas: {iguais}/{len(args.audios)}   similaridade média: {similaridade:.3f}")
+    for audio, a, b in zip(args.audios, textos_torch, textos_onnx):
+        if a.strip() != b.strip():
+            print(f"  {audio}\n    torch: {a.strip()}\n    onnx:  {b.strip()}")
+
+    if args.backend == "wav2vec2":
+        diff = max(_diferenca_logits(torch_model, onnx_model, a) for a in args.audios)
+        print(f"Maior diferença absoluta nos logits: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Comparação fp32 x int8 dinâmico dos modelos torch locais (CPU)
+
+Carrega o modelo em fp32 e com quantize="int8" e mostra, sobre um conjunto de
+áudios de referência:
+- RAM: aumento de RSS ao carregar e tamanho serializado dos pesos
+- velocidade: latência média por áudio e speedup
+- diferença nas transcrições: quantas são idênticas e a similaridade média
+
+Execute: python scripts/compare_quantization.py --backend wav2vec2 audio1.wav audio2.wav ...
+"""
+import argparse
+import difflib
+import gc
+import io
+import pathlib
+import statistics
+import sys
+import time
+
+project_root = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / "models"))
+
+from model_manager import current_rss_bytes
+from modelos import Wav2Vec2, Whisper, torch
+
+MB = 1024 * 1024
+
+
+def _carregar(backend: str, quantize):
+    gc.collect()
+    antes = current_rss_bytes()
+    inicio = time.perf_counter()
+    model = Wav2Vec2(device="cpu", quantize=quantize) if backend == "wav2vec2" else Whisper(device="cpu", quantize=quantize)
+    segundos = time.perf_counter() - inicio
+    return model, (current_rss_bytes() - antes) / MB, segundos
+
+
+def _tamanho_serializado_mb(model) -> float:
+    modulo = model.model if hasattr(model.model, "state_dict") else model.model.model  # pipeline do Whisper
+    buffer = io.BytesIO()
+    torch.save(modulo.state_dict(), buffer)
+    return buffer.tell() / MB
+
+
+def _transcrever(model, audios: list) -> tuple:
+    model.transcribe(audios[0])  # aquecimento
+    tempos, textos = [], []
+    for audio in audios:
+        inicio = time.perf_counter()
+        textos.append(model.transcribe(audio).strip())
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, textos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audios", nargs="+")
+    parser.add_argument("--backend", choices=["wav2vec2", "whisper"], default="wav2vec2")
+    args = parser.parse_args()
+
+    resultados = {}
+    for modo in (None, "int8"):
+        nome = modo or "fp32"
+        print(f"Carregando {args.backend} {nome}...")
+        model, rss_mb, carga = _carregar(args.backend, modo)
+        tempos, textos = _transcrever(model, args.audios)
+        resultados[nome] = {
+            "rss_mb": rss_mb, "pesos_mb": _tamanho_serializado_mb(model), "carga_s": carga,
+            "latencia_ms": statistics.mean(tempos) * 1000, "textos": textos,
+        }
+        del model
+        gc.collect()
+
+    print(f"\n{'modo':<6} {'RSS +MB':>9} {'pesos MB':>9} {'carga':>8} {'latência':>10}")
+    for nome, r in resultados.items():
+        print(f"{nome:<6} {r['rss_mb']:>9.0f} {r['pesos_mb']:>9.0f} {r['carga_s']:>7.1f}s {r['latencia_ms']:>8.0f}ms")
+
+    fp32, int8 = resultados["fp32"], resultados["int8"]
+    print(f"\nRedução de memória (pesos): {1 - int8['pesos_mb'] / fp32['pesos_mb']:.0%}")
+    print(f"Speedup int8: {fp32['latencia_ms'] / int8['latencia_ms']:.2f}x")
+    iguais = sum(a == b for a, b in zip(fp32["textos"], int8["textos"]))
+    similaridade = statistics.mean(
+        difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio() for a, b in zip(fp32["textos"], int8["textos"])
+    )
+    print(f"Transcrições idênticas: {iguais}/{len(args.audios)}   similaridade média: {similaridade:.3f}")
+    for audio, a, b in zip(args.audios, fp32["textos"], int8["textos"]):
+        if a != b:
+            print(f"  {audio}\n    fp32: {a}\n    int8: {b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Worker dedicado da fila de avaliações assíncronas (/avaliar com mode=async)
+
+Consome a mesma fila SQLite da API (SUBMISSION_QUEUE_PATH) em outro processo,
+para que transcrição e avaliação não disputem CPU com o servidor HTTP. Rode
+quantos processos quiser; na API, SUBMISSION_WORKERS=0 deixa só o enfileiramento.
+
+Execute: python scripts/submission_worker.py --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+
+project_root = pathlib.Path(__file__).resolve().parent.parent
+os.chdir(project_root)
+sys.path.insert(0, str(project_root))
+
+from app.api import main as api
+from app.core.submissions import SubmissionWorker
+
+
+async def _rodar(concurrency: int):
+    await asyncio.to_thread(api.local_stt.preload)
+    worker = SubmissionWorker(api.submission_queue, api.processar_submissao, concurrency, notify=api.entregar_webhook)
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.stop()
+        await api.close_shared_async_http_client()
+        api.local_stt.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SUBMISSION_WORKERS", "2")) or 2,
+                        help="submissões processadas ao mesmo tempo neste processo")
+    args = parser.parse_args()
+    print(f"Worker da fila {api.submission_queue.path} ({args.concurrency} simultâneas). Ctrl+C para sair.")
+    try:
+        asyncio.run(_rodar(args.concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()